@@ -4,11 +4,13 @@ from django.conf import settings
 # from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from django.db import models
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 
+from courses.cache import BLOG_CATEGORY_LINKS_KEY, invalidate_links
+from courses.page_cache import BLOG_CATEGORY_TAG, POST_TAG, TAXONOMY_TAG, purge_page_tags
 from courses.utils import unique_slug_generator
 
 
@@ -38,6 +40,14 @@ def category_pre_save_receiver(sender, instance, *args, **kwargs):
 
 pre_save.connect(category_pre_save_receiver, sender=BlogCategory)
 
+
+def category_links_changed_receiver(sender, instance, *args, **kwargs):
+    invalidate_links(BLOG_CATEGORY_LINKS_KEY)
+    purge_page_tags(TAXONOMY_TAG, BLOG_CATEGORY_TAG.format(instance.slug))
+
+post_save.connect(category_links_changed_receiver, sender=BlogCategory)
+post_delete.connect(category_links_changed_receiver, sender=BlogCategory)
+
 class PostManager(models.Manager):
     def active(self, *args, **kwargs):
         # Post.objects.all() = super(PostManager, self).all()
@@ -114,6 +124,16 @@ def pre_save_post_receiver(sender, instance, *args, **kwargs):
 pre_save.connect(pre_save_post_receiver, sender=Post)
 
 
+def post_pages_changed_receiver(sender, instance, *args, **kwargs):
+    tags = [POST_TAG.format(instance.slug)]
+    if instance.category_id:
+        tags.append(BLOG_CATEGORY_TAG.format(instance.category.slug))
+    purge_page_tags(*tags)
+
+post_save.connect(post_pages_changed_receiver, sender=Post)
+post_delete.connect(post_pages_changed_receiver, sender=Post)
+
+
 
 
 
@@ -14,11 +14,14 @@ from django.core.paginator import Paginator
 
 from blog.mixins import AccessMixin
 from blog.forms import PostForm
+from courses.cache import blog_category_links
+from courses.page_cache import BLOG_CATEGORY_TAG, POST_TAG, PageCacheMixin
+from courses.query_budget import query_budget
 # Create your views here.
 
 def blog_category_list(request):
     # BlogCategory loops on index page.
-    category_list = BlogCategory.objects.filter()
+    category_list = blog_category_links()
     context = {
 
         "blog_category_list": category_list,
@@ -26,29 +29,34 @@ def blog_category_list(request):
     return context
 
 
-class PostDetailView(DetailView):
+@query_budget(7)
+class PostDetailView(PageCacheMixin, DetailView):
     model = Post
 
     def get_context_data(self, *args, **kwargs):
         context = super(PostDetailView, self).get_context_data(*args, **kwargs)
-        slug = self.kwargs.get("slug")
-        instance = get_object_or_404(Post, slug=slug)
+        instance = self.object
         if instance.publish > timezone.now().date() or instance.draft:
             if not self.request.user.is_staff or not self.request.user.is_superuser:
                 raise Http404
-        qs = Post.objects.active().filter(slug=slug)
-        if qs:
-            reading_post = qs[0]
-        # print(reading_post)
-            category = reading_post.category
-            related_articles = Post.objects.active().filter(category=category)
-            recent_articles = Post.objects.active().filter(category=category).order_by('-publish')[:7]
-            context['recent_articles'] = related_articles.exclude(title=reading_post.title)
-            context['related_articles'] = related_articles.exclude(title=reading_post.title)
-        print(context,'DetailView')
+        else:
+            # Both sidebars list the other active posts of the same category.
+            related_articles = list(Post.objects.active()
+                                                .filter(category_id=instance.category_id)
+                                                .exclude(title=instance.title)
+                                                .defer('content'))
+            context['recent_articles'] = related_articles
+            context['related_articles'] = related_articles
         return context
 
+    def get_page_cache_tags(self, context):
+        tags = [POST_TAG.format(self.object.slug)]
+        if self.object.category_id:
+            tags.append(BLOG_CATEGORY_TAG.format(self.object.category.slug))
+        return tags
+
 
+@query_budget(7)
 class PostListView(ListView):
     model = Post
     paginate_by = 8
@@ -68,6 +76,7 @@ class PostListView(ListView):
         return context
 
 
+@query_budget(8)
 class CategoryPostListView(ListView):
     model = Post
     paginate_by = 8
@@ -75,28 +84,28 @@ class CategoryPostListView(ListView):
 
     def get_queryset(self, *args, **kwargs):
         slug = self.kwargs.get("slug")
-        category = get_object_or_404(BlogCategory, slug=slug)
-        qs = Post.objects.active().filter(category=category)
+        self.category = get_object_or_404(BlogCategory, slug=slug)
+        qs = Post.objects.active().filter(category=self.category)
         if self.request.user.is_staff or self.request.user.is_superuser:
-            qs = Post.objects.filter(category=category)
+            qs = Post.objects.filter(category=self.category)
         return qs
 
     def get_context_data(self, *args, **kwargs):
         context = super(CategoryPostListView, self).get_context_data(*args, **kwargs)
-        slug = self.kwargs.get("slug")
-        category = get_object_or_404(BlogCategory, slug=slug)
-        context['category'] = category
+        context['category'] = self.category
         context['page_range'] = context['paginator'].page_range
         # print(context)
         return context
 
 
+@query_budget(7)
 class PostCreateView(AccessMixin, CreateView):
     model = Post
     form_class = PostForm
     template_name = "blog/post_create.html"
 
 
+@query_budget(8)
 class PostUpdateView(AccessMixin, UpdateView):
     model = Post
     form_class = PostForm
@@ -108,6 +117,7 @@ class PostUpdateView(AccessMixin, UpdateView):
         return context
 
 
+@query_budget(6)
 class PostSearchListView(TemplateView):
     template_name = 'blog/search_list.html'
     queryset = Post.objects.active()
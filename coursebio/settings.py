@@ -68,7 +68,7 @@ INSTALLED_APPS = [
 
     #local apps
     'accounts',
-    'courses',
+    'courses.apps.CoursesConfig',
     'blog',
     'marketing',
     'tags',
@@ -139,6 +139,30 @@ else:
     }
 
 
+# Cache shared by all web and worker processes. Point CACHE_BACKEND and
+# CACHE_LOCATION at memcached in production; the file based default is
+# shared between processes on a single host.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    }
+}
+
+
+# Periodic tasks run by Celery beat
+CELERY_BEAT_SCHEDULE = {
+    'refresh-popular-course-pool': {
+        'task': 'courses.refresh_popular_course_pool',
+        'schedule': 60.0 * 60,  # hourly
+    },
+    'build-related-courses': {
+        'task': 'courses.build_related_courses',
+        'schedule': 60.0 * 60 * 24,  # daily
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -188,6 +212,49 @@ MEDIA_URL = '/media/'
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+REST_FRAMEWORK = {
+    'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning',
+    'DEFAULT_VERSION': 'v1',
+    'ALLOWED_VERSIONS': ('v1',),
+    'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.AllowAny',),
+}
+
+# Ranked full-text course search; set to False to fall back to the
+# legacy icontains lookups.
+COURSE_SEARCH_FULLTEXT = os.getenv('COURSE_SEARCH_FULLTEXT', 'True') == 'True'
+
+# Cursor based pagination for the course lists; set to False to go back
+# to numbered pages.
+COURSE_LIST_KEYSET_PAGINATION = os.getenv('COURSE_LIST_KEYSET_PAGINATION', 'True') == 'True'
+
+# Raise when a view runs more queries than its declared query_budget.
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', 'False') == 'True'
+
+# Seconds anonymous catalogue pages stay in the full-page cache; 0 disables it.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 15))
+
+# Seconds before a web process rebuilds its autocomplete index to pick up
+# changes made by other processes.
+AUTOCOMPLETE_MAX_AGE = int(os.getenv('AUTOCOMPLETE_MAX_AGE', 60 * 60))
+# Seconds before a failed rebuild of the autocomplete index is retried.
+AUTOCOMPLETE_RETRY = int(os.getenv('AUTOCOMPLETE_RETRY', 60))
+
+# On-disk cache of provider API responses: where it lives, seconds a response
+# is served without revalidation and bytes kept before the least recently
+# used responses are evicted.
+PROVIDER_HTTP_CACHE = os.getenv('PROVIDER_HTTP_CACHE', 'True') == 'True'
+PROVIDER_HTTP_CACHE_DIR = os.getenv('PROVIDER_HTTP_CACHE_DIR', os.path.join(BASE_DIR, 'provider_http_cache'))
+PROVIDER_HTTP_CACHE_TTL = int(os.getenv('PROVIDER_HTTP_CACHE_TTL', 60 * 60))
+PROVIDER_HTTP_CACHE_MAX_BYTES = int(os.getenv('PROVIDER_HTTP_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Redis holding the provider request quotas shared by all import workers,
+# on a database of its own rather than the broker's; empty to limit every
+# process on its own. Seconds to wait for a Redis reply, and to limit each
+# process on its own after Redis failed before trying it again.
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', '')
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv('RATE_LIMIT_REDIS_TIMEOUT', 0.5))
+RATE_LIMIT_REDIS_RETRY = float(os.getenv('RATE_LIMIT_REDIS_RETRY', 30))
+
 CORS_REPLACE_HTTPS_REFERER      = True
 HOST_SCHEME                     = "https://"
 SECURE_PROXY_SSL_HEADER         = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -39,6 +39,7 @@ urlpatterns = [
     url(r'^accounts/', include('accounts.urls')),
     url(r'^accounts/', include('accounts.password.urls')),
     url(r'^blog/', include(('blog.urls', 'blog'), namespace='posts')),
+    url(r'^api/(?P<version>v1)/', include(('courses.api.urls', 'api'), namespace='api')),
     url(r'^', include(('courses.urls', 'courses'), namespace='course')),
 ]
 
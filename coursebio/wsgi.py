@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coursebio.settings')
 
 application = get_wsgi_application()
+
+# Build the autocomplete index before the first search-as-you-type request
+from courses.autocomplete import warm_index  # noqa: E402
+
+warm_index()
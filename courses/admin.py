@@ -9,6 +9,7 @@ from .models import (
 						Category, 
 						SubCategory, 
 						Course, 
+						ImportCheckpoint,
 						Provider,
 						Topic,
 					)
@@ -58,6 +59,13 @@ class ProviderAdmin(admin.ModelAdmin):
 	search_fields = ('title',)
 	ordering = ('-timestamp',)
 
+class ImportCheckpointAdmin(admin.ModelAdmin):
+	list_display = ('id', 'provider', 'scope', 'last_page', 'courses_processed', 'errors', 'started', 'finished',)
+	list_display_links = ('scope', 'id')
+	list_filter = ('provider', 'finished')
+	search_fields = ('scope',)
+	ordering = ('-updated',)
+
 
 
 
@@ -66,4 +74,5 @@ admin.site.register(Category, CategoryAdmin)
 admin.site.register(SubCategory, SubCategoryAdmin)
 admin.site.register(Topic, TopicAdmin)
 admin.site.register(Provider, ProviderAdmin)
-admin.site.register(Course, CourseAdmin)
\ No newline at end of file
+admin.site.register(Course, CourseAdmin)
+admin.site.register(ImportCheckpoint, ImportCheckpointAdmin)
\ No newline at end of file
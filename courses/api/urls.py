@@ -0,0 +1,19 @@
+from django.conf.urls import include, url
+from rest_framework.routers import DefaultRouter
+
+from .views import (
+		CategoryViewSet,
+		CourseViewSet,
+		ProviderViewSet,
+		SubCategoryViewSet,
+		)
+
+router = DefaultRouter()
+router.register(r'courses', CourseViewSet, basename='course')
+router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'subcategories', SubCategoryViewSet, basename='subcategory')
+router.register(r'providers', ProviderViewSet, basename='provider')
+
+urlpatterns = [
+	url(r'^', include(router.urls)),
+]
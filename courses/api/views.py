@@ -0,0 +1,85 @@
+from rest_framework import viewsets
+from rest_framework.pagination import CursorPagination
+
+from courses.models import (
+								Category,
+								Course,
+								Provider,
+								SubCategory,
+							)
+from courses.query_budget import query_budget
+from courses.serializers import (
+								CategoryModelSerializer,
+								CourseModelSerializer,
+								ProviderModelSerializer,
+								SubCategoryModelSerializer,
+								requested_fields,
+							)
+
+
+class CatalogueCursorPagination(CursorPagination):
+	ordering = 'id'
+	page_size = 25
+	page_size_query_param = 'page_size'
+	max_page_size = 100
+
+
+class CourseCursorPagination(CatalogueCursorPagination):
+	ordering = '-id'
+
+
+@query_budget(6)
+class CourseViewSet(viewsets.ReadOnlyModelViewSet):
+	serializer_class = CourseModelSerializer
+	pagination_class = CourseCursorPagination
+	lookup_field = 'slug'
+
+	def get_queryset(self):
+		qs = Course.objects.select_related('provider')
+		fields = requested_fields(self.request)
+		if fields is not None and 'description' not in fields:
+			qs = qs.defer('description')
+		for field in ('category', 'subcategory'):
+			if fields is None or field in fields:
+				qs = qs.prefetch_related(field)
+
+		params = self.request.query_params
+		if params.get('category'):
+			qs = qs.filter(category__slug=params['category'])
+		if params.get('subcategory'):
+			qs = qs.filter(subcategory__slug=params['subcategory'])
+		if params.get('provider'):
+			qs = qs.filter(provider__slug=params['provider'])
+		if params.get('is_free') in ('true', 'false'):
+			qs = qs.filter(is_free=params['is_free'] == 'true')
+		return qs
+
+
+@query_budget(4)
+class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+	queryset = Category.objects.all()
+	serializer_class = CategoryModelSerializer
+	pagination_class = CatalogueCursorPagination
+	lookup_field = 'slug'
+
+
+@query_budget(4)
+class SubCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+	serializer_class = SubCategoryModelSerializer
+	pagination_class = CatalogueCursorPagination
+	lookup_field = 'slug'
+
+	def get_queryset(self):
+		qs = SubCategory.objects.select_related('category')
+		category = self.request.query_params.get('category')
+		if category:
+			qs = qs.filter(category__slug=category)
+		return qs
+
+
+@query_budget(4)
+class ProviderViewSet(viewsets.ReadOnlyModelViewSet):
+	queryset = Provider.objects.all()
+	serializer_class = ProviderModelSerializer
+	pagination_class = CatalogueCursorPagination
+	lookup_field = 'slug'
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_search_index(sender, using, *args, **kwargs):
+    from .search import ensure_search_index
+    ensure_search_index(using)
 
 
 class CoursesConfig(AppConfig):
     name = 'courses'
+
+    def ready(self):
+        post_migrate.connect(create_search_index, sender=self)
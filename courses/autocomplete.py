@@ -0,0 +1,361 @@
+"""
+In-process prefix index for search-as-you-type suggestions.
+
+Titles of courses, authors, providers, categories, subcategories and
+topics are indexed in one trie per kind. Every word of a label starts a
+term, so "boot" finds "Complete Python Bootcamp". Each trie node keeps the
+best ``TOP_K`` entries below it by score (subscribers for courses and
+authors, number of courses for the taxonomy), so a lookup is a walk down
+at most ``MAX_PREFIX_LENGTH`` nodes plus a copy of a short list.
+
+The index is built lazily with one streaming query per model and kept up
+to date from the model signals of this process. Changes made by other
+processes (imports run in Celery workers) are picked up by a background
+rebuild once the index is older than ``AUTOCOMPLETE_MAX_AGE``; a failed
+rebuild is retried after ``AUTOCOMPLETE_RETRY`` seconds. Web processes
+warm the index when they start, so no request waits for the first build.
+
+Signal receivers update the index from the thread that saved the row
+while request threads search it, and a search can refill stale nodes,
+so every access to the tries holds the lock of the index.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.http import urlencode
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 10
+MAX_PREFIX_LENGTH = 20
+
+COURSE = 'course'
+AUTHOR = 'author'
+PROVIDER = 'provider'
+CATEGORY = 'category'
+SUBCATEGORY = 'subcategory'
+TOPIC = 'topic'
+KINDS = (COURSE, AUTHOR, PROVIDER, CATEGORY, SUBCATEGORY, TOPIC)
+
+Entry = namedtuple('Entry', ['key', 'label', 'score', 'url_args'])
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalise(text):
+    """Lower-case ``text`` and strip accents and punctuation."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def label_terms(label):
+    """Every suffix of the normalised label that starts at a word."""
+    words = normalise(label).split()
+    return {' '.join(words[index:])[:MAX_PREFIX_LENGTH] for index in range(len(words))}
+
+
+class _Node(object):
+    __slots__ = ('children', 'top', 'truncated', 'keys')
+
+    def __init__(self):
+        self.children = {}
+        # Best entries below this node as (-score, key), best first;
+        # ``None`` once a removal made it stale.
+        self.top = []
+        # Whether entries below this node did not fit into ``top``.
+        self.truncated = False
+        # Keys of the entries whose term ends at this node.
+        self.keys = set()
+
+
+class PrefixIndex(object):
+    """Trie over entry terms with a bounded top-K at every node."""
+
+    def __init__(self, top_k=TOP_K):
+        self.top_k = top_k
+        self.root = _Node()
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, label, score, url_args):
+        if key in self.entries:
+            self.remove(key)
+        entry = Entry(key, label, score or 0, url_args)
+        self.entries[key] = entry
+        offered = set()
+        for term in label_terms(label):
+            node = self.root
+            for char in term:
+                node = node.children.setdefault(char, _Node())
+                if node not in offered:
+                    offered.add(node)
+                    self._offer(node, entry)
+            node.keys.add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for term in label_terms(entry.label):
+            node, path = self.root, []
+            for char in term:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                path.append((char, node))
+                if node.top is not None:
+                    item = (-entry.score, key)
+                    if item in node.top:
+                        node.top.remove(item)
+                        if node.truncated:
+                            node.top = None
+            else:
+                node.keys.discard(key)
+                self._prune(path)
+
+    def search(self, prefix, limit=TOP_K):
+        query = normalise(prefix)
+        if not query:
+            return []
+        node = self.root
+        for char in query[:MAX_PREFIX_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        top = node.top
+        if top is None:
+            top = self._rebuild(node)
+        entries = [self.entries.get(key) for _, key in top]
+        entries = [entry for entry in entries if entry is not None]
+        if len(query) > MAX_PREFIX_LENGTH:
+            entries = [entry for entry in entries
+                       if any(term.startswith(query) for term in self._full_terms(entry.label))]
+        return entries[:limit]
+
+    def _offer(self, node, entry):
+        if node.top is None:
+            return
+        item = (-entry.score, entry.key)
+        if len(node.top) < self.top_k:
+            node.top.append(item)
+            node.top.sort()
+        elif item < node.top[-1]:
+            node.top[-1] = item
+            node.top.sort()
+            node.truncated = True
+        else:
+            node.truncated = True
+
+    def _rebuild(self, node):
+        keys, stack = set(), [node]
+        while stack:
+            current = stack.pop()
+            keys.update(current.keys)
+            stack.extend(current.children.values())
+        items = ((-self.entries[key].score, key) for key in keys if key in self.entries)
+        top = heapq.nsmallest(self.top_k, items)
+        node.truncated = len(keys) > self.top_k
+        node.top = top
+        return top
+
+    def _prune(self, path):
+        for index in range(len(path) - 1, -1, -1):
+            char, node = path[index]
+            if node.children or node.keys:
+                break
+            parent = path[index - 1][1] if index else self.root
+            del parent.children[char]
+
+    @staticmethod
+    def _full_terms(label):
+        words = normalise(label).split()
+        return [' '.join(words[index:]) for index in range(len(words))]
+
+
+class Autocomplete(object):
+    """One ``PrefixIndex`` per suggestion kind."""
+
+    def __init__(self):
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        # Subscribers per course of every author, to keep author scores
+        # right when single courses change.
+        self.author_courses = {}
+        self.course_authors = {}
+        self.built = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        from .models import Category, Course, Provider, SubCategory, Topic
+
+        index = cls()
+        courses = (Course.objects.order_by()
+                                 .values_list('id', 'title', 'slug', 'author', 'num_subscribers', 'provider_id')
+                                 .iterator())
+        for course_id, title, slug, author, num_subscribers, provider_id in courses:
+            index.indexes[COURSE].add(course_id, title, num_subscribers, (provider_id, slug))
+            index._track_author(course_id, author, num_subscribers, update=False)
+        for author, courses in index.author_courses.items():
+            index.indexes[AUTHOR].add(author, author, sum(courses.values()), ())
+
+        taxonomy = (
+            (PROVIDER, Provider.objects.values_list('id', 'title', 'slug')),
+            (CATEGORY, Category.objects.values_list('id', 'title', 'slug')),
+            (SUBCATEGORY, SubCategory.objects.values_list('id', 'title', 'slug', 'category__slug')),
+            (TOPIC, Topic.objects.values_list('id', 'title', 'slug')),
+        )
+        for kind, rows in taxonomy:
+            rows = rows.annotate(num_courses=Count('course')).order_by()
+            for row in rows.iterator():
+                index.indexes[kind].add(row[0], row[1], row[-1], tuple(row[2:-1]))
+        logger.info(f"Autocomplete index built with {len(index.indexes[COURSE])} courses")
+        return index
+
+    def update_course(self, course):
+        with self.lock:
+            self.indexes[COURSE].add(course.pk, course.title, course.num_subscribers,
+                                     (course.provider_id, course.slug))
+            self._track_author(course.pk, course.author, course.num_subscribers)
+
+    def remove_course(self, course_id):
+        with self.lock:
+            self.indexes[COURSE].remove(course_id)
+            self._track_author(course_id, None, 0)
+
+    def update_taxonomy(self, kind, instance):
+        url_args = (instance.slug,)
+        if kind == SUBCATEGORY:
+            url_args = (instance.slug, instance.category.slug)
+        num_courses = instance.course_set.count()
+        with self.lock:
+            self.indexes[kind].add(instance.pk, instance.title, num_courses, url_args)
+
+    def remove_taxonomy(self, kind, pk):
+        with self.lock:
+            self.indexes[kind].remove(pk)
+
+    def search(self, query, limit=TOP_K):
+        with self.lock:
+            found = {kind: self.indexes[kind].search(query, limit) for kind in KINDS}
+        return {kind: [self._suggestion(kind, entry) for entry in entries]
+                for kind, entries in found.items()}
+
+    def _track_author(self, course_id, author, num_subscribers, update=True):
+        previous = self.course_authors.pop(course_id, None)
+        changed = {previous, author} - {None}
+        if previous is not None:
+            self.author_courses[previous].pop(course_id, None)
+        if author:
+            self.course_authors[course_id] = author
+            self.author_courses.setdefault(author, {})[course_id] = num_subscribers or 0
+        if not update:
+            return
+        for name in changed:
+            courses = self.author_courses.get(name)
+            if courses:
+                self.indexes[AUTHOR].add(name, name, sum(courses.values()), ())
+            else:
+                self.author_courses.pop(name, None)
+                self.indexes[AUTHOR].remove(name)
+
+    def _suggestion(self, kind, entry):
+        if kind == COURSE:
+            provider_id, slug = entry.url_args
+            provider = self.indexes[PROVIDER].entries.get(provider_id)
+            if provider is not None:
+                url = reverse('courses:course-detail', kwargs={'slug': provider.url_args[0], 'slug2': slug})
+            else:
+                url = '{}?{}'.format(reverse('courses:search'), urlencode({'q': entry.label}))
+        elif kind == CATEGORY:
+            url = reverse('courses:subcategory-list', kwargs={'slug': entry.url_args[0]})
+        elif kind == SUBCATEGORY:
+            url = reverse('courses:course-list', kwargs={'slug': entry.url_args[1], 'slug2': entry.url_args[0]})
+        else:
+            url = '{}?{}'.format(reverse('courses:search'), urlencode({'q': entry.label}))
+        return {'title': entry.label, 'url': url}
+
+
+_index = None
+_lock = threading.Lock()
+_rebuilding = False
+_retry_at = 0.0
+
+
+def max_age():
+    return getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 60 * 60)
+
+
+def retry_delay():
+    return getattr(settings, 'AUTOCOMPLETE_RETRY', 60)
+
+
+def get_index():
+    """Return the process-wide index, building it on first use."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = Autocomplete.build()
+    elif time.monotonic() - _index.built > max_age() and time.monotonic() >= _retry_at:
+        _rebuild_in_background()
+    return _index
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    with _lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+
+    def rebuild():
+        global _index, _rebuilding, _retry_at
+        from django.db import connection
+
+        try:
+            _index = Autocomplete.build()
+        except Exception as e:
+            # Keep serving the old index; don't retry on every request.
+            _retry_at = time.monotonic() + retry_delay()
+            logger.error(f"Failed to rebuild the autocomplete index: {e}")
+        finally:
+            connection.close()
+            _rebuilding = False
+
+    threading.Thread(target=rebuild, daemon=True).start()
+
+
+def warm_index():
+    """Build the index in a background thread, ahead of the first request."""
+    def warm():
+        from django.db import connection
+
+        try:
+            get_index()
+        except Exception as e:
+            logger.error(f"Failed to build the autocomplete index: {e}")
+        finally:
+            connection.close()
+
+    threading.Thread(target=warm, daemon=True).start()
+
+
+def loaded_index():
+    """The index if this process has built one, else ``None``."""
+    return _index
+
+
+def suggest(query, limit=TOP_K):
+    return get_index().search(query, limit)
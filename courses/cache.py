@@ -0,0 +1,102 @@
+"""
+Shared cache helpers for data rendered on every page.
+
+The navbar and footer taxonomy lists (course categories, providers and
+blog categories) are stored as ready-to-render ``TaxonomyLink`` tuples,
+so templates never touch the ORM or reverse URLs for them. The model signals delete them whenever a row they were
+built from changes, once the transaction of the change commits; a day's
+expiry is the safety net.
+
+The home page samples its popular courses from a precomputed pool of
+ids that is refreshed on a schedule and after each import, and dropped
+whenever an import commits courses that join or leave it. Without
+popular courses the pool holds the most subscribed ones instead.
+"""
+
+import random
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+TaxonomyLink = namedtuple('TaxonomyLink', ['title', 'url', 'image_url'])
+TaxonomyLink.__new__.__defaults__ = (None,)
+
+COURSE_CATEGORY_LINKS_KEY = 'taxonomy:course-categories'
+COURSE_PROVIDER_LINKS_KEY = 'taxonomy:course-providers'
+BLOG_CATEGORY_LINKS_KEY = 'taxonomy:blog-categories'
+# Safety net only; the links are deleted when their rows change.
+TAXONOMY_LINKS_TIMEOUT = 60 * 60 * 24
+
+POPULAR_COURSE_POOL_KEY = 'home:popular-course-pool'
+POPULAR_COURSE_POOL_SIZE = 500
+# Safety net only; the pool is normally replaced well before this.
+POPULAR_COURSE_POOL_TIMEOUT = 60 * 60 * 24
+
+
+def cached_links(key, build):
+    """Return the links cached under ``key``, building them on a miss."""
+    links = cache.get(key)
+    if links is None:
+        links = build()
+        cache.set(key, links, TAXONOMY_LINKS_TIMEOUT)
+    return links
+
+
+def invalidate_links(*keys):
+    # Deleting before the commit would let a request rebuild the links
+    # from the old rows and cache them.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def course_category_links():
+    from .models import Category
+
+    return cached_links(COURSE_CATEGORY_LINKS_KEY, lambda: [
+        TaxonomyLink(category.title, category.get_absolute_url())
+        for category in Category.objects.only('title', 'slug')
+    ])
+
+
+def course_provider_links():
+    from .models import Provider
+
+    return cached_links(COURSE_PROVIDER_LINKS_KEY, lambda: [
+        TaxonomyLink(provider.title, provider.provider_url, provider.image_url)
+        for provider in Provider.objects.only('title', 'provider_url', 'image_url')
+    ])
+
+
+def blog_category_links():
+    from blog.models import BlogCategory
+
+    return cached_links(BLOG_CATEGORY_LINKS_KEY, lambda: [
+        TaxonomyLink(category.title, category.get_absolute_url())
+        for category in BlogCategory.objects.only('title', 'slug')
+    ])
+
+
+def refresh_popular_course_pool():
+    """Rebuild the pool of popular course ids the home page samples from."""
+    from .models import Course
+
+    # Popular courses come first; only without any the others are used
+    courses = list(Course.objects.order_by('-is_popular', '-num_subscribers', 'id')
+                                 .values_list('id', 'is_popular')[:POPULAR_COURSE_POOL_SIZE])
+    pool = [pk for pk, is_popular in courses if is_popular] or [pk for pk, _ in courses]
+    cache.set(POPULAR_COURSE_POOL_KEY, pool, POPULAR_COURSE_POOL_TIMEOUT)
+    return pool
+
+
+def invalidate_popular_course_pool():
+    """Drop the pool once the transaction commits; the next sample rebuilds it."""
+    transaction.on_commit(lambda: cache.delete(POPULAR_COURSE_POOL_KEY))
+
+
+def sample_popular_course_ids(count):
+    """Pick ``count`` random ids from the popular course pool."""
+    pool = cache.get(POPULAR_COURSE_POOL_KEY)
+    if pool is None:
+        pool = refresh_popular_course_pool()
+    return random.sample(pool, min(count, len(pool)))
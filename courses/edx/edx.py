@@ -6,18 +6,48 @@ Handles authentication and API calls to edX platform.
 import os
 import requests
 import logging
+import threading
+import time
 from datetime import datetime
 from urllib.parse import urljoin
 
+from courses.http_cache import CachingHTTPAdapter, get_http_cache
+from courses.ratelimit import AdaptiveRateLimiter, parse_retry_after, shared_rate_limiter
+
 logger = logging.getLogger(__name__)
 
+# Request rate (per second) at the start of a run, the ceiling it may rise
+# to while edX responds well and the floor it backs off to. The ceiling is
+# also the quota shared by all workers.
+EDX_RATE_LIMIT = float(os.getenv('EDX_RATE_LIMIT', 1))
+EDX_MAX_RATE_LIMIT = float(os.getenv('EDX_MAX_RATE_LIMIT', 10))
+EDX_MIN_RATE_LIMIT = float(os.getenv('EDX_MIN_RATE_LIMIT', 0.2))
+
+# Longest Retry-After (seconds) that is honoured
+EDX_MAX_RETRY_AFTER = 300
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_edx_rate_limiter():
+    """The limiter shared by every edX client of this process."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            quota = shared_rate_limiter(
+                'edx', os.getenv('EDX_CLIENT_ID') or os.getenv('EDX_API_URL'), EDX_MAX_RATE_LIMIT
+            )
+            _rate_limiter = AdaptiveRateLimiter(EDX_RATE_LIMIT, EDX_MAX_RATE_LIMIT, EDX_MIN_RATE_LIMIT, shared=quota)
+    return _rate_limiter
+
 
 class EdxAPI:
     """
     edX API client for course data retrieval.
     """
 
-    def __init__(self, client_id=None, client_secret=None, base_url=None):
+    def __init__(self, client_id=None, client_secret=None, base_url=None, rate_limiter=None):
         """
         Initialize edX API client.
 
@@ -25,11 +55,19 @@ class EdxAPI:
             client_id (str): edX API client ID
             client_secret (str): edX API client secret
             base_url (str): Base URL for edX API
+            rate_limiter (AdaptiveRateLimiter): Limiter of the requests,
+                shared by all clients of the process by default
         """
         self.client_id = client_id or os.getenv('EDX_CLIENT_ID')
         self.client_secret = client_secret or os.getenv('EDX_CLIENT_SECRET')
         self.base_url = base_url or os.getenv('EDX_API_URL', 'https://courses.edx.org/api')
         self.session = requests.Session()
+        self.rate_limiter = rate_limiter or get_edx_rate_limiter()
+        # Repeated GETs are answered from the provider response cache; only
+        # the requests reaching edX wait for the rate limiter
+        adapter = CachingHTTPAdapter(get_http_cache(), rate_limiter=self.rate_limiter)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.access_token = None
         self.token_expires = None
 
@@ -72,6 +110,9 @@ class EdxAPI:
         """
         Make authenticated request to edX API.
 
+        Each request sent to edX waits for a token of the rate limiter (in
+        the session adapter) and reports its latency and status back to it.
+
         Args:
             endpoint (str): API endpoint
             params (dict): Query parameters
@@ -91,15 +132,26 @@ class EdxAPI:
         if self.access_token:
             headers['Authorization'] = f'Bearer {self.access_token}'
 
+        start = time.perf_counter()
         try:
             if method == 'GET':
                 response = self.session.get(url, headers=headers, params=params)
             else:
                 response = self.session.request(method, url, headers=headers, params=params)
 
+            # Responses from the cache say nothing about the load of edX
+            if not getattr(response, 'from_cache', False):
+                self.rate_limiter.record(
+                    getattr(response, 'latency', time.perf_counter() - start), response.status_code,
+                    parse_retry_after(response.headers.get('Retry-After'), EDX_MAX_RETRY_AFTER)
+                )
             response.raise_for_status()
             return response.json()
 
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.rate_limiter.record(time.perf_counter() - start)
+            logger.error(f"edX API request failed: {e}")
+            raise
         except requests.exceptions.RequestException as e:
             logger.error(f"edX API request failed: {e}")
             raise
@@ -5,12 +5,17 @@ Base functionality for importing courses from edX platform.
 
 import logging
 from datetime import datetime
-from django.utils import timezone
-from courses.models import Course, Provider, Category, SubCategory, Topic
+from courses.importing import (CourseBatchWriter, TaxonomyResolver, fingerprint, split_unchanged,
+                               sync_course_links)
+from courses.models import Course, Provider
 from .edx import EdxAPI
 
 logger = logging.getLogger(__name__)
 
+# Fields refreshed on courses that already exist
+EDX_UPDATE_FIELDS = ('title', 'description', 'price', 'is_free', 'duration', 'course_url', 'image_url',
+                     'video_url', 'author', 'level', 'source_fingerprint')
+
 
 class EdxImporterBase:
     """
@@ -29,12 +34,15 @@ class EdxImporterBase:
         self.api = EdxAPI(client_id, client_secret, base_url)
         self.provider_name = 'edX'
         self.provider = None
+        self.taxonomy = TaxonomyResolver()
         self.stats = {
             'processed': 0,
             'created': 0,
             'updated': 0,
             'errors': 0,
-            'skipped': 0
+            'retries': 0,
+            'skipped': 0,
+            'unchanged': 0
         }
 
     def get_or_create_provider(self):
@@ -46,13 +54,8 @@ class EdxImporterBase:
         """
         if not self.provider:
             self.provider, created = Provider.objects.get_or_create(
-                name=self.provider_name,
-                defaults={
-                    'description': 'edX is an online learning platform offering courses from universities and institutions worldwide.',
-                    'website': 'https://www.edx.org',
-                    'api_url': 'https://courses.edx.org/api',
-                    'is_active': True
-                }
+                title=self.provider_name,
+                defaults={'provider_url': 'https://www.edx.org'}
             )
             if created:
                 logger.info(f"Created new provider: {self.provider_name}")
@@ -193,9 +196,27 @@ class EdxImporterBase:
             logger.error(f"Error parsing course data: {e}")
             return None
 
+    def split_unchanged(self, results):
+        """
+        Drop the courses of a page whose data did not change since the last import.
+
+        Args:
+            results (list): Raw course data from edX API
+
+        Returns:
+            tuple: (changed, unchanged) where ``changed`` is the list of raw
+            course data to import and ``unchanged`` the number dropped
+        """
+        course_ids = [course_data.get('course_id', course_data.get('id', '')) for course_data in results]
+        payloads = {course_id: course_data for course_id, course_data in zip(course_ids, results) if course_id}
+        changed, unchanged = split_unchanged(self.get_or_create_provider(), payloads)
+        # Data without an id is kept so that parsing reports it as skipped
+        return [course_data for course_id, course_data in zip(course_ids, results)
+                if not course_id or course_id in changed], unchanged
+
     def get_or_create_category(self, category_name):
         """
-        Get or create category.
+        Get or create category, from the taxonomy of the run.
 
         Args:
             category_name (str): Category name
@@ -206,15 +227,11 @@ class EdxImporterBase:
         if not category_name:
             return None
 
-        category, created = Category.objects.get_or_create(
-            name=category_name,
-            defaults={'description': f'Courses related to {category_name}'}
-        )
-        return category
+        return self.taxonomy.category(category_name)
 
     def get_or_create_subcategory(self, subcategory_name, category):
         """
-        Get or create subcategory.
+        Get or create subcategory, from the taxonomy of the run.
 
         Args:
             subcategory_name (str): Subcategory name
@@ -226,16 +243,11 @@ class EdxImporterBase:
         if not subcategory_name or not category:
             return None
 
-        subcategory, created = SubCategory.objects.get_or_create(
-            name=subcategory_name,
-            category=category,
-            defaults={'description': f'Subcategory of {category.name}'}
-        )
-        return subcategory
+        return self.taxonomy.subcategory(subcategory_name, category)
 
     def get_or_create_topic(self, topic_name, subcategory):
         """
-        Get or create topic.
+        Get or create topic, from the taxonomy of the run.
 
         Args:
             topic_name (str): Topic name
@@ -247,12 +259,7 @@ class EdxImporterBase:
         if not topic_name or not subcategory:
             return None
 
-        topic, created = Topic.objects.get_or_create(
-            name=topic_name,
-            subcategory=subcategory,
-            defaults={'description': f'Topic under {subcategory.name}'}
-        )
-        return topic
+        return self.taxonomy.topic(topic_name, subcategory)
 
     def create_or_update_course(self, course_data):
         """
@@ -267,44 +274,14 @@ class EdxImporterBase:
         try:
             provider = self.get_or_create_provider()
 
-            # Create course data for model
-            course_defaults = {
-                'title': course_data['title'],
-                'description': course_data['description'],
-                'short_description': course_data['short_description'],
-                'price': course_data['price'],
-                'original_price': course_data['original_price'],
-                'discount_percentage': course_data['discount_percentage'],
-                'effort': course_data['effort'],
-                'language': course_data['language'],
-                'enrollment_start': course_data['enrollment_start'],
-                'enrollment_end': course_data['enrollment_end'],
-                'course_start': course_data['course_start'],
-                'course_end': course_data['course_end'],
-                'course_url': course_data['course_url'],
-                'image_url': course_data['image_url'],
-                'video_url': course_data['video_url'],
-                'instructor_names': course_data['instructor_names'],
-                'organization': course_data['organization'],
-                'level': course_data['level'],
-                'prerequisites': course_data['prerequisites'],
-                'raw_data': course_data['raw_data'],
-                'last_updated': timezone.now(),
-                'is_active': True
-            }
-
-            # Try to get existing course or create new one
-            course, created = Course.objects.get_or_create(
-                course_id=course_data['course_id'],
+            # One indexed lookup on the (provider, external_id) constraint
+            course, created = Course.objects.update_or_create(
                 provider=provider,
-                defaults=course_defaults
+                external_id=course_data['course_id'],
+                defaults=self.course_fields(course_data)
             )
 
             if not created:
-                # Update existing course
-                for key, value in course_defaults.items():
-                    setattr(course, key, value)
-                course.save()
                 logger.info(f"Updated course: {course.title}")
                 self.stats['updated'] += 1
             else:
@@ -321,41 +298,117 @@ class EdxImporterBase:
             self.stats['errors'] += 1
             return None, False
 
-    def _handle_course_categories(self, course, categories):
+    def course_fields(self, course_data):
         """
-        Handle course categories, subcategories, and topics.
+        Model fields of a course from parsed course data.
 
         Args:
-            course (Course): Course instance
-            categories (list): List of category names
+            course_data (dict): Parsed course data
+
+        Returns:
+            dict: Course field values
         """
-        if not categories:
-            return
+        return {
+            'title': course_data['title'][:255],
+            'description': course_data['description'] or course_data['short_description'] or '',
+            'price': course_data['price'],
+            'is_free': not course_data['price'],
+            'duration': course_data['effort'],
+            'course_url': course_data['course_url'],
+            'image_url': course_data['image_url'],
+            'video_url': course_data['video_url'],
+            'author': ', '.join(course_data['instructor_names'])[:255] or course_data['organization'],
+            'level': (course_data['level'] or '')[:100],
+            'source_fingerprint': fingerprint(course_data['raw_data']),
+        }
 
-        # Clear existing relationships
-        course.categories.clear()
-        course.subcategories.clear()
-        course.topics.clear()
+    def build_course(self, course_data):
+        """
+        Build an unsaved course from parsed course data.
+
+        Args:
+            course_data (dict): Parsed course data
+
+        Returns:
+            Course: Unsaved course instance
+        """
+        return Course(
+            provider=self.get_or_create_provider(),
+            external_id=course_data['course_id'],
+            **self.course_fields(course_data)
+        )
 
+    def course_taxonomy(self, categories):
+        """
+        Ids of the categories, subcategories and topics of a course.
+
+        Every subject is used as category, subcategory and topic alike.
+
+        Args:
+            categories (list): List of category names
+
+        Returns:
+            tuple: (category ids, subcategory ids, topic ids), all None for a
+            course without subjects so that its links are kept
+        """
+        if not categories:
+            return None, None, None
+        category_ids, subcategory_ids, topic_ids = set(), set(), set()
         for category_name in categories:
-            if not category_name:
+            category = self.get_or_create_category(category_name)
+            if not category:
                 continue
+            category_ids.add(category.pk)
+            subcategory = self.get_or_create_subcategory(category_name, category)
+            if subcategory:
+                subcategory_ids.add(subcategory.pk)
+                topic = self.get_or_create_topic(category_name, subcategory)
+                if topic:
+                    topic_ids.add(topic.pk)
+        return category_ids, subcategory_ids, topic_ids
+
+    def prefetch_taxonomy(self, category_lists):
+        """
+        Resolve the subjects of a page of courses at once, creating the
+        missing categories, subcategories and topics with one insert per model.
 
-            # Create category
-            category = self.get_or_create_category(category_name)
-            if category:
-                course.categories.add(category)
+        Args:
+            category_lists (list): Lists of category names, one per course
+        """
+        names = {name for categories in category_lists for name in categories or () if name}
+        categories = self.taxonomy.categories(names)
+        subcategories = self.taxonomy.subcategories([(name, categories[name]) for name in names if categories[name]])
+        self.taxonomy.topics([(name, subcategories[name]) for name in names if subcategories.get(name)])
 
-                # For now, we'll treat categories as both categories and subcategories
-                # In a more complex implementation, you might want to parse hierarchical data
-                subcategory = self.get_or_create_subcategory(category_name, category)
-                if subcategory:
-                    course.subcategories.add(subcategory)
+    def create_course_writer(self, batch_size=100):
+        """
+        Batch writer for the courses of the edX provider.
 
-                    # Create topic with same name
-                    topic = self.get_or_create_topic(category_name, subcategory)
-                    if topic:
-                        course.topics.add(topic)
+        Args:
+            batch_size (int): Courses written per batch
+
+        Returns:
+            CourseBatchWriter: Writer refreshing ``EDX_UPDATE_FIELDS``
+        """
+        return CourseBatchWriter(self.get_or_create_provider(), batch_size=batch_size,
+                                 update_fields=EDX_UPDATE_FIELDS)
+
+    def _handle_course_categories(self, course, categories):
+        """
+        Handle course categories, subcategories, and topics.
+
+        Only the links that differ from the current ones are written.
+
+        Args:
+            course (Course): Course instance
+            categories (list): List of category names
+        """
+        category_ids, subcategory_ids, topic_ids = self.course_taxonomy(categories)
+        sync_course_links({course.pk: {
+            'category': category_ids,
+            'subcategory': subcategory_ids,
+            'topic': topic_ids,
+        }})
 
     def log_stats(self):
         """
@@ -366,16 +419,21 @@ class EdxImporterBase:
         logger.info(f"  Created: {self.stats['created']}")
         logger.info(f"  Updated: {self.stats['updated']}")
         logger.info(f"  Errors: {self.stats['errors']}")
+        logger.info(f"  Retried requests: {self.stats['retries']}")
         logger.info(f"  Skipped: {self.stats['skipped']}")
+        logger.info(f"  Unchanged: {self.stats['unchanged']}")
 
     def reset_stats(self):
         """
-        Reset import statistics.
+        Reset import statistics, and the taxonomy loaded by the last run.
         """
+        self.taxonomy = TaxonomyResolver()
         self.stats = {
             'processed': 0,
             'created': 0,
             'updated': 0,
             'errors': 0,
-            'skipped': 0
+            'retries': 0,
+            'skipped': 0,
+            'unchanged': 0
         }
@@ -3,30 +3,89 @@ edX Production Course Importer
 Imports courses from edX platform for production use.
 """
 
+import contextlib
 import logging
-import time
+import os
+import queue
+import random
+import threading
+from collections import namedtuple
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from courses.importing import (TaxonomyResolver, checkpoint_stats, finish_checkpoint, finish_import,
+                               prune_checkpoints, save_checkpoint, start_checkpoint)
+from courses.search import defer_search_updates
 from .edx_import_base import EdxImporterBase
 
 logger = logging.getLogger(__name__)
 
+# Attempts per failed page and the backoff before the first retry (seconds),
+# doubled on every further attempt up to EDX_MAX_RETRY_DELAY
+EDX_MAX_RETRIES = int(os.getenv('EDX_MAX_RETRIES', 5))
+EDX_RETRY_DELAY = float(os.getenv('EDX_RETRY_DELAY', 5))
+EDX_MAX_RETRY_DELAY = float(os.getenv('EDX_MAX_RETRY_DELAY', 300))
+
+# Pages buffered between the fetch, parse and write stages of an import
+EDX_PREFETCH_PAGES = int(os.getenv('EDX_PREFETCH_PAGES', 3))
+
+# A page as fetched after ``retries`` retried requests: ``data`` is None
+# when the page still failed with ``error`` once its retries ran out.
+FetchedPage = namedtuple('FetchedPage', ['number', 'data', 'retries', 'error'])
+# A page as parsed: unsaved courses with their subjects, the counts of
+# unchanged and unparseable courses and whether no page follows.
+ParsedPage = namedtuple('ParsedPage', ['number', 'courses', 'unchanged', 'skipped', 'next', 'last',
+                                       'retries', 'error'])
+
+# Ends the stream of pages between two stages
+_DONE = object()
+
+
+def _put(stage_queue, item, stop):
+    """Put ``item`` on a bounded queue unless the import stops first."""
+    while not stop.is_set():
+        try:
+            stage_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(stage_queue, stop):
+    """Next item of a queue, or ``_DONE`` once the import stops."""
+    while not stop.is_set():
+        try:
+            return stage_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
 
 class EdxProductionImporter(EdxImporterBase):
     """
     Production importer for edX courses.
     Imports all available courses with proper error handling and rate limiting.
+
+    Requests are paced by the adaptive rate limiter of the API client; a
+    page that fails is retried with exponential backoff.
     """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.rate_limit_delay = 1.0  # 1 second between requests
-        self.max_retries = 3
-        self.retry_delay = 5.0
+        self.max_retries = EDX_MAX_RETRIES
+        self.retry_delay = EDX_RETRY_DELAY
+        self.max_retry_delay = EDX_MAX_RETRY_DELAY
+        # SQLite locks the whole database while a page is written: the parse
+        # stage waits for the write instead of failing with "database is locked"
+        self.db_lock = threading.Lock() if connection.vendor == 'sqlite' else contextlib.nullcontext()
 
     def import_all_courses(self, max_pages=None, search_query=None, org_filter=None):
         """
         Import all courses from edX.
 
+        Progress is checkpointed after every page, so a run that is
+        interrupted resumes after its last completed page.
+
         Args:
             max_pages (int): Maximum number of pages to import (None for all)
             search_query (str): Search query to filter courses
@@ -36,95 +95,285 @@ class EdxProductionImporter(EdxImporterBase):
             dict: Import statistics
         """
         logger.info("Starting edX production import")
-        self.reset_stats()
+        return self._import_pages(
+            f'search:{search_query or ""}|org:{org_filter or ""}',
+            1, max_pages, search_query, org_filter
+        )
 
-        page = 1
-        total_imported = 0
+    def count_pages(self, max_pages=None, search_query=None, org_filter=None):
+        """
+        Number of course list pages, at most ``max_pages``.
+        """
+        courses_data = self.api.courses(page=1, page_size=100, search=search_query, org=org_filter)
+        pagination = courses_data.get('pagination', courses_data)
+        page_count = pagination.get('num_pages') or -(-(pagination.get('count') or 0) // 100)
+        return min(page_count, max_pages) if max_pages else page_count
 
-        try:
-            while True:
-                if max_pages and page > max_pages:
-                    logger.info(f"Reached maximum pages limit: {max_pages}")
-                    break
+    def import_page_range(self, first_page, last_page, search_query=None, org_filter=None):
+        """
+        Import the course list pages ``first_page..last_page``.
 
-                logger.info(f"Importing page {page}")
+        Used by the tasks that split one import over several workers; each
+        range has its own checkpoint.
 
-                try:
-                    # Fetch courses from API
-                    courses_data = self.api.courses(
-                        page=page,
-                        page_size=100,
-                        search=search_query,
-                        org=org_filter
-                    )
+        Args:
+            first_page (int): First page to import
+            last_page (int): Last page to import, inclusive
+            search_query (str): Search query to filter courses
+            org_filter (str): Organization filter
 
-                    # Check if we have results
-                    results = courses_data.get('results', [])
-                    if not results:
-                        logger.info(f"No more courses found on page {page}")
-                        break
+        Returns:
+            dict: Import statistics of the range
+        """
+        logger.info(f"Importing edX pages {first_page}-{last_page}")
+        return self._import_pages(
+            self.range_scope(search_query, org_filter, first_page, last_page),
+            first_page, last_page, search_query, org_filter
+        )
 
-                    # Process each course
-                    for course_data in results:
-                        self.stats['processed'] += 1
+    @staticmethod
+    def range_scope(search_query=None, org_filter=None, first_page=None, last_page=None):
+        """
+        Checkpoint scope of a page range; without bounds, the prefix of the
+        scopes of all ranges of the same filters.
+        """
+        scope = f'search:{search_query or ""}|org:{org_filter or ""}|pages:'
+        return f'{scope}{first_page}-{last_page}' if first_page else scope
 
-                        parsed_data = self.parse_course_data(course_data)
-                        if parsed_data:
-                            course, created = self.create_or_update_course(parsed_data)
-                            if course:
-                                total_imported += 1
-                        else:
-                            self.stats['skipped'] += 1
+    def prune_range_checkpoints(self, ranges, search_query=None, org_filter=None):
+        """
+        Delete the checkpoints of page ranges of an earlier split of the same
+        import, which no task would ever resume; their pages belong to
+        ``ranges`` now.
 
-                    # Check pagination
-                    next_page = courses_data.get('next')
-                    if not next_page:
-                        logger.info("No more pages available")
-                        break
+        Args:
+            ranges (list): ``(first_page, last_page)`` tuples of the run
+            search_query (str): Search query to filter courses
+            org_filter (str): Organization filter
+        """
+        prune_checkpoints(self.get_or_create_provider(), self.range_scope(search_query, org_filter), [
+            self.range_scope(search_query, org_filter, first_page, last_page) for first_page, last_page in ranges
+        ])
 
-                    page += 1
+    def _import_pages(self, scope, first_page, last_page, search_query, org_filter):
+        """
+        Import pages through three stages that overlap.
 
-                    # Rate limiting
-                    if page % 10 == 0:  # Log progress every 10 pages
-                        logger.info(f"Progress: {total_imported} courses imported so far")
+        A fetch thread requests upcoming pages while ``next`` links remain, a
+        parse thread drops unchanged courses and parses the rest, and this
+        thread writes one batch per page and checkpoints it. Bounded queues
+        of ``EDX_PREFETCH_PAGES`` pages between the stages hold back the
+        stages in front when the ones behind fall behind.
+        """
+        self.reset_stats()
 
-                    time.sleep(self.rate_limit_delay)
+        checkpoint = start_checkpoint(self.get_or_create_provider(), scope)
+        self.stats.update(checkpoint_stats(checkpoint))
+        writer = self.create_course_writer()
+        writer.stats.update(created=self.stats['created'], updated=self.stats['updated'])
+
+        fetched = queue.Queue(maxsize=EDX_PREFETCH_PAGES)
+        parsed = queue.Queue(maxsize=EDX_PREFETCH_PAGES)
+        stop = threading.Event()
+        stages = [
+            threading.Thread(target=self._fetch_pages, daemon=True, args=(
+                fetched, stop, max(first_page, checkpoint.last_page + 1), last_page, search_query, org_filter
+            )),
+            threading.Thread(target=self._parse_pages, daemon=True, args=(fetched, parsed, stop)),
+        ]
+        for stage in stages:
+            stage.start()
 
+        try:
+            for page in iter(lambda: _get(parsed, stop), _DONE):
+                self.stats['retries'] += page.retries
+                if page.error:
+                    self.stats['errors'] += 1
+                    # The checkpoint stays open, so the next run resumes here
+                    logger.error(f"Page {page.number} failed, stopping: {page.error}")
+                    break
+                if page.last and not page.courses and not page.unchanged and not page.skipped:
+                    logger.info(f"No more courses found on page {page.number}")
+                    finish_checkpoint(checkpoint)
+                    break
+
+                try:
+                    self._write_page(writer, checkpoint, page)
                 except Exception as e:
-                    logger.error(f"Error importing page {page}: {e}")
+                    # The checkpoint stays open, so the next run resumes here
                     self.stats['errors'] += 1
+                    logger.error(f"Error writing page {page.number}, stopping: {e}")
+                    break
 
-                    # Retry logic
-                    if self._should_retry(page):
-                        logger.info(f"Retrying page {page} after {self.retry_delay} seconds")
-                        time.sleep(self.retry_delay)
-                        continue
-                    else:
-                        logger.error(f"Max retries reached for page {page}, skipping")
-                        break
+                if page.number % 10 == 0:  # Log progress every 10 pages
+                    logger.info(f"Progress: {self.stats['created'] + self.stats['updated']} courses imported "
+                                f"so far, {self.api.rate_limiter.rate:.1f} requests/s")
+                if page.last:
+                    logger.info(f"Reached last page: {page.number}")
+                    finish_checkpoint(checkpoint)
+                    break
+            else:
+                # Resumed past the last page
+                finish_checkpoint(checkpoint)
 
-            logger.info(f"edX production import completed. Total imported: {total_imported}")
+            logger.info(f"edX production import completed. "
+                        f"Total imported: {self.stats['created'] + self.stats['updated']}")
             self.log_stats()
+            finish_import()
 
         except Exception as e:
             logger.error(f"Critical error during edX import: {e}")
             self.stats['errors'] += 1
 
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.join()
+
         return self.stats
 
-    def _should_retry(self, page):
+    def _write_page(self, writer, checkpoint, page):
+        """
+        Write the courses of a parsed page and checkpoint it.
+
+        Both happen in one transaction, together with the taxonomy rows and
+        search documents of the page: when writing fails nothing of the page
+        is kept, the writer drops its queued courses, the taxonomy of the run
+        is reloaded and the error is raised, so that the page is imported
+        again on resume.
+
+        Args:
+            writer (CourseBatchWriter): Writer of the courses
+            checkpoint (ImportCheckpoint): Checkpoint of the run
+            page (ParsedPage): Page from the parse stage
+        """
+        written = dict(writer.stats)
+        try:
+            # Search documents are refreshed before the transaction commits
+            # the page with its checkpoint
+            with self.db_lock, transaction.atomic(), defer_search_updates():
+                self.prefetch_taxonomy([categories for _, categories in page.courses])
+                for course, categories in page.courses:
+                    writer.add(course, *self.course_taxonomy(categories))
+                writer.flush()
+                # Courses the writer could not write, since the last page
+                self.stats['errors'] += writer.stats['failed']
+                writer.stats['failed'] = 0
+                self.stats['processed'] += len(page.courses) + page.unchanged + page.skipped
+                self.stats['unchanged'] += page.unchanged
+                self.stats['skipped'] += page.skipped
+                self.stats.update(created=writer.stats['created'], updated=writer.stats['updated'])
+                save_checkpoint(checkpoint, page.number, self.stats, cursor=page.next)
+        except Exception:
+            # Counts of batches and taxonomy rows that were rolled back
+            writer.pending.clear()
+            writer.stats.update(written)
+            self.taxonomy = TaxonomyResolver()
+            raise
+
+    def _fetch_pages(self, fetched, stop, page, last_page, search_query, org_filter):
+        """
+        Fetch stage: put the pages from ``page`` on into ``fetched``.
+
+        Failed requests are retried with backoff; a page that still fails
+        is passed on with its error and ends the stage.
+        """
+        attempt = 0
+        try:
+            while not stop.is_set() and not (last_page and page > last_page):
+                try:
+                    courses_data = self.api.courses(
+                        page=page,
+                        page_size=100,
+                        search=search_query,
+                        org=org_filter
+                    )
+                except Exception as e:
+                    logger.error(f"Error fetching page {page}: {e}")
+                    if self._should_retry(attempt):
+                        delay = self._retry_delay(attempt)
+                        attempt += 1
+                        logger.info(f"Retrying page {page} in {delay:.1f} seconds "
+                                    f"(attempt {attempt} of {self.max_retries})")
+                        stop.wait(delay)
+                        continue
+                    _put(fetched, FetchedPage(page, None, attempt, e), stop)
+                    break
+
+                last = not courses_data.get('results') or not courses_data.get('next') or page == last_page
+                if not _put(fetched, FetchedPage(page, courses_data, attempt, None), stop) or last:
+                    break
+                page += 1
+                attempt = 0
+        except Exception as e:
+            logger.error(f"Error fetching page {page}: {e}")
+            _put(fetched, FetchedPage(page, None, attempt, e), stop)
+        finally:
+            _put(fetched, _DONE, stop)
+
+    def _parse_pages(self, fetched, parsed, stop):
+        """
+        Parse stage: drop unchanged courses of the pages in ``fetched`` and
+        put the others into ``parsed`` as unsaved courses.
+        """
+        number = 0
+        try:
+            for fetched_page in iter(lambda: _get(fetched, stop), _DONE):
+                number = fetched_page.number
+                if fetched_page.data is None:
+                    _put(parsed, ParsedPage(fetched_page.number, [], 0, 0, None, True,
+                                            fetched_page.retries, fetched_page.error), stop)
+                    continue
+
+                results = fetched_page.data.get('results', [])
+                next_page = fetched_page.data.get('next')
+                # Courses whose data did not change since the last import
+                # are neither parsed nor written.
+                with self.db_lock:
+                    changed, unchanged = self.split_unchanged(results) if results else ([], 0)
+                courses, skipped = [], 0
+                for course_data in changed:
+                    parsed_data = self.parse_course_data(course_data)
+                    if parsed_data:
+                        courses.append((self.build_course(parsed_data), parsed_data['categories']))
+                    else:
+                        skipped += 1
+                _put(parsed, ParsedPage(fetched_page.number, courses, unchanged, skipped, next_page,
+                                        not results or not next_page, fetched_page.retries, None), stop)
+        except Exception as e:
+            logger.error(f"Error parsing edX pages: {e}")
+            _put(parsed, ParsedPage(number, [], 0, 0, None, True, 0, e), stop)
+        finally:
+            _put(parsed, _DONE, stop)
+            connection.close()
+
+    def _should_retry(self, attempt):
         """
         Determine if we should retry a failed page.
 
         Args:
-            page (int): Page number
+            attempt (int): Retries of the page so far
 
         Returns:
             bool: Whether to retry
         """
-        # Simple retry logic - could be enhanced with exponential backoff
-        return page <= self.max_retries
+        return attempt < self.max_retries
+
+    def _retry_delay(self, attempt):
+        """
+        Exponential backoff before retry ``attempt`` of a page, with
+        jitter so that parallel workers do not retry in lockstep.
+
+        Args:
+            attempt (int): Retries of the page so far
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
 
+    @defer_search_updates()
     def import_course_by_id(self, course_id):
         """
         Import a specific course by its ID.
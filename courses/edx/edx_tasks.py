@@ -4,20 +4,28 @@ Background tasks for edX course import operations.
 """
 
 import logging
-from celery import shared_task
+import os
+from celery import chord, shared_task
 from django.core.mail import send_mail
 from django.conf import settings
+from courses.importing import FAILED_RANGE_STATS, merge_import_stats, page_ranges
 from .edx_production_importer import EdxProductionImporter
 from .edx_test_importer import EdxTestImporter
 
 logger = logging.getLogger(__name__)
 
+# Course list pages imported per task by the parallel import
+EDX_PAGES_PER_TASK = int(os.getenv('EDX_PAGES_PER_TASK', 5))
 
-@shared_task(bind=True)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=5 * 60, acks_late=True, reject_on_worker_lost=True)
 def import_edx_courses_task(self, max_pages=None, search_query=None, org_filter=None):
     """
     Celery task to import courses from edX.
 
+    Retries, and redeliveries after a lost worker, resume the import after
+    the last page it completed.
+
     Args:
         max_pages (int): Maximum number of pages to import
         search_query (str): Search query to filter courses
@@ -43,12 +51,85 @@ def import_edx_courses_task(self, max_pages=None, search_query=None, org_filter=
         return stats
 
     except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
         logger.error(f"edX course import task failed: {e}")
         # Send failure email
         _send_import_failure_email('edX', str(e))
         raise
 
 
+@shared_task(bind=True, name='courses.import_edx_courses_parallel')
+def import_edx_courses_parallel_task(self, max_pages=None, search_query=None, org_filter=None,
+                                     pages_per_task=None):
+    """
+    Celery task to import courses from edX on all workers.
+
+    Counts the pages of the course list and imports every range of
+    ``pages_per_task`` pages in its own task; a chord callback adds up
+    their statistics and sends the completion email.
+
+    Args:
+        max_pages (int): Maximum number of pages to import
+        search_query (str): Search query to filter courses
+        org_filter (str): Organization filter
+        pages_per_task (int): Pages per task (default: EDX_PAGES_PER_TASK)
+
+    Returns:
+        dict: Number of pages and of page range tasks
+    """
+    importer = EdxProductionImporter()
+    page_count = importer.count_pages(max_pages, search_query, org_filter)
+    ranges = page_ranges(page_count, pages_per_task or EDX_PAGES_PER_TASK)
+    importer.prune_range_checkpoints(ranges, search_query, org_filter)
+    logger.info(f"Importing {page_count} edX pages in {len(ranges)} tasks")
+    if not ranges:
+        return finish_edx_import_task([])
+
+    chord(
+        import_edx_page_range_task.s(first_page, last_page, search_query, org_filter)
+        for first_page, last_page in ranges
+    )(finish_edx_import_task.s())
+    return {'pages': page_count, 'tasks': len(ranges)}
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60, acks_late=True, reject_on_worker_lost=True)
+def import_edx_page_range_task(self, first_page, last_page, search_query=None, org_filter=None):
+    """
+    Celery task to import one page range of a parallel edX import.
+
+    A retry resumes after the last page of the range it completed.
+
+    Returns:
+        dict: Import statistics of the range
+    """
+    try:
+        return EdxProductionImporter().import_page_range(first_page, last_page, search_query, org_filter)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        logger.error(f"edX pages {first_page}-{last_page} failed: {e}")
+        # Return the failure instead of raising, so that the chord callback
+        # still reports the other ranges.
+        return dict(FAILED_RANGE_STATS)
+
+
+@shared_task
+def finish_edx_import_task(results):
+    """
+    Chord callback of a parallel edX import.
+
+    Args:
+        results (list): Import statistics of every page range
+
+    Returns:
+        dict: Import statistics of the whole import
+    """
+    stats = merge_import_stats(results)
+    _send_import_completion_email('edX', stats)
+    return stats
+
+
 @shared_task(bind=True)
 def import_edx_course_by_id_task(self, course_id):
     """
@@ -207,6 +288,8 @@ def _send_import_completion_email(platform, stats):
     - Updated: {stats.get('updated', 0)}
     - Errors: {stats.get('errors', 0)}
     - Skipped: {stats.get('skipped', 0)}
+    - Unchanged: {stats.get('unchanged', 0)}
+    - Failed page ranges: {stats.get('failed_ranges', 0)}
 
     Total courses in database: {stats.get('created', 0) + stats.get('updated', 0)}
     """
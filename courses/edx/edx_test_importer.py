@@ -7,6 +7,7 @@ import logging
 import json
 import os
 from django.conf import settings
+from courses.search import defer_search_updates
 from .edx_import_base import EdxImporterBase
 
 logger = logging.getLogger(__name__)
@@ -28,6 +29,7 @@ class EdxTestImporter(EdxImporterBase):
             'AdelaideX/HumBio101x/1T2015',  # Human Biology: The Fundamentals
         ]
 
+    @defer_search_updates()
     def import_test_courses(self):
         """
         Import test courses from edX.
@@ -72,6 +74,7 @@ class EdxTestImporter(EdxImporterBase):
 
         return self.stats
 
+    @defer_search_updates()
     def import_sample_courses(self, limit=10):
         """
         Import a sample of recent/popular courses for testing.
@@ -173,6 +176,7 @@ class EdxTestImporter(EdxImporterBase):
             }
         ]
 
+    @defer_search_updates()
     def import_mock_courses(self):
         """
         Import mock courses for testing when API is not available.
@@ -221,7 +225,7 @@ class EdxTestImporter(EdxImporterBase):
         for course_id in test_course_ids:
             try:
                 course = Course.objects.get(
-                    course_id=course_id,
+                    external_id=course_id,
                     provider=provider
                 )
                 course.delete()
@@ -0,0 +1,224 @@
+"""
+On-disk HTTP cache for the course provider API clients.
+
+``CachingHTTPAdapter`` is mounted on the ``requests`` session of a client
+and caches successful GET responses by URL (query parameters included).
+A response younger than the TTL is served without a request; an older one
+is revalidated with ``If-None-Match``/``If-Modified-Since`` so that an
+unchanged resource costs a 304 instead of its body. The cache directory
+is bounded in size and evicts the least recently used responses first.
+
+Each entry is one file: a JSON header line with the validators and
+response headers, followed by the raw body.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache(object):
+    """
+    Size-bounded store of response bodies in ``directory``.
+
+    Reads touch the entry's modification time, which eviction uses as its
+    recency; entries are evicted oldest first once the directory holds more
+    than ``max_bytes``. Several processes may share one directory.
+    """
+
+    def __init__(self, directory, ttl, max_bytes):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.stats = {'fresh': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0}
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url):
+        """The cached entry of ``url`` as ``(meta, body)``, or ``None``."""
+        path = self._path(self.key(url))
+        try:
+            with open(path, 'rb') as entry:
+                meta = json.loads(entry.readline().decode('utf-8'))
+                body = entry.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def is_fresh(self, meta):
+        return self.ttl > 0 and time.time() - meta['stored_at'] < self.ttl
+
+    def set(self, url, headers, body):
+        """Store ``body`` with the validators and headers of its response."""
+        path = self._path(self.key(url))
+        meta = {
+            'url': url,
+            'stored_at': time.time(),
+            'headers': {name: headers[name] for name in STORED_HEADERS if name in headers},
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(json.dumps(meta).encode('utf-8') + b'\n')
+                entry.write(body)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        self.record('stored')
+        self._grow(os.path.getsize(path) - previous)
+
+    def touch(self, url):
+        """Restart the TTL of ``url`` after the server confirmed it unchanged."""
+        cached = self.get(url)
+        if cached is not None:
+            meta, body = cached
+            self.set(url, meta['headers'], body)
+
+    def record(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return entries
+
+    def _grow(self, delta):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += delta
+            if self._size <= self.max_bytes:
+                return
+            # Other processes write to the same directory: evict on a fresh
+            # listing, down to 90% of the limit.
+            entries = sorted(self._entries())
+            self._size = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= size
+                self.stats['evicted'] += 1
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` that answers GET requests from an ``HttpCache``.
+
+    ``rate_limiter`` is acquired before every request sent to the server,
+    revalidations included; fresh responses from the cache are not paced.
+    Responses from the server carry their ``latency`` in seconds, without
+    the wait for the rate limiter.
+    """
+
+    def __init__(self, cache, *args, rate_limiter=None, **kwargs):
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+
+    def _send(self, request, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        response.latency = time.perf_counter() - start
+        return response
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET' or self.cache is None:
+            return self._send(request, **kwargs)
+
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            meta, body = cached
+            if self.cache.is_fresh(meta):
+                self.cache.record('fresh')
+                return self._cached_response(request, meta, body)
+            if 'ETag' in meta['headers']:
+                request.headers['If-None-Match'] = meta['headers']['ETag']
+            if 'Last-Modified' in meta['headers']:
+                request.headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self._send(request, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            # Release the connection of the empty 304 back to the pool
+            response.close()
+            self.cache.record('revalidated')
+            self.cache.touch(request.url)
+            revalidated = self._cached_response(request, *cached)
+            revalidated.latency = response.latency
+            return revalidated
+        if response.status_code == 200:
+            try:
+                self.cache.set(request.url, response.headers, response.content)
+            except OSError as e:
+                logger.warning(f"Could not cache {request.url}: {e}")
+        return response
+
+    def _cached_response(self, request, meta, body):
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response._content = body
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """The process-wide provider response cache, or ``None`` when disabled."""
+    global _cache
+    if not getattr(settings, 'PROVIDER_HTTP_CACHE', False):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                settings.PROVIDER_HTTP_CACHE_DIR,
+                settings.PROVIDER_HTTP_CACHE_TTL,
+                settings.PROVIDER_HTTP_CACHE_MAX_BYTES,
+            )
+    return _cache
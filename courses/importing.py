@@ -0,0 +1,647 @@
+"""
+Shared helpers for the course importers.
+
+``CourseBatchWriter`` collects parsed, unsaved ``Course`` objects and
+writes them in batches: one ``IN`` query finds the rows that already
+exist, new rows go in with ``bulk_create``, changed rows with
+``bulk_update``, and category, subcategory and topic links through
+``sync_course_links``.
+
+``sync_course_links`` compares the wanted links of a batch of courses
+with the rows of each through table, read with one query, and applies the
+difference with one bulk insert and one bulk delete, so links that did
+not change are not rewritten.
+
+Bulk writes bypass the model signals, so the writer refreshes the search
+documents and purges the cached pages of every course it touched itself.
+
+Each course stores a fingerprint of the provider payload it was imported
+from; ``split_unchanged`` compares a page of payloads against them with
+one query so that unchanged courses are neither parsed nor written.
+
+``TaxonomyResolver`` loads all categories, subcategories and topics once
+per run and resolves titles in memory; titles it does not know are created
+together with one ``bulk_create(ignore_conflicts=True)``, so that parallel
+workers creating the same title do not fail.
+
+Paged imports record their progress in an ``ImportCheckpoint`` after
+every page, so a run that dies is resumed after its last completed page.
+``page_ranges`` and ``merge_import_stats`` split a run into page ranges
+imported by parallel tasks and add their statistics back up;
+``prune_checkpoints`` drops the checkpoints of ranges from an earlier split.
+Every finished import calls ``finish_import`` to refresh the data derived
+from the whole catalogue.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import autocomplete
+from .cache import (COURSE_CATEGORY_LINKS_KEY, invalidate_links, invalidate_popular_course_pool,
+                    refresh_popular_course_pool)
+from .models import Category, Course, ImportCheckpoint, SubCategory, Topic
+from .page_cache import (CATEGORY_TAG, COURSE_TAG, SUBCATEGORY_TAG, TAXONOMY_TAG, page_cache_timeout,
+                         purge_page_tags)
+from .search import schedule_search_refresh
+from .utils import random_string_generator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_BATCH_SIZE = 200
+
+# Fields refreshed on courses that already exist; everything else is only
+# written when a course is created.
+DEFAULT_UPDATE_FIELDS = ('num_subscribers', 'is_popular', 'rating', 'num_reviews', 'video_url',
+                         'source_fingerprint')
+
+M2M_FIELDS = ('category', 'subcategory', 'topic')
+
+# Seconds between the end of an import and the rebuild of the related
+# courses index; the imports finishing meanwhile share that rebuild.
+RELATED_REBUILD_DELAY = 5 * 60
+RELATED_REBUILD_KEY = 'related-courses:rebuild-scheduled'
+
+# Import statistics kept on a checkpoint
+CHECKPOINT_COUNTS = ('processed', 'created', 'updated', 'unchanged', 'skipped', 'errors')
+
+
+def fingerprint(payload):
+    """
+    Stable hash of a provider payload.
+
+    Keys are sorted and whitespace is dropped, so payloads that only differ
+    in key order or formatting hash the same.
+    """
+    normalised = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+
+def split_unchanged(provider, payloads):
+    """
+    Drop the payloads whose course was imported from the same content.
+
+    Args:
+        provider (Provider): Provider the payloads come from
+        payloads (dict): Raw payloads by external id
+
+    Returns:
+        tuple: (changed, unchanged) where ``changed`` maps external ids to
+        ``(payload, fingerprint)`` and ``unchanged`` is the number of
+        payloads dropped
+    """
+    fingerprints = {str(external_id): fingerprint(payload) for external_id, payload in payloads.items()}
+    stored = dict(Course.objects.filter(provider=provider, external_id__in=list(fingerprints))
+                                .values_list('external_id', 'source_fingerprint'))
+    changed = {
+        external_id: (payload, fingerprints[str(external_id)])
+        for external_id, payload in payloads.items()
+        if stored.get(str(external_id)) != fingerprints[str(external_id)]
+    }
+    return changed, len(payloads) - len(changed)
+
+
+def _count_field(name):
+    return name if name == 'errors' else 'courses_' + name
+
+
+def start_checkpoint(provider, scope):
+    """
+    Return the checkpoint an import of ``scope`` runs from.
+
+    The checkpoint of a run that did not finish is resumed; a finished one
+    is reset so that the run starts over from the first page. A new run
+    records the number of courses of the provider as ``initial_count``.
+    """
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(
+        provider=provider, scope=scope[:255], defaults={'started': timezone.now()},
+    )
+    if checkpoint.finished is not None:
+        checkpoint.last_page = 0
+        checkpoint.cursor = None
+        for name in CHECKPOINT_COUNTS:
+            setattr(checkpoint, _count_field(name), 0)
+        checkpoint.initial_count = None
+        checkpoint.started = timezone.now()
+        checkpoint.finished = None
+    elif not created:
+        logger.info(f"Resuming {provider} import of {scope} after page {checkpoint.last_page}")
+    if checkpoint.initial_count is None:
+        checkpoint.initial_count = Course.objects.filter(provider=provider).count()
+        checkpoint.save()
+    return checkpoint
+
+
+def checkpoint_stats(checkpoint):
+    """Import statistics recorded on ``checkpoint``, by ``CHECKPOINT_COUNTS`` name."""
+    return {name: getattr(checkpoint, _count_field(name)) for name in CHECKPOINT_COUNTS}
+
+
+def save_checkpoint(checkpoint, page, stats, cursor=None):
+    """
+    Record ``page`` as completed.
+
+    Args:
+        checkpoint (ImportCheckpoint): Checkpoint of the run
+        page (int): Last completed page
+        stats (dict): Statistics of the run so far, by ``CHECKPOINT_COUNTS`` name
+        cursor (str): URL of the next page, for cursor paginated APIs
+    """
+    checkpoint.last_page = page
+    checkpoint.cursor = cursor
+    for name in CHECKPOINT_COUNTS:
+        if name in stats:
+            setattr(checkpoint, _count_field(name), stats[name])
+    checkpoint.save()
+
+
+def finish_checkpoint(checkpoint):
+    """Mark the run as complete, so the next one starts from the first page."""
+    checkpoint.finished = timezone.now()
+    checkpoint.save(update_fields=['finished', 'updated'])
+
+
+def finish_import():
+    """
+    Refresh the data derived from the whole catalogue after an import.
+
+    The popular course pool is rebuilt right away. The related-courses
+    index is rebuilt by a Celery task shortly after, so that new courses
+    get related courses without waiting for the daily rebuild.
+    """
+    refresh_popular_course_pool()
+    if not cache.add(RELATED_REBUILD_KEY, True, RELATED_REBUILD_DELAY):
+        return
+    from .tasks import build_related_courses_task
+    try:
+        build_related_courses_task.apply_async(countdown=RELATED_REBUILD_DELAY)
+    except Exception as e:
+        # The import itself succeeded; the daily rebuild will catch up
+        cache.delete(RELATED_REBUILD_KEY)
+        logger.warning(f"Could not schedule the related courses rebuild: {e}")
+
+
+def prune_checkpoints(provider, prefix, scopes):
+    """
+    Delete the checkpoints of ``provider`` under ``prefix`` but ``scopes``.
+
+    Parallel imports checkpoint every page range under a scope with its
+    bounds. Once the page count changes the run is split differently, and
+    the checkpoints of the old ranges would never be resumed or finished.
+
+    Returns:
+        int: Number of checkpoints deleted
+    """
+    stale = ImportCheckpoint.objects.filter(provider=provider, scope__startswith=prefix[:255])
+    return stale.exclude(scope__in=[scope[:255] for scope in scopes]).delete()[0]
+
+
+def page_ranges(page_count, pages_per_range):
+    """
+    Split pages ``1..page_count`` into ranges of ``pages_per_range`` pages.
+
+    Returns:
+        list: ``(first_page, last_page)`` tuples, both inclusive
+    """
+    pages_per_range = max(1, pages_per_range)
+    return [(first, min(first + pages_per_range - 1, page_count))
+            for first in range(1, page_count + 1, pages_per_range)]
+
+
+# Statistics returned by a page range task whose retries ran out, in place
+# of the statistics of the range
+FAILED_RANGE_STATS = {'errors': 1, 'failed_ranges': 1}
+
+
+def merge_import_stats(results):
+    """
+    Add up the statistics of the page ranges of one run.
+
+    Counts are summed. Of nested dicts, such as the API statistics of each
+    range, counts are summed too, while latencies keep the highest value
+    of any range.
+    """
+    merged = {}
+    for stats in results:
+        for key, value in (stats or {}).items():
+            if isinstance(value, dict):
+                nested = merged.setdefault(key, {})
+                for name, number in value.items():
+                    if name.endswith('_ms'):
+                        nested[name] = max(nested.get(name, 0), number)
+                    else:
+                        nested[name] = nested.get(name, 0) + number
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def sync_course_links(links, replace=M2M_FIELDS):
+    """
+    Link courses to exactly the given categories, subcategories and topics.
+
+    Bulk writes bypass ``m2m_changed``, so the search documents of the
+    courses whose links changed are refreshed and the pages of the
+    subcategories that gained or lost courses are purged here.
+
+    Args:
+        links (dict): ``{course_id: {field: ids}}`` for the fields of
+            ``M2M_FIELDS``; a missing field or ``None`` leaves the links of
+            that relation alone
+        replace (tuple): Relations whose links not in ``links`` are
+            removed; links of the other relations are only added
+
+    Returns:
+        set: Ids of the courses whose links changed
+    """
+    changed, subcategory_ids = set(), set()
+    for field in M2M_FIELDS:
+        wanted = {course_id: set(ids[field]) for course_id, ids in links.items() if ids.get(field) is not None}
+        if not wanted:
+            continue
+        through = getattr(Course, field).through
+        target = through._meta.get_field(field).attname
+
+        current, stale = {}, []
+        for pk, course_id, target_id in (through.objects.filter(course_id__in=list(wanted))
+                                                        .values_list('pk', 'course_id', target)):
+            if target_id in wanted[course_id]:
+                current.setdefault(course_id, set()).add(target_id)
+            elif field in replace:
+                stale.append(pk)
+                changed.add(course_id)
+                if field == 'subcategory':
+                    subcategory_ids.add(target_id)
+
+        rows = []
+        for course_id, target_ids in wanted.items():
+            added = target_ids - current.get(course_id, set())
+            if added:
+                changed.add(course_id)
+                rows.extend(through(course_id=course_id, **{target: target_id}) for target_id in added)
+                if field == 'subcategory':
+                    subcategory_ids.update(added)
+
+        if stale:
+            through.objects.filter(pk__in=stale).delete()
+        if rows:
+            through.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+    if changed:
+        schedule_search_refresh(changed)
+    if subcategory_ids and page_cache_timeout():
+        slugs = SubCategory.objects.filter(pk__in=subcategory_ids).values_list('slug', flat=True)
+        purge_page_tags(*(SUBCATEGORY_TAG.format(slug) for slug in slugs))
+    return changed
+
+
+def assign_unique_slugs(courses):
+    """
+    Give every course without a slug a unique one, checking all candidates
+    of a batch with one query per round instead of one per course.
+
+    Works for any model with ``title`` and ``slug`` fields; all instances
+    must be of the same model.
+    """
+    pending = [course for course in courses if not course.slug]
+    if not pending:
+        return
+    model = type(pending[0])
+    taken = set()
+    candidates = {id(course): slugify(course.title)[:250] for course in pending}
+    while pending:
+        existing = set(model.objects.filter(slug__in=candidates.values())
+                                    .values_list('slug', flat=True))
+        retry = []
+        for course in pending:
+            slug = candidates[id(course)]
+            if slug in existing or slug in taken or not slug:
+                candidates[id(course)] = '{slug}-{randstr}'.format(
+                    slug=slugify(course.title)[:245], randstr=random_string_generator(size=4),
+                )
+                retry.append(course)
+            else:
+                course.slug = slug
+                taken.add(slug)
+        candidates = {id(course): candidates[id(course)] for course in retry}
+        pending = retry
+
+
+def normalise_title(title):
+    """Key of a taxonomy title: case and runs of white space do not matter."""
+    return ' '.join((title or '').split()).casefold()
+
+
+class TaxonomyResolver(object):
+    """
+    Categories, subcategories and topics of one import run, by title.
+
+    The first lookup loads every row of the three models into dicts keyed
+    by ``normalise_title``; later lookups are answered from them. The bulk
+    methods create all titles they do not know with one insert per model
+    that skips conflicting rows, then read the rows back, so a title
+    created by another worker in the meantime resolves to that worker's
+    row. Subcategory titles are unique across categories, so a subcategory
+    resolves to the existing row whatever its category.
+
+    Bulk inserts bypass the model signals; the cached links and pages and
+    the autocomplete index are updated for the new rows here.
+    """
+
+    # Attempts at inserting a title whose slug was taken meanwhile
+    MAX_ATTEMPTS = 3
+
+    def __init__(self):
+        self._index = None
+
+    def _load(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        for model, queryset in ((Category, Category.objects.all()),
+                                (SubCategory, SubCategory.objects.select_related('category')),
+                                (Topic, Topic.objects.all())):
+            rows = self._index[model] = {}
+            for instance in queryset.order_by('pk').iterator():
+                rows.setdefault(normalise_title(instance.title), instance)
+
+    def categories(self, titles):
+        """
+        Resolve category titles, creating the missing ones.
+
+        Returns:
+            dict: ``{title: Category}``
+        """
+        return self._resolve(Category, {title: Category(title=title) for title in titles})[0]
+
+    def subcategories(self, items):
+        """
+        Resolve ``(title, category)`` pairs, creating missing subcategories
+        in ``category``.
+
+        Returns:
+            dict: ``{title: SubCategory}``
+        """
+        return self._resolve(SubCategory, {title: SubCategory(title=title, category=category)
+                                           for title, category in items})[0]
+
+    def topics(self, items):
+        """
+        Resolve ``(title, subcategory)`` pairs, creating missing topics; a
+        created topic is linked to ``subcategory`` and its category unless
+        that is ``None``.
+
+        Returns:
+            dict: ``{title: Topic}``
+        """
+        topics, new = self._resolve(Topic, {title: Topic(title=title) for title, _ in items})
+        new_ids = {topic.pk for topic in new}
+        linked = {}
+        for title, subcategory in items:
+            topic = topics.get(title)
+            if subcategory is not None and topic is not None and topic.pk in new_ids:
+                linked.setdefault(topic.pk, (topic, subcategory))
+        linked = list(linked.values())
+        if linked:
+            Topic.category.through.objects.bulk_create([
+                Topic.category.through(topic_id=topic.pk, category_id=subcategory.category_id)
+                for topic, subcategory in linked
+            ], ignore_conflicts=True)
+            Topic.subcategory.through.objects.bulk_create([
+                Topic.subcategory.through(topic_id=topic.pk, subcategory_id=subcategory.pk)
+                for topic, subcategory in linked
+            ], ignore_conflicts=True)
+        return topics
+
+    def category(self, title):
+        return self.categories([title]).get(title)
+
+    def subcategory(self, title, category):
+        return self.subcategories([(title, category)]).get(title)
+
+    def topic(self, title, subcategory=None):
+        return self.topics([(title, subcategory)]).get(title)
+
+    def _resolve(self, model, candidates):
+        self._load()
+        rows = self._index[model]
+        max_length = model._meta.get_field('title').max_length
+        keys, missing = {}, {}
+        for title, instance in candidates.items():
+            # Titles are stored truncated, so they are keyed truncated too
+            instance.title = ' '.join((title or '').split())[:max_length]
+            keys[title] = key = normalise_title(instance.title)
+            if key and key not in rows:
+                missing[key] = instance
+        new = self._create(model, rows, missing) if missing else []
+        return {title: rows.get(key) for title, key in keys.items()}, new
+
+    def _create(self, model, rows, missing):
+        queryset = model.objects.select_related('category') if model is SubCategory else model.objects
+        new = []
+        for attempt in range(self.MAX_ATTEMPTS):
+            assign_unique_slugs(list(missing.values()))
+            model.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            # Rows of this insert or of a worker that inserted them first
+            for instance in queryset.filter(title__in=[instance.title for instance in missing.values()]):
+                key = normalise_title(instance.title)
+                if missing.pop(key, None) is not None:
+                    rows[key] = instance
+                    new.append(instance)
+            if not missing:
+                break
+            # Skipped because another row holds the slug: pick another one
+            for instance in missing.values():
+                instance.slug = None
+        for instance in missing.values():
+            logger.error(f"Could not create {model.__name__} {instance.title}")
+        self._created(model, new)
+        return new
+
+    def _created(self, model, instances):
+        if not instances:
+            return
+        if model is Category:
+            invalidate_links(COURSE_CATEGORY_LINKS_KEY)
+            purge_page_tags(TAXONOMY_TAG)
+        elif model is SubCategory:
+            purge_page_tags(*{CATEGORY_TAG.format(instance.category.slug) for instance in instances})
+        index = autocomplete.loaded_index()
+        if index is not None:
+            kind = {Category: autocomplete.CATEGORY, SubCategory: autocomplete.SUBCATEGORY,
+                    Topic: autocomplete.TOPIC}[model]
+            for instance in instances:
+                index.update_taxonomy(kind, instance)
+
+
+class CourseBatchWriter(object):
+    """
+    Buffer parsed courses of one provider and write them in batches.
+
+    Courses are matched to existing rows by ``match_field`` within the
+    provider, which the ``(provider, external_id)`` unique constraint
+    indexes. Rows imported before they had an external id are adopted by
+    ``legacy_match_field`` and get their external id written. Links of
+    the ``replace_links`` relations are made to match the queued ids; links
+    of the other relations are only added. ``stats`` counts created,
+    updated and failed courses over the lifetime of the writer.
+    """
+
+    def __init__(self, provider, batch_size=DEFAULT_WRITE_BATCH_SIZE,
+                 update_fields=DEFAULT_UPDATE_FIELDS, match_field='external_id',
+                 legacy_match_field=None, replace_links=M2M_FIELDS):
+        self.provider = provider
+        self.batch_size = batch_size
+        self.update_fields = list(update_fields)
+        self.match_field = match_field
+        self.legacy_match_field = legacy_match_field
+        self.replace_links = replace_links
+        self.pending = {}
+        self.stats = {'created': 0, 'updated': 0, 'failed': 0}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, course, categories=(), subcategories=(), topics=()):
+        """
+        Queue an unsaved ``course`` with the ids of its taxonomy; ``None``
+        keeps the links of a relation as they are.
+
+        Returns the flushed ``(course, created)`` pairs when the batch
+        became full, otherwise an empty list.
+        """
+        course.provider = self.provider
+        key = getattr(course, self.match_field)
+        self.pending[key] = (course, {
+            'category': None if categories is None else set(categories),
+            'subcategory': None if subcategories is None else set(subcategories),
+            'topic': None if topics is None else set(topics),
+        })
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """
+        Write the queued courses.
+
+        The batch runs in its own savepoint. When it fails, its courses are
+        written again one by one, each in its own savepoint, so that one bad
+        course does not lose its neighbours; courses that still fail are
+        logged and counted in ``stats['failed']``. A batch of a single course
+        that fails raises.
+
+        Returns:
+            list: ``(course, created)`` pairs of the written courses
+        """
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, {}
+        try:
+            with transaction.atomic():
+                results = self._write(pending)
+        except Exception as e:
+            if len(pending) == 1:
+                raise
+            logger.warning(f"Writing {len(pending)} courses failed ({e}), writing them one by one")
+            results = self._write_each(pending)
+        created = sum(1 for _, was_created in results if was_created)
+        self.stats['created'] += created
+        self.stats['updated'] += len(results) - created
+        logger.info(f"Wrote {len(results)} courses ({created} new)")
+        return results
+
+    def _write_each(self, pending):
+        results = []
+        for key, item in pending.items():
+            # A rolled back insert may have left its primary key behind
+            item[0].pk = None
+            try:
+                with transaction.atomic():
+                    results.extend(self._write({key: item}))
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Error writing course {key}: {e}")
+        return results
+
+    def _existing(self, pending):
+        fields = ('id', 'slug', self.match_field, *self.update_fields)
+        existing = {
+            getattr(course, self.match_field): course
+            for course in Course.objects.filter(provider=self.provider,
+                                                **{self.match_field + '__in': list(pending)})
+                                        .only(*fields)
+        }
+        missing = [course for key, (course, _) in pending.items() if key not in existing]
+        if not self.legacy_match_field or not missing:
+            return existing, set()
+
+        legacy = {}
+        lookup = {
+            self.match_field + '__isnull': True,
+            self.legacy_match_field + '__in': [getattr(course, self.legacy_match_field) for course in missing],
+        }
+        for course in Course.objects.filter(provider=self.provider, **lookup).only(self.legacy_match_field, *fields):
+            legacy.setdefault(getattr(course, self.legacy_match_field), course)
+        adopted = set()
+        for course in missing:
+            current = legacy.pop(getattr(course, self.legacy_match_field), None)
+            if current is not None:
+                key = getattr(course, self.match_field)
+                setattr(current, self.match_field, key)
+                existing[key] = current
+                adopted.add(key)
+        return existing, adopted
+
+    def _write(self, pending):
+        existing, adopted = self._existing(pending)
+
+        to_create, to_update, results = [], [], []
+        # Whether courses join or leave the pool the home page samples from
+        popular_changed = False
+        for key, (course, _) in pending.items():
+            current = existing.get(key)
+            if current is None:
+                to_create.append(course)
+                results.append((course, True))
+                popular_changed |= course.is_popular
+                continue
+            course.pk = current.pk
+            course.slug = current.slug
+            if 'is_popular' in self.update_fields:
+                popular_changed |= current.is_popular != course.is_popular
+            if key in adopted or any(getattr(current, field) != getattr(course, field)
+                                     for field in self.update_fields):
+                for field in self.update_fields:
+                    setattr(current, field, getattr(course, field))
+                to_update.append(current)
+            results.append((course, False))
+
+        if to_create:
+            assign_unique_slugs(to_create)
+            Course.objects.bulk_create(to_create, batch_size=self.batch_size)
+            if any(course.pk is None for course in to_create):
+                # Only some backends return the primary keys of bulk inserts.
+                ids = dict(Course.objects.filter(provider=self.provider,
+                                                 **{self.match_field + '__in': [
+                                                     getattr(course, self.match_field) for course in to_create
+                                                 ]})
+                                         .values_list(self.match_field, 'id'))
+                for course in to_create:
+                    course.pk = ids[getattr(course, self.match_field)]
+        if to_update:
+            update_fields = self.update_fields + ([self.match_field] if adopted else [])
+            Course.objects.bulk_update(to_update, update_fields, batch_size=self.batch_size)
+
+        sync_course_links({course.pk: links for course, links in pending.values()}, self.replace_links)
+
+        schedule_search_refresh([course.pk for course, _ in results])
+        purge_page_tags(*(COURSE_TAG.format(course.slug) for course, _ in results))
+        if popular_changed:
+            invalidate_popular_course_pool()
+        return results
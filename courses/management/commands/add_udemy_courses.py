@@ -1,8 +1,26 @@
 from django.core.management.base import BaseCommand, CommandError
 from courses.udemy.tasks import udemy
+from courses.udemy.tasks_celery import import_udemy_courses_parallel_task
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Courses committed per batch (default: UDEMY_WRITE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Split the import into page range tasks run by the Celery workers',
+        )
+
     def handle(self, *args, **options):
-        udemy()
-        return 'success'
\ No newline at end of file
+        if options['parallel']:
+            task = import_udemy_courses_parallel_task.delay(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Parallel import task started: {task.id}'))
+            return
+        udemy(batch_size=options['batch_size'])
+        return 'success'
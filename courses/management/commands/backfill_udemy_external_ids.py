@@ -0,0 +1,33 @@
+"""
+Management command to set the Udemy id of courses imported before
+courses had an external id.
+"""
+
+from django.core.management.base import BaseCommand
+
+from courses.udemy.importer import UdemyProductionImporter
+
+
+class Command(BaseCommand):
+    help = 'Backfill the external id of Udemy courses from the Udemy course list'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            default='Teaching+%26+Academics',
+            help='Udemy category to page through (default: Teaching+%%26+Academics)',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=101,
+            help='Maximum number of course list pages to process (default: 101)',
+        )
+
+    def handle(self, *args, **options):
+        updated = UdemyProductionImporter().backfill_external_ids(
+            options['category'], max_pages=options['max_pages']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Backfilled the external id of {updated} Udemy courses')
+        )
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the related-courses index used by the
+course detail page.
+"""
+
+from django.core.management.base import BaseCommand
+
+from courses.related import RELATED_COURSES_PER_COURSE, build_related_courses
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed related courses of every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=RELATED_COURSES_PER_COURSE,
+            help=f'Related courses to keep per course (default: {RELATED_COURSES_PER_COURSE})',
+        )
+
+    def handle(self, *args, **options):
+        written = build_related_courses(top_n=options['top'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Related courses index rebuilt: {written} rows')
+        )
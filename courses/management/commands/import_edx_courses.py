@@ -8,6 +8,7 @@ from courses.edx.edx_production_importer import EdxProductionImporter
 from courses.edx.edx_test_importer import EdxTestImporter
 from courses.edx.edx_tasks import (
     import_edx_courses_task,
+    import_edx_courses_parallel_task,
     import_edx_course_by_id_task,
     import_edx_organization_task,
     import_edx_test_courses_task,
@@ -70,6 +71,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Run import asynchronously using Celery'
         )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Split the import into page range tasks run by all Celery workers (production mode)'
+        )
 
     def handle(self, *args, **options):
         mode = options['mode']
@@ -96,7 +102,16 @@ class Command(BaseCommand):
 
     def _handle_production_import(self, options, async_mode):
         """Handle production import mode."""
-        if options['course_id']:
+        if options['parallel'] and not options['course_id']:
+            task = import_edx_courses_parallel_task.delay(
+                options['max_pages'],
+                options['search'],
+                options['org']
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'Parallel import task started: {task.id}')
+            )
+        elif options['course_id']:
             # Import specific course
             if async_mode:
                 task = import_edx_course_by_id_task.delay(options['course_id'])
@@ -0,0 +1,26 @@
+"""
+Management command to (re)build the course full-text search index.
+Creates the backend specific index if needed and rebuilds the search
+document of every course in chunks.
+"""
+
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.search import REFRESH_CHUNK_SIZE, ensure_search_index, refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents for all courses'
+
+    def handle(self, *args, **options):
+        ensure_search_index()
+
+        course_ids = list(Course.objects.values_list('id', flat=True))
+        for start in range(0, len(course_ids), REFRESH_CHUNK_SIZE):
+            refresh_search_documents(course_ids[start:start + REFRESH_CHUNK_SIZE])
+            self.stdout.write(f'Indexed {min(start + REFRESH_CHUNK_SIZE, len(course_ids))}/{len(course_ids)} courses')
+
+        self.stdout.write(
+            self.style.SUCCESS('Search index rebuilt successfully')
+        )
@@ -27,6 +27,11 @@ class Command(BaseCommand):
             choices=['setup', 'remove', 'list'],
             help='Action to perform: setup cron jobs, remove them, or list current jobs'
         )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Run the weekly import as page range tasks on all workers'
+        )
 
     def handle(self, *args, **options):
         action = options['action']
@@ -37,7 +42,7 @@ class Command(BaseCommand):
 
         try:
             if action == 'setup':
-                self.setup_edx_cron_jobs()
+                self.setup_edx_cron_jobs(options['parallel'])
             elif action == 'remove':
                 self.remove_edx_cron_jobs()
             elif action == 'list':
@@ -46,9 +51,12 @@ class Command(BaseCommand):
         except Exception as e:
             raise CommandError(f'edX cron job operation failed: {e}')
 
-    def setup_edx_cron_jobs(self):
+    def setup_edx_cron_jobs(self, parallel=False):
         """
         Setup periodic tasks for edX course imports.
+
+        Args:
+            parallel (bool): Schedule the parallel import instead of the single task one
         """
         self.stdout.write("Setting up edX cron jobs...")
 
@@ -70,12 +78,11 @@ class Command(BaseCommand):
             self.stdout.write("Created daily schedule")
 
         # Setup edX production import (weekly on Friday at midnight)
-        edx_import_task, created = PeriodicTask.objects.get_or_create(
+        import_task = 'courses.import_edx_courses_parallel' if parallel else 'courses.import_edx_courses'
+        edx_import_task, created = PeriodicTask.objects.update_or_create(
             name='Import edX Courses (Weekly)',
-            task='courses.import_edx_courses',
-            interval=weekly_schedule,
             defaults={
-                'task': 'courses.import_edx_courses',
+                'task': import_task,
                 'interval': weekly_schedule,
                 'enabled': True,
                 'kwargs': '{"max_pages": 50}',  # Limit to 50 pages per weekly run
@@ -83,10 +90,10 @@ class Command(BaseCommand):
         )
         if created:
             self.stdout.write(
-                self.style.SUCCESS("Created edX weekly import task")
+                self.style.SUCCESS(f"Created edX weekly import task ({import_task})")
             )
         else:
-            self.stdout.write("edX weekly import task already exists")
+            self.stdout.write(f"edX weekly import task set to {import_task}")
 
         # Setup edX test cleanup (daily)
         edx_cleanup_task, created = PeriodicTask.objects.get_or_create(
@@ -120,6 +127,7 @@ class Command(BaseCommand):
         removed_count = PeriodicTask.objects.filter(
             task__in=[
                 'courses.import_edx_courses',
+                'courses.import_edx_courses_parallel',
                 'courses.cleanup_edx_test'
             ]
         ).delete()[0]
@@ -137,6 +145,7 @@ class Command(BaseCommand):
         edx_tasks = PeriodicTask.objects.filter(
             task__in=[
                 'courses.import_edx_courses',
+                'courses.import_edx_courses_parallel',
                 'courses.cleanup_edx_test'
             ]
         )
@@ -18,6 +18,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Set up test import task instead of production import',
         )
+        parser.add_argument(
+            '--parallel',
+            action='store_true',
+            help='Split the production import into page range tasks run by all workers',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -34,6 +39,15 @@ class Command(BaseCommand):
             cron_day_of_week = '5'  # Friday
             cron_day_of_month = '*'
             cron_month_of_year = '*'
+        elif options['parallel']:
+            task_name = 'Production Udemy Course Import'
+            task_description = 'Production Udemy course import (parallel page ranges)'
+            task_function = 'courses.import_udemy_courses_parallel'
+            cron_minute = '0'
+            cron_hour = '0'
+            cron_day_of_week = '5'  # Friday
+            cron_day_of_month = '*'
+            cron_month_of_year = '*'
         else:
             task_name = 'Production Udemy Course Import'
             task_description = 'Production Udemy course import (bulk import)'
@@ -1,8 +1,13 @@
 from django.db import models
 from django.conf import settings
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.urls import reverse
 
+from . import autocomplete
+from .cache import COURSE_CATEGORY_LINKS_KEY, COURSE_PROVIDER_LINKS_KEY, invalidate_links
+from .page_cache import (CATEGORY_TAG, COURSE_TAG, SUBCATEGORY_TAG, TAXONOMY_TAG,
+                         page_cache_timeout, purge_page_tags)
+from .search import remove_search_documents, schedule_search_refresh
 from .utils import unique_slug_generator
 
 from django.utils.safestring import mark_safe
@@ -38,6 +43,14 @@ def category_pre_save_receiver(sender, instance, *args, **kwargs):
 pre_save.connect(category_pre_save_receiver, sender=Category)
 
 
+def category_links_changed_receiver(sender, instance, *args, **kwargs):
+    invalidate_links(COURSE_CATEGORY_LINKS_KEY)
+    purge_page_tags(TAXONOMY_TAG, CATEGORY_TAG.format(instance.slug))
+
+post_save.connect(category_links_changed_receiver, sender=Category)
+post_delete.connect(category_links_changed_receiver, sender=Category)
+
+
 class SubCategory(models.Model):
 	category 			= models.ForeignKey(Category, on_delete=models.CASCADE,)
 	title				= models.CharField(max_length=255, unique=True)
@@ -61,6 +74,13 @@ def subcategory_pre_save_receiver(sender, instance, *args, **kwargs):
 pre_save.connect(subcategory_pre_save_receiver, sender=SubCategory)
 
 
+def subcategory_pages_changed_receiver(sender, instance, *args, **kwargs):
+    purge_page_tags(SUBCATEGORY_TAG.format(instance.slug), CATEGORY_TAG.format(instance.category.slug))
+
+post_save.connect(subcategory_pages_changed_receiver, sender=SubCategory)
+post_delete.connect(subcategory_pages_changed_receiver, sender=SubCategory)
+
+
 class Topic(models.Model):
 	title				= models.CharField(max_length=255, unique=True)
 	category 			= models.ManyToManyField(Category,)
@@ -105,6 +125,14 @@ def provider_pre_save_receiver(sender, instance, *args, **kwargs):
 pre_save.connect(provider_pre_save_receiver, sender=Provider)
 
 
+def provider_links_changed_receiver(sender, instance, *args, **kwargs):
+    invalidate_links(COURSE_PROVIDER_LINKS_KEY)
+    purge_page_tags(TAXONOMY_TAG)
+
+post_save.connect(provider_links_changed_receiver, sender=Provider)
+post_delete.connect(provider_links_changed_receiver, sender=Provider)
+
+
 
 
 class Course(models.Model):
@@ -112,6 +140,8 @@ class Course(models.Model):
 	subcategory 	= models.ManyToManyField(SubCategory, blank=True,)
 	topic 			= models.ManyToManyField(Topic, blank=True,)
 	provider 		= models.ForeignKey(Provider, on_delete=models.CASCADE,)
+	external_id		= models.CharField(max_length=255, null=True, blank=True,)
+	source_fingerprint = models.CharField(max_length=64, null=True, blank=True,)
 	image_url       = models.URLField(max_length=500, null=True, blank=True,)
 	video_url 		= models.URLField(max_length=500, null=True, blank=True,)
 	title			= models.CharField(max_length=255)
@@ -134,6 +164,13 @@ class Course(models.Model):
 
 	class Meta:
 		ordering = ["num_subscribers"]
+		indexes = [
+			models.Index(fields=["num_subscribers", "id"]),
+		]
+		constraints = [
+			# The id of the course at its provider; importers match on it.
+			models.UniqueConstraint(fields=["provider", "external_id"], name="unique_course_external_id"),
+		]
 
 	def __str__(self):
 		return str(self.title)
@@ -154,4 +191,145 @@ def course_pre_save_receiver(sender, instance, *args, **kwargs):
     if not instance.slug:
         instance.slug = unique_slug_generator(instance)
 
-pre_save.connect(course_pre_save_receiver, sender=Course)
\ No newline at end of file
+pre_save.connect(course_pre_save_receiver, sender=Course)
+
+
+def course_post_save_receiver(sender, instance, *args, **kwargs):
+    schedule_search_refresh([instance.pk])
+    purge_page_tags(COURSE_TAG.format(instance.slug))
+
+post_save.connect(course_post_save_receiver, sender=Course)
+
+
+def course_post_delete_receiver(sender, instance, *args, **kwargs):
+    remove_search_documents([instance.pk])
+    purge_page_tags(COURSE_TAG.format(instance.slug))
+
+post_delete.connect(course_post_delete_receiver, sender=Course)
+
+
+def course_taxonomy_m2m_changed_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_search_refresh([instance.pk])
+    elif pk_set:
+        schedule_search_refresh(pk_set)
+
+m2m_changed.connect(course_taxonomy_m2m_changed_receiver, sender=Course.category.through)
+m2m_changed.connect(course_taxonomy_m2m_changed_receiver, sender=Course.subcategory.through)
+m2m_changed.connect(course_taxonomy_m2m_changed_receiver, sender=Course.topic.through)
+
+
+def course_subcategory_m2m_changed_receiver(sender, instance, action, reverse, pk_set, *args, **kwargs):
+    # Pages listing a course carry its tag, so only the subcategory pages
+    # a course was added to have to be looked up.
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        purge_page_tags(SUBCATEGORY_TAG.format(instance.slug))
+        return
+    tags = [COURSE_TAG.format(instance.slug)]
+    if pk_set and page_cache_timeout():
+        slugs = SubCategory.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+        tags.extend(SUBCATEGORY_TAG.format(slug) for slug in slugs)
+    purge_page_tags(*tags)
+
+m2m_changed.connect(course_subcategory_m2m_changed_receiver, sender=Course.subcategory.through)
+
+
+def taxonomy_post_save_receiver(sender, instance, created, *args, **kwargs):
+    # A renamed provider, category, subcategory or topic changes the
+    # documents of every course linked to it.
+    if not created:
+        schedule_search_refresh(instance.course_set.values_list('id', flat=True))
+
+post_save.connect(taxonomy_post_save_receiver, sender=Provider)
+post_save.connect(taxonomy_post_save_receiver, sender=Category)
+post_save.connect(taxonomy_post_save_receiver, sender=SubCategory)
+post_save.connect(taxonomy_post_save_receiver, sender=Topic)
+
+
+def course_autocomplete_save_receiver(sender, instance, *args, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.update_course(instance)
+
+def course_autocomplete_delete_receiver(sender, instance, *args, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.remove_course(instance.pk)
+
+post_save.connect(course_autocomplete_save_receiver, sender=Course)
+post_delete.connect(course_autocomplete_delete_receiver, sender=Course)
+
+
+AUTOCOMPLETE_KINDS = {
+    Provider: autocomplete.PROVIDER,
+    Category: autocomplete.CATEGORY,
+    SubCategory: autocomplete.SUBCATEGORY,
+    Topic: autocomplete.TOPIC,
+}
+
+def taxonomy_autocomplete_save_receiver(sender, instance, *args, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.update_taxonomy(AUTOCOMPLETE_KINDS[sender], instance)
+
+def taxonomy_autocomplete_delete_receiver(sender, instance, *args, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.remove_taxonomy(AUTOCOMPLETE_KINDS[sender], instance.pk)
+
+for model in AUTOCOMPLETE_KINDS:
+    post_save.connect(taxonomy_autocomplete_save_receiver, sender=model)
+    post_delete.connect(taxonomy_autocomplete_delete_receiver, sender=model)
+
+
+class CourseSearchDocument(models.Model):
+	course 			= models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+	document		= models.TextField(blank=True)
+	updated     	= models.DateTimeField(auto_now=True,)
+
+	def __str__(self):
+		return str(self.course_id)
+
+
+class RelatedCourse(models.Model):
+	course 			= models.ForeignKey(Course, on_delete=models.CASCADE, related_name='related_links')
+	related 		= models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+	rank			= models.PositiveSmallIntegerField()
+	score			= models.FloatField()
+
+	class Meta:
+		ordering = ['course', 'rank']
+		unique_together = ('course', 'rank')
+
+	def __str__(self):
+		return f'{self.course_id} -> {self.related_id} ({self.rank})'
+
+
+class ImportCheckpoint(models.Model):
+	provider 			= models.ForeignKey(Provider, on_delete=models.CASCADE,)
+	# What the run imports, e.g. a Udemy category or an edX search/org filter
+	scope				= models.CharField(max_length=255,)
+	last_page			= models.PositiveIntegerField(default=0,)
+	cursor				= models.CharField(max_length=500, null=True, blank=True,)
+	courses_processed	= models.PositiveIntegerField(default=0,)
+	courses_created		= models.PositiveIntegerField(default=0,)
+	courses_updated		= models.PositiveIntegerField(default=0,)
+	courses_unchanged	= models.PositiveIntegerField(default=0,)
+	courses_skipped		= models.PositiveIntegerField(default=0,)
+	errors				= models.PositiveIntegerField(default=0,)
+	# Courses of the provider when the run started, kept across resumes for
+	# the completion report
+	initial_count		= models.PositiveIntegerField(null=True, blank=True,)
+	started				= models.DateTimeField()
+	finished			= models.DateTimeField(null=True, blank=True,)
+	updated     		= models.DateTimeField(auto_now=True,)
+
+	class Meta:
+		unique_together = ('provider', 'scope')
+
+	def __str__(self):
+		return f'{self.provider} {self.scope} (page {self.last_page})'
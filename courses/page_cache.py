@@ -0,0 +1,145 @@
+"""
+Full-page cache for anonymous catalogue traffic.
+
+Rendered pages are cached per absolute URL (host, path and query string)
+together with the dependency tags they were built from, e.g. the slug of
+the course they show. Every tag has a version token in the cache; a page
+is only served while the versions it was stored with are still current.
+Purging a tag replaces its token, which drops exactly the pages that
+depend on it without touching the rest of the cache. Purges made inside
+a transaction take effect when it commits, so that no page is rendered
+from the old rows after the purge. Each purge also bumps a generation
+counter, and pages rendered while it changed are served but not stored,
+since they may have read the rows before the purge.
+
+Every page also carries ``TAXONOMY_TAG`` because the navbar and footer
+list the categories and providers. The headers of the response are stored
+with the page and restored when it is served.
+
+The footer form renders ``{% csrf_token %}``. Cached pages are rendered
+with a placeholder instead, and each response gets the token of its own
+request swapped in when it is served.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+PAGE_KEY = 'page:{}'
+PAGE_TAG_KEY = 'page-tag:{}'
+PAGE_GENERATION_KEY = 'page-tag-generation'
+CSRF_PLACEHOLDER = 'PAGE-CACHE-CSRF-TOKEN'
+
+TAXONOMY_TAG = 'taxonomy'
+COURSE_TAG = 'course:{}'
+CATEGORY_TAG = 'category:{}'
+SUBCATEGORY_TAG = 'subcategory:{}'
+POST_TAG = 'post:{}'
+BLOG_CATEGORY_TAG = 'blog-category:{}'
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 0)
+
+
+def purge_page_tags(*tags):
+    """Invalidate every cached page that depends on one of ``tags``."""
+    if page_cache_timeout():
+        transaction.on_commit(lambda: _purge(tags))
+
+
+def _purge(tags):
+    # Bump the generation first: a page that reads the new versions must
+    # also see the new generation.
+    try:
+        cache.incr(PAGE_GENERATION_KEY)
+    except ValueError:
+        cache.set(PAGE_GENERATION_KEY, 1, None)
+    cache.set_many({PAGE_TAG_KEY.format(tag): uuid.uuid4().hex for tag in tags}, page_cache_timeout())
+
+
+def _tag_versions(tags):
+    keys = {PAGE_TAG_KEY.format(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, page_cache_timeout())
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def _page_key(request):
+    return PAGE_KEY.format(hashlib.md5(request.build_absolute_uri().encode()).hexdigest())
+
+
+def _serve(request, content, headers, status=200):
+    content = content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    response = HttpResponse(content, status=status)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class PageCacheMixin(object):
+    """
+    View mixin caching the rendered page for anonymous GET requests.
+
+    Views list the tags their page depends on in ``get_page_cache_tags``.
+    """
+
+    def get_page_cache_tags(self, context):
+        return []
+
+    def page_cacheable(self, request):
+        return (page_cache_timeout() > 0
+                and request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+                # Flash messages belong to the one response that shows them.
+                and not messages.get_messages(request))
+
+    def dispatch(self, request, *args, **kwargs):
+        self.page_cache_key = None
+        if not self.page_cacheable(request):
+            return super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+
+        self.page_cache_key = _page_key(request)
+        page = cache.get(self.page_cache_key)
+        if page is not None:
+            tags = page['tags']
+            if cache.get_many([PAGE_TAG_KEY.format(tag) for tag in tags]) == {
+                PAGE_TAG_KEY.format(tag): version for tag, version in tags.items()
+            }:
+                return _serve(request, page['content'], page['headers'])
+
+        generation = cache.get(PAGE_GENERATION_KEY)
+        response = super(PageCacheMixin, self).dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or not callable(getattr(response, 'render', None)):
+            return response
+
+        response.render()
+        tags = set(self.get_page_cache_tags(response.context_data))
+        tags.add(TAXONOMY_TAG)
+        headers = dict(response.items())
+        if request.method == 'GET':
+            tag_versions = _tag_versions(tags)
+            if cache.get(PAGE_GENERATION_KEY) == generation:
+                cache.set(self.page_cache_key, {
+                    'tags': tag_versions,
+                    'content': response.content,
+                    'headers': headers,
+                }, page_cache_timeout())
+        return _serve(request, response.content, headers)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super(PageCacheMixin, self).get_context_data(*args, **kwargs)
+        if self.page_cache_key is not None:
+            context['csrf_token'] = CSRF_PLACEHOLDER
+        return context
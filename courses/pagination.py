@@ -0,0 +1,222 @@
+"""
+Keyset (cursor) pagination for course listings.
+
+Pages are addressed by an opaque cursor holding the ``(key, id)`` of the
+row they start after (or end before) instead of a page number, so every
+page is an index range scan of the same cost as the first one and no
+``COUNT(*)`` is needed. Rows inserted by a running import only ever show
+up in front of or behind the cursor, never shift the page under it.
+
+The leading key may be NULL. NULL rows sort after every non-NULL value on
+every backend and are fetched as a separate tier, so each query still
+uses a plain range condition.
+"""
+
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+
+
+# Seconds an exact count stands in for an estimate on other backends
+ESTIMATE_CACHE_TIMEOUT = 60 * 5
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(direction, value, pk):
+    payload = json.dumps([direction, value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if direction not in ('n', 'p') or not isinstance(pk, int):
+        raise InvalidCursor('Invalid cursor')
+    if value is not None and not isinstance(value, (int, float)):
+        raise InvalidCursor('Invalid cursor')
+    return direction, value, pk
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count estimate for ``queryset``.
+
+    Uses the planner estimate on PostgreSQL. Elsewhere an exact count is
+    cached for ``ESTIMATE_CACHE_TIMEOUT`` seconds, so that it does not run
+    on every request.
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        # psycopg2 decodes json columns; other drivers may return text
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    key = 'estimate_count:' + hashlib.sha1(repr((sql, params)).encode('utf-8')).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, ESTIMATE_CACHE_TIMEOUT)
+    return count
+
+
+class KeysetPage(object):
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<KeysetPage of %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator(object):
+    """
+    Paginate ``queryset`` by ``(key, pk)`` in ascending order.
+
+    ``page()`` takes the cursor of the previous request (or ``None`` for
+    the first page) and returns a ``KeysetPage`` carrying the cursors of
+    its neighbours.
+    """
+
+    def __init__(self, queryset, per_page, key='num_subscribers'):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.key = key
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = self._forward(None, None)
+            return self._build_page(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=False)
+
+        direction, value, pk = decode_cursor(cursor)
+        if direction == 'n':
+            rows = self._forward(value, pk)
+            return self._build_page(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=True)
+
+        rows = self._backward(value, pk)
+        has_previous = len(rows) > self.per_page
+        rows = list(reversed(rows[:self.per_page]))
+        if not has_previous and len(rows) < self.per_page:
+            # Walked back past the start; show a full first page instead.
+            return self.page()
+        return self._build_page(rows, has_next=True, has_previous=has_previous)
+
+    def estimated_count(self):
+        return estimate_count(self.queryset.order_by())
+
+    def estimated_num_pages(self):
+        count = self.estimated_count()
+        return max(1, -(-count // self.per_page))
+
+    def _build_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor('n', getattr(rows[-1], self.key), rows[-1].pk)
+        if rows and has_previous:
+            previous_cursor = encode_cursor('p', getattr(rows[0], self.key), rows[0].pk)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def _forward(self, value, pk):
+        limit = self.per_page + 1
+        key = self.key
+        rows = []
+        if pk is None or value is not None:
+            qs = self.queryset.filter(**{key + '__isnull': False})
+            if pk is not None:
+                qs = qs.filter(**{key + '__gte': value}).filter(Q(**{key + '__gt': value}) | Q(pk__gt=pk))
+            rows = list(qs.order_by(key, 'pk')[:limit])
+        if len(rows) < limit:
+            qs = self.queryset.filter(**{key + '__isnull': True})
+            if pk is not None and value is None:
+                qs = qs.filter(pk__gt=pk)
+            rows += list(qs.order_by('pk')[:limit - len(rows)])
+        return rows
+
+    def _backward(self, value, pk):
+        limit = self.per_page + 1
+        key = self.key
+        rows = []
+        if value is None:
+            qs = self.queryset.filter(**{key + '__isnull': True}, pk__lt=pk)
+            rows = list(qs.order_by('-pk')[:limit])
+        if len(rows) < limit:
+            qs = self.queryset.filter(**{key + '__isnull': False})
+            if value is not None:
+                qs = qs.filter(**{key + '__lte': value}).filter(Q(**{key + '__lt': value}) | Q(pk__lt=pk))
+            rows += list(qs.order_by('-' + key, '-pk')[:limit - len(rows)])
+        return rows
+
+
+class KeysetPaginationMixin(object):
+    """
+    ListView mixin swapping numbered pages for keyset pagination.
+
+    Falls back to Django's numbered pagination when
+    ``COURSE_LIST_KEYSET_PAGINATION`` is disabled.
+    """
+    keyset_field = 'num_subscribers'
+    cursor_kwarg = 'cursor'
+    estimate_page_count = True
+
+    def keyset_pagination_enabled(self):
+        return getattr(settings, 'COURSE_LIST_KEYSET_PAGINATION', True)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_pagination_enabled():
+            return super(KeysetPaginationMixin, self).paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, key=self.keyset_field)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, *args, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(*args, **kwargs)
+        if not self.keyset_pagination_enabled():
+            if context.get('paginator') is not None:
+                context['page_range'] = context['paginator'].page_range
+            return context
+
+        context['keyset_pagination'] = True
+        # A single page needs no estimate
+        page = context.get('page_obj')
+        if self.estimate_page_count and page is not None and page.has_other_pages():
+            context['estimated_num_pages'] = context['paginator'].estimated_num_pages()
+        return context
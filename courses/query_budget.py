@@ -0,0 +1,82 @@
+"""
+Per-view query budgets.
+
+Views declare how many queries a request may cost with ``query_budget``::
+
+    @query_budget(4)
+    class CourseListView(ListView):
+        ...
+
+When ``QUERY_BUDGET_ENFORCE`` is enabled the queries of the view,
+including lazy template rendering, are counted and ``QueryBudgetExceeded``
+is raised as soon as a request goes over the budget. Enforcement is off by
+default, so production requests pay nothing for the declaration; tests
+turn it on through ``QueryBudgetTestMixin`` of ``courses.tests.utils``.
+
+Budgets are sized for the worst ordinary request: a logged-in user
+(session and user lookups) hitting cold taxonomy caches.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter(object):
+    """``execute_wrapper`` recording the SQL of every query it lets through."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def _enforce_budget(func, max_queries, name):
+    @wraps(func)
+    def inner(*args, **kwargs):
+        if not getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+            return func(*args, **kwargs)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = func(*args, **kwargs)
+            # Template responses run their queries when rendered.
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+        if len(counter.queries) > max_queries:
+            raise QueryBudgetExceeded(
+                '%s ran %d queries, budget is %d:\n%s' % (
+                    name, len(counter.queries), max_queries, '\n'.join(counter.queries),
+                )
+            )
+        return response
+    return inner
+
+
+def query_budget(max_queries):
+    """Declare the query budget of a function view or a class based view."""
+    def decorator(view):
+        if isinstance(view, type):
+            view.query_budget = max_queries
+            view.dispatch = _enforce_budget(view.dispatch, max_queries, view.__qualname__)
+            return view
+        wrapped = _enforce_budget(view, max_queries, view.__qualname__)
+        wrapped.query_budget = max_queries
+        return wrapped
+    return decorator
+
+
+def get_query_budget(view):
+    """Return the budget declared on a resolved view callable, or ``None``."""
+    # Django views expose their class as ``view_class``, DRF viewsets as ``cls``.
+    view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+    if view_class is not None:
+        return getattr(view_class, 'query_budget', None)
+    return getattr(view, 'query_budget', None)
+
@@ -0,0 +1,232 @@
+"""
+Client-side rate limiting for the course provider APIs.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter(object):
+    """
+    Space calls evenly at no more than ``rate`` per second.
+
+    ``acquire`` blocks the calling thread until its turn, so one limiter
+    shared by a pool of workers caps their combined request rate. A rate
+    of ``0`` or ``None`` disables limiting.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class AdaptiveRateLimiter(object):
+    """
+    Token bucket whose rate follows the health of the provider.
+
+    Tokens accrue at ``rate`` per second up to ``burst`` and ``acquire``
+    blocks until one is available. Callers report every response to
+    ``record``: a healthy one raises the rate by ``step`` up to
+    ``max_rate``, while throttling (429, 5xx, connection errors) or a
+    latency of more than ``slow_factor`` times the running average halves
+    it, down to ``min_rate``. A ``Retry-After`` pauses every caller.
+
+    A ``shared`` limiter, acquired after the local token, caps the combined
+    rate of all processes.
+    """
+
+    def __init__(self, rate, max_rate, min_rate=0.2, burst=1, step=0.1, slow_factor=3.0, shared=None):
+        self.shared = shared
+        self.rate = min(rate, max_rate) if max_rate else rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.step = step
+        self.slow_factor = slow_factor
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._latency = None
+
+    def acquire(self):
+        if not self.max_rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+        if self.shared is not None:
+            self.shared.acquire()
+
+    def record(self, latency, status=None, retry_after=None):
+        """
+        Adjust the rate to one response.
+
+        Args:
+            latency (float): Seconds the request took
+            status (int): HTTP status, ``None`` when the request failed
+            retry_after (float): Seconds the provider asked to wait
+        """
+        if not self.max_rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            throttled = status is None or status == 429 or status >= 500
+            slow = self._latency is not None and latency > self.slow_factor * self._latency
+            if throttled or slow:
+                # Concurrent callers see the same overload: halve at most
+                # once per interval between two requests.
+                if now - self._last_decrease >= 1.0 / self.rate:
+                    self.rate = max(self.min_rate, self.rate / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.step)
+            if not throttled:
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RedisRateLimiter(object):
+    """
+    Rate limit shared by every process through Redis.
+
+    Implements the generic cell rate algorithm: ``key`` holds the
+    theoretical arrival time of the next request, and ``acquire`` reserves
+    the next free slot in one atomic script and sleeps until it. Any
+    number of workers together stay at ``rate`` requests per second, with
+    bursts of up to ``burst``. After Redis fails the ``fallback`` limiter
+    of this process is used for ``retry_after`` seconds before Redis is
+    tried again.
+    """
+
+    # Times are in milliseconds on the Redis clock, so that the clocks of
+    # the workers do not matter.
+    SCRIPT = """
+    if redis.replicate_commands then
+        redis.replicate_commands()
+    end
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+    local interval = tonumber(ARGV[1])
+    local tolerance = tonumber(ARGV[2])
+    local tat = now
+    local stored = redis.call('GET', KEYS[1])
+    if stored then
+        tat = math.max(tonumber(stored), now)
+    end
+    local start = math.max(now, tat - tolerance)
+    local next_tat = tat + interval
+    redis.call('SET', KEYS[1], string.format('%.3f', next_tat),
+               'PX', math.ceil(next_tat - now + tolerance) + 1000)
+    return tostring(start - now)
+    """
+
+    def __init__(self, client, key, rate, burst=1, fallback=None, retry_after=30):
+        self.client = client
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.fallback = fallback or RateLimiter(rate)
+        self.retry_after = retry_after
+        self._reserve = client.register_script(self.SCRIPT)
+        self._unavailable_until = 0
+
+    def acquire(self):
+        if not self.rate:
+            return
+        if time.monotonic() < self._unavailable_until:
+            self.fallback.acquire()
+            return
+        interval = 1000.0 / self.rate
+        try:
+            wait = float(self._reserve(keys=[self.key], args=[interval, interval * (self.burst - 1)]))
+        except redis.RedisError as e:
+            logger.warning(f"Rate limit {self.key} unavailable ({e}), limiting this process only "
+                           f"for {self.retry_after:g} seconds")
+            self._unavailable_until = time.monotonic() + self.retry_after
+            self.fallback.acquire()
+            return
+        if wait > 0:
+            time.sleep(wait / 1000.0)
+
+
+_redis_clients = {}
+_redis_lock = threading.Lock()
+
+
+def shared_rate_limiter(provider, credential, rate, burst=1):
+    """
+    Limiter of the requests made to ``provider`` with ``credential``.
+
+    Shared through Redis by every worker when ``RATE_LIMIT_REDIS_URL`` is
+    set, so that ``rate`` is the quota of the credential however many
+    workers import; otherwise it limits this process only.
+
+    Args:
+        provider (str): Provider name
+        credential (str): Client ID or other identity the quota belongs to
+        rate (float): Requests per second
+        burst (int): Requests that may be sent at once
+
+    Returns:
+        RedisRateLimiter or RateLimiter
+    """
+    local = RateLimiter(rate)
+    url = getattr(settings, 'RATE_LIMIT_REDIS_URL', None)
+    if not url:
+        return local
+    timeout = getattr(settings, 'RATE_LIMIT_REDIS_TIMEOUT', 0.5)
+    with _redis_lock:
+        if url not in _redis_clients:
+            _redis_clients[url] = redis.Redis.from_url(url, socket_connect_timeout=timeout,
+                                                       socket_timeout=timeout)
+    # Credentials are hashed so that they do not show up in Redis
+    digest = hashlib.sha256((credential or '').encode('utf-8')).hexdigest()[:16]
+    return RedisRateLimiter(_redis_clients[url], f'ratelimit:{provider}:{digest}', rate, burst, fallback=local,
+                            retry_after=getattr(settings, 'RATE_LIMIT_REDIS_RETRY', 30))
+
+
+def parse_retry_after(value, maximum):
+    """Seconds to wait from a ``Retry-After`` header, at most ``maximum``."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0), maximum)
@@ -0,0 +1,203 @@
+"""
+Offline related-courses index.
+
+Every course is turned into a sparse feature vector made of its topic,
+subcategory and tag memberships plus TF-IDF weighted title and
+description terms. Similarities are computed with NumPy over an inverted
+index (one vectorised scatter-add per feature of a course), and the top
+neighbours of every course are stored in ``RelatedCourse`` so the detail
+page reads them back with a single indexed lookup.
+"""
+
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from tags.models import Tag
+from .models import Course, RelatedCourse
+
+logger = logging.getLogger(__name__)
+
+RELATED_COURSES_PER_COURSE = 10
+
+# Relative weight of each feature family before IDF weighting.
+TOPIC_WEIGHT = 1.0
+TAG_WEIGHT = 1.0
+SUBCATEGORY_WEIGHT = 0.7
+TITLE_TERM_WEIGHT = 0.5
+DESCRIPTION_TERM_WEIGHT = 0.2
+
+# Features shared by more courses than this say little about similarity
+# and would make every scatter-add touch a large part of the catalogue.
+MAX_FEATURE_POSTINGS = 5000
+WRITE_BATCH_SIZE = 1000
+
+_TERM_RE = re.compile(r'[a-z][a-z0-9+#]{2,}')
+STOP_WORDS = frozenset("""
+    about after all also and any are because been before being between both but can
+    course courses each few for from have how into its just learn learning more most
+    not now only other our out over own same should some such than that the their
+    them then there these they this those through too under until very was what when
+    where which while who will with you your
+""".split())
+
+
+def terms(text):
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in STOP_WORDS]
+
+
+def _collect_features():
+    """Return ``(course_ids, titles, features)`` with one feature dict per course."""
+    course_ids, titles, features = [], [], []
+    row_of = {}
+    rows = (Course.objects.order_by('id')
+                          .values_list('id', 'title', 'description')
+                          .iterator())
+    for course_id, title, description in rows:
+        row_of[course_id] = len(course_ids)
+        course_ids.append(course_id)
+        titles.append((title or '').strip().lower())
+
+        row = defaultdict(float)
+        for term, count in Counter(terms(title or '')).items():
+            row['w:' + term] += TITLE_TERM_WEIGHT * count
+        for term, count in Counter(terms(strip_tags(description or ''))).items():
+            row['w:' + term] += DESCRIPTION_TERM_WEIGHT * (1 + math.log(count))
+        features.append(row)
+
+    memberships = (
+        ('t:', TOPIC_WEIGHT, Course.topic.through.objects.values_list('course_id', 'topic_id')),
+        ('s:', SUBCATEGORY_WEIGHT, Course.subcategory.through.objects.values_list('course_id', 'subcategory_id')),
+        ('g:', TAG_WEIGHT, Tag.courses.through.objects.values_list('course_id', 'tag_id')),
+    )
+    for prefix, weight, pairs in memberships:
+        for course_id, target_id in pairs.iterator():
+            row = row_of.get(course_id)
+            if row is not None:
+                features[row][prefix + str(target_id)] = weight
+
+    return course_ids, titles, features
+
+
+def _vectorise(features, max_postings):
+    """
+    IDF weight and L2 normalise every row, dropping features that occur in
+    a single course or in more than ``max_postings`` courses.
+
+    Returns the rows as ``(feature index array, weight array)`` pairs and
+    the postings of every feature in the same form.
+    """
+    total = len(features)
+    document_frequency = Counter(feature for row in features for feature in row)
+    vocabulary = {}
+    idf = []
+    for feature, frequency in document_frequency.items():
+        if 2 <= frequency <= max_postings:
+            vocabulary[feature] = len(idf)
+            idf.append(math.log(total / frequency) + 1.0)
+
+    rows = []
+    posting_rows = [[] for _ in idf]
+    posting_weights = [[] for _ in idf]
+    for index, row in enumerate(features):
+        columns = [vocabulary[feature] for feature in row if feature in vocabulary]
+        weights = np.array([row[feature] * idf[vocabulary[feature]] for feature in row if feature in vocabulary],
+                           dtype=np.float32)
+        norm = np.linalg.norm(weights)
+        if norm:
+            weights /= norm
+        for column, weight in zip(columns, weights):
+            posting_rows[column].append(index)
+            posting_weights[column].append(weight)
+        rows.append((np.array(columns, dtype=np.int64), weights))
+
+    postings = [
+        (np.array(indexes, dtype=np.int64), np.array(weights, dtype=np.float32))
+        for indexes, weights in zip(posting_rows, posting_weights)
+    ]
+    return rows, postings
+
+
+def _neighbours(row, index, titles, postings, scores, top_n):
+    """Top ``top_n`` ``(row index, score)`` pairs most similar to ``row``."""
+    columns, weights = row
+    if not len(columns):
+        return []
+
+    scores.fill(0)
+    for column, weight in zip(columns, weights):
+        posting_indexes, posting_weights = postings[column]
+        scores[posting_indexes] += weight * posting_weights
+    scores[index] = 0
+
+    # Over-fetch a little so duplicates of the course itself can be dropped.
+    wanted = min(top_n * 2, len(scores) - 1)
+    if wanted <= 0:
+        return []
+    candidates = np.argpartition(-scores, wanted)[:wanted]
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    neighbours = []
+    for candidate in candidates:
+        score = float(scores[candidate])
+        if score <= 0:
+            break
+        if titles[candidate] == titles[index]:
+            continue
+        neighbours.append((candidate, score))
+        if len(neighbours) == top_n:
+            break
+    return neighbours
+
+
+def build_related_courses(top_n=RELATED_COURSES_PER_COURSE, max_postings=MAX_FEATURE_POSTINGS):
+    """
+    Recompute the related-courses index for the whole catalogue.
+
+    The old index is replaced inside one transaction, so readers keep
+    seeing it until the new one is committed.
+
+    Returns:
+        int: Number of related course rows written
+    """
+    course_ids, titles, features = _collect_features()
+    logger.info(f"Building related courses for {len(course_ids)} courses")
+    rows, postings = _vectorise(features, max_postings)
+    del features
+
+    scores = np.zeros(len(course_ids), dtype=np.float32)
+    written = 0
+    batch = []
+    with transaction.atomic():
+        RelatedCourse.objects.all().delete()
+        for index, row in enumerate(rows):
+            for rank, (neighbour, score) in enumerate(_neighbours(row, index, titles, postings, scores, top_n), 1):
+                batch.append(RelatedCourse(
+                    course_id=course_ids[index],
+                    related_id=course_ids[neighbour],
+                    rank=rank,
+                    score=score,
+                ))
+            if len(batch) >= WRITE_BATCH_SIZE:
+                RelatedCourse.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        RelatedCourse.objects.bulk_create(batch)
+        written += len(batch)
+
+    logger.info(f"Related courses index rebuilt with {written} rows")
+    return written
+
+
+def related_courses(course):
+    """Precomputed related courses of ``course``, best match first."""
+    links = (RelatedCourse.objects.filter(course=course)
+                                  .select_related('related__provider')
+                                  .defer('related__description')
+                                  .order_by('rank'))
+    return [link.related for link in links]
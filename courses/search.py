@@ -0,0 +1,271 @@
+"""
+Full-text search for the course catalogue.
+
+Every course keeps a denormalised search document (title, author,
+provider, categories, subcategories and topics) in
+``CourseSearchDocument``. On PostgreSQL the documents are matched through
+a GIN index over their tsvector, on SQLite through an FTS5 virtual table
+that mirrors them. Other backends fall back to an ``icontains`` scan of
+the document table, which is still a single-table query.
+"""
+
+import logging
+import re
+import threading
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'courses_course_fts'
+GIN_INDEX = 'courses_search_document_gin'
+REFRESH_CHUNK_SIZE = 500
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_state = threading.local()
+
+
+def search_terms(query):
+    """Split a raw query into lower-cased word terms."""
+    return _TERM_RE.findall((query or '').lower())
+
+
+def build_document(course):
+    """
+    Build the search document for a course.
+
+    Expects ``provider`` to be loaded and ``category``, ``subcategory``
+    and ``topic`` to be prefetched, otherwise each access costs a query.
+    """
+    parts = [course.title, course.author, course.provider.title]
+    parts.extend(category.title for category in course.category.all())
+    parts.extend(subcategory.title for subcategory in course.subcategory.all())
+    parts.extend(topic.title for topic in course.topic.all())
+    return ' '.join(part for part in parts if part)
+
+
+def ensure_search_index(using=None):
+    """Create the backend specific full-text index if it is missing."""
+    from .models import CourseSearchDocument
+
+    conn = connections[using or DEFAULT_DB_ALIAS]
+    table = conn.ops.quote_name(CourseSearchDocument._meta.db_table)
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS {index} ON {table} "
+                "USING GIN (to_tsvector('{config}', document))".format(
+                    index=GIN_INDEX, table=table, config=SEARCH_CONFIG,
+                )
+            )
+        elif conn.vendor == 'sqlite':
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+                "USING fts5(document, tokenize='porter unicode61')".format(fts=FTS_TABLE)
+            )
+
+
+def refresh_search_documents(course_ids):
+    """
+    Rebuild the search documents for the given course ids.
+
+    Ids of courses that no longer exist have their documents removed.
+    """
+    from .models import Course, CourseSearchDocument
+
+    course_ids = list(set(course_ids))
+    for start in range(0, len(course_ids), REFRESH_CHUNK_SIZE):
+        chunk = course_ids[start:start + REFRESH_CHUNK_SIZE]
+        courses = (Course.objects.filter(id__in=chunk)
+                                 .select_related('provider')
+                                 .prefetch_related('category', 'subcategory', 'topic')
+                                 .only('id', 'title', 'author', 'provider__title'))
+        documents = {course.id: build_document(course) for course in courses}
+        existing = CourseSearchDocument.objects.in_bulk(chunk)
+        now = timezone.now()
+
+        to_create, to_update = [], []
+        for course_id, document in documents.items():
+            search_document = existing.get(course_id)
+            if search_document is None:
+                to_create.append(CourseSearchDocument(course_id=course_id, document=document, updated=now))
+            elif search_document.document != document:
+                search_document.document = document
+                search_document.updated = now
+                to_update.append(search_document)
+
+        missing = [course_id for course_id in chunk if course_id not in documents]
+        if missing:
+            CourseSearchDocument.objects.filter(course_id__in=missing).delete()
+        CourseSearchDocument.objects.bulk_create(to_create)
+        CourseSearchDocument.objects.bulk_update(to_update, ['document', 'updated'])
+
+        if connection.vendor == 'sqlite':
+            _sync_fts(chunk, documents)
+
+
+def _sync_fts(course_ids, documents):
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {fts} WHERE rowid IN ({ids})'.format(fts=FTS_TABLE, ids=placeholders),
+            course_ids,
+        )
+        cursor.executemany(
+            'INSERT INTO {fts} (rowid, document) VALUES (%s, %s)'.format(fts=FTS_TABLE),
+            list(documents.items()),
+        )
+
+
+def remove_search_documents(course_ids):
+    """Drop the FTS mirror rows of deleted courses (the document rows cascade)."""
+    course_ids = list(course_ids)
+    if course_ids and connection.vendor == 'sqlite':
+        _sync_fts(course_ids, {})
+
+
+class defer_search_updates(ContextDecorator):
+    """
+    Collect search document refreshes and run them once on exit.
+
+    Importers save every course several times and add each M2M row on
+    its own; without deferring, every one of those signals would rebuild
+    the document. Nested blocks flush when the outermost one exits.
+    """
+
+    def __enter__(self):
+        if getattr(_state, 'depth', 0) == 0:
+            _state.pending = set()
+        _state.depth = getattr(_state, 'depth', 0) + 1
+        return self
+
+    def __exit__(self, *exc):
+        _state.depth -= 1
+        if _state.depth == 0:
+            pending, _state.pending = _state.pending, set()
+            try:
+                refresh_search_documents(pending)
+            except Exception as e:
+                logger.error(f"Failed to refresh search documents: {e}")
+        return False
+
+
+def schedule_search_refresh(course_ids):
+    """Refresh the given courses now, or on exit of ``defer_search_updates``."""
+    if getattr(_state, 'depth', 0):
+        _state.pending.update(course_ids)
+    else:
+        refresh_search_documents(course_ids)
+
+
+class CourseSearchResults(object):
+    """
+    Lazily evaluated, relevance ranked search results.
+
+    Supports ``count()`` and slicing, so it can be handed straight to
+    Django's ``Paginator``; only the requested page is ever fetched.
+    ``free_only`` keeps the matching courses that are free.
+    """
+
+    def __init__(self, query, free_only=False):
+        self.query = query
+        self.terms = search_terms(query)
+        self.free_only = free_only
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self._fetch_count() if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if not self.terms or stop <= start:
+            return []
+        return self._fetch_courses(self._fetch_ids(stop - start, start))
+
+    def _fetch_courses(self, course_ids):
+        from .models import Course
+
+        courses = Course.objects.select_related('provider').defer('description').in_bulk(course_ids)
+        return [courses[course_id] for course_id in course_ids if course_id in courses]
+
+    def _fetch_count(self):
+        vendor = connection.vendor
+        if vendor == 'postgresql':
+            sql = ("SELECT COUNT(*) FROM {table}{free_join} "
+                   "WHERE to_tsvector('{config}', document) @@ to_tsquery('{config}', %s){free}")
+            params = [self._tsquery()]
+        elif vendor == 'sqlite':
+            sql = 'SELECT COUNT(*) FROM {fts}{free_join} WHERE {fts} MATCH %s{free}'
+            params = [self._fts_query()]
+        else:
+            return self._fallback_queryset().count()
+        with connection.cursor() as cursor:
+            cursor.execute(self._format(sql), params)
+            return cursor.fetchone()[0]
+
+    def _fetch_ids(self, limit, offset):
+        vendor = connection.vendor
+        if vendor == 'postgresql':
+            sql = ("SELECT {table}.course_id FROM {table}{free_join}, to_tsquery('{config}', %s) query "
+                   "WHERE to_tsvector('{config}', document) @@ query{free} "
+                   "ORDER BY ts_rank_cd(to_tsvector('{config}', document), query) DESC, {table}.course_id "
+                   "LIMIT %s OFFSET %s")
+            params = [self._tsquery(), limit, offset]
+        elif vendor == 'sqlite':
+            sql = ('SELECT {fts}.rowid FROM {fts}{free_join} WHERE {fts} MATCH %s{free} '
+                   'ORDER BY bm25({fts}), {fts}.rowid LIMIT %s OFFSET %s')
+            params = [self._fts_query(), limit, offset]
+        else:
+            qs = self._fallback_queryset().order_by('-course__num_subscribers', 'course_id')
+            return list(qs.values_list('course_id', flat=True)[offset:offset + limit])
+        with connection.cursor() as cursor:
+            cursor.execute(self._format(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def _format(self, sql):
+        from .models import Course, CourseSearchDocument
+
+        table = connection.ops.quote_name(CourseSearchDocument._meta.db_table)
+        courses = connection.ops.quote_name(Course._meta.db_table)
+        free_join = free = ''
+        if self.free_only:
+            # The FTS5 rowid is the course id
+            free_join = ' JOIN {courses} ON {courses}.id = {document}'.format(
+                courses=courses, document='{}.course_id'.format(table) if connection.vendor == 'postgresql'
+                else '{}.rowid'.format(FTS_TABLE),
+            )
+            free = ' AND {}.is_free'.format(courses)
+        return sql.format(table=table, config=SEARCH_CONFIG, fts=FTS_TABLE, free_join=free_join, free=free)
+
+    def _tsquery(self):
+        # Every term is a prefix match so partially typed words still hit.
+        return ' & '.join('{}:*'.format(term) for term in self.terms)
+
+    def _fts_query(self):
+        return ' '.join('"{}"*'.format(term) for term in self.terms)
+
+    def _fallback_queryset(self):
+        from .models import CourseSearchDocument
+
+        qs = CourseSearchDocument.objects.all()
+        if self.free_only:
+            qs = qs.filter(course__is_free=True)
+        for term in self.terms:
+            qs = qs.filter(document__icontains=term)
+        return qs
+
+
+def search_courses(query, free_only=False):
+    """Return ranked ``CourseSearchResults`` for a raw query string."""
+    return CourseSearchResults(query, free_only)
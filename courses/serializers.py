@@ -1,8 +1,33 @@
 from rest_framework import serializers
-from .models import Category, Course
+from .models import Category, Course, Provider, SubCategory
+
+
+def requested_fields(request):
+	"""
+	Field names asked for with ``?fields=a,b``, or ``None`` when the
+	client wants every field.
+	"""
+	if request is None:
+		return None
+	fields = request.query_params.get('fields')
+	if not fields:
+		return None
+	return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+class SparseFieldsetMixin(object):
+	"""Drop every field the request did not list in ``?fields=``."""
+
+	def __init__(self, *args, **kwargs):
+		super(SparseFieldsetMixin, self).__init__(*args, **kwargs)
+		fields = requested_fields(self.context.get('request'))
+		if fields is not None:
+			for name in set(self.fields) - fields:
+				self.fields.pop(name)
+
+
+class CategoryModelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
-class CategoryModelSerializer(serializers.ModelSerializer):
-		
 	class Meta:
 		model = Category
 		fields = [
@@ -16,8 +41,45 @@ class CategoryModelSerializer(serializers.ModelSerializer):
 		]
 
 
-class CourseModelSerializer(serializers.ModelSerializer):
-		
+class SubCategoryModelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+	category = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+
+	class Meta:
+		model = SubCategory
+		fields = [
+			'id',
+			'category',
+			'image_url',
+			'title',
+			'slug',
+			'timestamp',
+			'updated',
+		]
+
+
+class ProviderModelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+
+	class Meta:
+		model = Provider
+		fields = [
+			'id',
+			'title',
+			'image_url',
+			'plan_details',
+			'price',
+			'provider_url',
+			'slug',
+			'timestamp',
+			'updated',
+		]
+
+
+class CourseModelSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+	category = serializers.SlugRelatedField(slug_field='slug', many=True, read_only=True)
+	subcategory = serializers.SlugRelatedField(slug_field='slug', many=True, read_only=True)
+	provider = ProviderModelSerializer(read_only=True)
+	url = serializers.CharField(source='get_absolute_url', read_only=True)
+
 	class Meta:
 		model = Course
 		fields = [
@@ -35,11 +97,14 @@ class CourseModelSerializer(serializers.ModelSerializer):
 			'price',
 			'level',
 			'rating',
+			'num_reviews',
+			'num_subscribers',
 			'is_free',
-			'certificate',
+			'has_certificate',
 			'course_url',
-			'popular',
+			'is_popular',
 			'slug',
+			'url',
 			'timestamp',
 			'updated',
 		]
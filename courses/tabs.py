@@ -0,0 +1,110 @@
+"""
+Home page category tabs.
+
+The top courses of every category are fetched in a single query that
+numbers each category's courses with ``ROW_NUMBER()`` and keeps the first
+``limit`` of them, instead of one query per tab. Only the columns a course
+card needs are selected; ``description`` never leaves the database.
+
+The serialised payload is cached for a few minutes together with an ETag
+derived from its content, so revalidation requests are answered without
+running the query at all.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.urls import reverse
+
+from .models import Category, Course, Provider
+
+CATEGORY_TABS_KEY = 'home:category-tabs:{limit}'
+CATEGORY_TABS_LIMIT = 12
+CATEGORY_TABS_TIMEOUT = 60 * 5
+
+TAB_COURSE_FIELDS = (
+    'id', 'title', 'slug', 'image_url', 'author', 'duration', 'trial', 'price',
+    'num_subscribers', 'level', 'rating', 'num_reviews', 'is_free', 'has_certificate',
+)
+
+TOP_COURSES_SQL = """
+SELECT ranked.category_id, {outer_columns}, ranked.provider_title, ranked.provider_slug,
+       ranked.provider_image_url
+FROM (
+    SELECT link.category_id, {inner_columns},
+           provider.title AS provider_title, provider.slug AS provider_slug,
+           provider.image_url AS provider_image_url,
+           ROW_NUMBER() OVER (
+               PARTITION BY link.category_id
+               ORDER BY CASE WHEN course.num_subscribers IS NULL THEN 1 ELSE 0 END,
+                        course.num_subscribers DESC, course.id
+           ) AS position
+    FROM {link_table} link
+    INNER JOIN {course_table} course ON course.id = link.course_id
+    INNER JOIN {provider_table} provider ON provider.id = course.provider_id
+) ranked
+WHERE ranked.position <= %s
+ORDER BY ranked.category_id, ranked.position
+"""
+
+
+def _top_courses_sql():
+    qn = connection.ops.quote_name
+    return TOP_COURSES_SQL.format(
+        outer_columns=', '.join('ranked.' + qn(field) for field in TAB_COURSE_FIELDS),
+        inner_columns=', '.join('course.' + qn(field) for field in TAB_COURSE_FIELDS),
+        link_table=qn(Course.category.through._meta.db_table),
+        course_table=qn(Course._meta.db_table),
+        provider_table=qn(Provider._meta.db_table),
+    )
+
+
+def top_courses_by_category(limit=CATEGORY_TABS_LIMIT):
+    """
+    Return ``{category_id: [course dict, ...]}`` with the ``limit`` most
+    subscribed courses of every category, best first.
+    """
+    courses = {}
+    with connection.cursor() as cursor:
+        cursor.execute(_top_courses_sql(), [limit])
+        for row in cursor.fetchall():
+            category_id = row[0]
+            course = dict(zip(TAB_COURSE_FIELDS, row[1:len(TAB_COURSE_FIELDS) + 1]))
+            provider_title, provider_slug, provider_image_url = row[len(TAB_COURSE_FIELDS) + 1:]
+            course['provider'] = {'title': provider_title, 'image_url': provider_image_url}
+            course['url'] = reverse('courses:course-detail', kwargs={
+                'slug': provider_slug, 'slug2': course['slug'],
+            })
+            courses.setdefault(category_id, []).append(course)
+    return courses
+
+
+def build_category_tabs(limit=CATEGORY_TABS_LIMIT):
+    courses = top_courses_by_category(limit)
+    return [
+        {
+            'slug': category.slug,
+            'title': category.title,
+            'url': category.get_absolute_url(),
+            'courses': courses.get(category.id, []),
+        }
+        for category in Category.objects.only('id', 'title', 'slug')
+    ]
+
+
+def category_tabs(limit=CATEGORY_TABS_LIMIT):
+    """Return the cached ``{'etag': ..., 'categories': [...]}`` tab payload."""
+    key = CATEGORY_TABS_KEY.format(limit=limit)
+    tabs = cache.get(key)
+    if tabs is None:
+        categories = build_category_tabs(limit)
+        content = json.dumps(categories, cls=DjangoJSONEncoder, sort_keys=True)
+        tabs = {
+            'etag': hashlib.md5(content.encode()).hexdigest(),
+            'categories': categories,
+        }
+        cache.set(key, tabs, CATEGORY_TABS_TIMEOUT)
+    return tabs
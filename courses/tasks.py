@@ -0,0 +1,32 @@
+"""
+Celery tasks for catalogue maintenance.
+"""
+
+from __future__ import absolute_import, unicode_literals
+import logging
+from celery import shared_task
+
+from .cache import refresh_popular_course_pool
+from .related import build_related_courses
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='courses.refresh_popular_course_pool')
+def refresh_popular_course_pool_task():
+    """
+    Celery task to rebuild the home page popular course pool.
+    """
+    pool = refresh_popular_course_pool()
+    logger.info(f"Popular course pool refreshed with {len(pool)} courses")
+    return len(pool)
+
+
+@shared_task(name='courses.build_related_courses')
+def build_related_courses_task():
+    """
+    Celery task to rebuild the related-courses index.
+    """
+    written = build_related_courses()
+    logger.info(f"Related courses index rebuilt: {written} rows")
+    return written
@@ -0,0 +1,82 @@
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+
+from courses import autocomplete
+from courses.autocomplete import COURSE, TOP_K, Autocomplete
+
+
+def course(pk, subscribers=0):
+    return SimpleNamespace(pk=pk, title='Python Course %d' % pk, author='Author %d' % (pk % 7),
+                           num_subscribers=subscribers, provider_id=None, slug='python-course-%d' % pk)
+
+
+class AutocompleteTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = Autocomplete()
+        for pk in range(50):
+            self.index.update_course(course(pk, subscribers=pk))
+
+    def titles(self, query):
+        return [suggestion['title'] for suggestion in self.index.search(query)[COURSE]]
+
+    def test_search_ranks_courses_by_subscribers(self):
+        self.assertEqual(self.titles('pyth'), ['Python Course %d' % pk for pk in range(49, 49 - TOP_K, -1)])
+
+    def test_removed_courses_are_replaced_by_the_next_best(self):
+        self.index.remove_course(49)
+        self.assertEqual(self.titles('pyth')[0], 'Python Course 48')
+        self.assertEqual(len(self.titles('pyth')), TOP_K)
+
+    def assertWaitsForLock(self, func):
+        self.index.lock.acquire()
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        self.index.lock.release()
+        thread.join()
+
+    def test_searches_and_signal_updates_hold_the_index_lock(self):
+        self.assertWaitsForLock(lambda: self.index.search('pyth'))
+        self.assertWaitsForLock(lambda: self.index.update_course(course(50, subscribers=100)))
+        self.assertWaitsForLock(lambda: self.index.remove_course(50))
+
+
+class SynchronousThread(object):
+
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@mock.patch('courses.autocomplete.threading.Thread', SynchronousThread)
+class BackgroundRebuildTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = Autocomplete()
+        patcher = mock.patch.multiple(autocomplete, _index=self.index, _retry_at=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_rebuilds_are_retried_after_a_delay(self):
+        with mock.patch.object(Autocomplete, 'build', side_effect=DatabaseError('locked')) as build, \
+                mock.patch('courses.autocomplete.time.monotonic', return_value=self.index.built + 7200), \
+                self.assertLogs('courses.autocomplete', 'ERROR'):
+            self.assertIs(autocomplete.get_index(), self.index)
+            self.assertIs(autocomplete.get_index(), self.index)
+        self.assertEqual(build.call_count, 1)
+        self.assertFalse(autocomplete._rebuilding)
+
+        fresh = Autocomplete()
+        with mock.patch.object(Autocomplete, 'build', return_value=fresh), \
+                mock.patch('courses.autocomplete.time.monotonic',
+                           return_value=self.index.built + 7200 + autocomplete.retry_delay()):
+            autocomplete.get_index()
+        self.assertIs(autocomplete.loaded_index(), fresh)
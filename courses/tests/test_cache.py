@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from blog.models import BlogCategory
+from courses.cache import (BLOG_CATEGORY_LINKS_KEY, COURSE_CATEGORY_LINKS_KEY, POPULAR_COURSE_POOL_KEY,
+                           blog_category_links, course_category_links, refresh_popular_course_pool,
+                           sample_popular_course_ids)
+from courses.importing import CourseBatchWriter
+from courses.models import Category, Course
+from courses.page_cache import PAGE_TAG_KEY, TAXONOMY_TAG, purge_page_tags
+
+from .utils import make_course, make_provider
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=60)
+class CommitInvalidationTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_links_are_invalidated_when_the_transaction_commits(self):
+        Category.objects.create(title='Development')
+        self.assertEqual([link.title for link in course_category_links()], ['Development'])
+
+        with transaction.atomic():
+            Category.objects.create(title='Business')
+            self.assertIsNotNone(cache.get(COURSE_CATEGORY_LINKS_KEY))
+        self.assertIsNone(cache.get(COURSE_CATEGORY_LINKS_KEY))
+        self.assertEqual(sorted(link.title for link in course_category_links()),
+                         ['Business', 'Development'])
+
+    def test_blog_links_are_invalidated_like_the_course_links(self):
+        BlogCategory.objects.create(title='News')
+        self.assertEqual([link.title for link in blog_category_links()], ['News'])
+
+        with transaction.atomic():
+            BlogCategory.objects.create(title='Guides')
+            self.assertIsNotNone(cache.get(BLOG_CATEGORY_LINKS_KEY))
+        self.assertEqual(sorted(link.title for link in blog_category_links()), ['Guides', 'News'])
+
+    def test_rolled_back_changes_keep_the_links(self):
+        Category.objects.create(title='Development')
+        course_category_links()
+
+        with self.assertRaises(ValueError), transaction.atomic():
+            Category.objects.create(title='Business')
+            raise ValueError
+        self.assertIsNotNone(cache.get(COURSE_CATEGORY_LINKS_KEY))
+
+    def test_tags_are_purged_when_the_transaction_commits(self):
+        key = PAGE_TAG_KEY.format(TAXONOMY_TAG)
+        cache.set(key, 'old')
+
+        with transaction.atomic():
+            purge_page_tags(TAXONOMY_TAG)
+            self.assertEqual(cache.get(key), 'old')
+        self.assertNotEqual(cache.get(key), 'old')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PopularCoursePoolTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = make_provider()
+
+    def test_samples_vary_between_calls(self):
+        cache.set(POPULAR_COURSE_POOL_KEY, list(range(100)))
+
+        samples = {tuple(sample_popular_course_ids(12)) for _ in range(5)}
+        self.assertGreater(len(samples), 1)
+
+    def test_pool_falls_back_to_the_most_subscribed_courses(self):
+        courses = [make_course(self.provider, title='Course %d' % index, num_subscribers=index)
+                   for index in range(3)]
+        self.assertEqual(sorted(sample_popular_course_ids(12)), [course.pk for course in courses])
+
+        courses[0].is_popular = True
+        courses[0].save()
+        self.assertEqual(refresh_popular_course_pool(), [courses[0].pk])
+
+    def test_imports_of_popular_courses_drop_the_pool(self):
+        refresh_popular_course_pool()
+        writer = CourseBatchWriter(self.provider)
+
+        writer.add(Course(title='Python', external_id='1', description='A course', num_subscribers=10))
+        writer.flush()
+        self.assertEqual(cache.get(POPULAR_COURSE_POOL_KEY), [])
+
+        writer.add(Course(title='Python', external_id='1', description='A course', num_subscribers=10000,
+                          is_popular=True))
+        writer.flush()
+        self.assertIsNone(cache.get(POPULAR_COURSE_POOL_KEY))
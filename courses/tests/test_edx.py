@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from courses.edx.edx_production_importer import EdxProductionImporter
+from courses.models import Course, ImportCheckpoint
+
+PAGES = 3
+PAGE_SIZE = 5
+
+
+class EdxPipelineTests(TransactionTestCase):
+
+    def setUp(self):
+        self.importer = EdxProductionImporter()
+        self.importer.max_retries = 0
+        self.importer.api = mock.Mock()
+        self.importer.api.rate_limiter.rate = 1.0
+        self.importer.api.courses.side_effect = self.courses
+        self.importer.api.get_course_url.side_effect = lambda course_id: 'https://www.edx.org/course/' + course_id
+        self.importer.api.get_course_image_url.return_value = None
+        self.importer.api.get_course_video_url.return_value = None
+        self.importer.api.parse_effort.side_effect = lambda effort: effort
+        self.failing_pages = set()
+        self.requested = []
+        patcher = mock.patch('courses.edx.edx_production_importer.finish_import')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def courses(self, page, **kwargs):
+        self.requested.append(page)
+        if page in self.failing_pages:
+            raise ConnectionError('timed out')
+        return {
+            'results': [{'id': 'MITx+%d' % (page * 100 + i), 'name': 'Course %d' % i, 'subjects': ['Math'],
+                         'staff': ['Ann']} for i in range(PAGE_SIZE)],
+            'next': 'next' if page < PAGES else None,
+        }
+
+    def test_pages_are_written_and_checkpointed(self):
+        stats = self.importer.import_all_courses()
+
+        self.assertEqual((stats['created'], stats['errors']), (PAGES * PAGE_SIZE, 0))
+        self.assertEqual(Course.objects.count(), PAGES * PAGE_SIZE)
+        self.assertEqual(list(Course.objects.get(external_id='MITx+101').category.values_list('title', flat=True)),
+                         ['Math'])
+        self.assertIsNotNone(ImportCheckpoint.objects.get().finished)
+
+        # The next run skips the courses whose data did not change
+        stats = self.importer.import_all_courses()
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (0, 0, PAGES * PAGE_SIZE))
+
+    def test_a_failed_page_stops_the_import_and_the_next_run_resumes_there(self):
+        self.failing_pages.add(2)
+
+        with self.assertLogs('courses.edx.edx_production_importer', 'ERROR'):
+            stats = self.importer.import_all_courses()
+        self.assertEqual((stats['created'], stats['errors']), (PAGE_SIZE, 1))
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.last_page, checkpoint.finished), (1, None))
+
+        self.failing_pages.clear()
+        self.requested.clear()
+        stats = self.importer.import_all_courses()
+        self.assertEqual(self.requested, [2, 3])
+        self.assertEqual(stats['created'], PAGES * PAGE_SIZE)
+        self.assertEqual(Course.objects.count(), PAGES * PAGE_SIZE)
+
+    def test_a_page_that_fails_to_write_is_rolled_back(self):
+        course_taxonomy = self.importer.course_taxonomy
+        taxonomy = self.importer.taxonomy
+
+        def fail_on_page_2(categories):
+            if Course.objects.count() >= PAGE_SIZE:
+                raise ValueError('no taxonomy')
+            return course_taxonomy(categories)
+
+        with mock.patch.object(self.importer, 'course_taxonomy', fail_on_page_2), \
+                self.assertLogs('courses.edx.edx_production_importer', 'ERROR'):
+            stats = self.importer.import_all_courses()
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(Course.objects.count(), PAGE_SIZE)
+        self.assertEqual(ImportCheckpoint.objects.get().last_page, 1)
+        # Taxonomy rows created with the page were rolled back with it
+        self.assertIsNot(self.importer.taxonomy, taxonomy)
+
+        stats = self.importer.import_all_courses()
+        self.assertEqual(Course.objects.count(), PAGES * PAGE_SIZE)
+        self.assertIsNotNone(ImportCheckpoint.objects.get().finished)
@@ -0,0 +1,65 @@
+import tempfile
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from courses.http_cache import CachingHTTPAdapter, HttpCache
+
+URL = 'https://www.udemy.com/api-2.0/courses/?page=1&'
+
+
+def server_response(status, body=b'', **headers):
+    response = Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = body
+    response.raw = mock.Mock(spec=['close', 'release_conn'])
+    return response
+
+
+class CachingHTTPAdapterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = HttpCache(directory.name, ttl=60, max_bytes=1024 * 1024)
+        self.limiter = mock.Mock()
+        self.session = requests.Session()
+        self.session.mount('https://', CachingHTTPAdapter(self.cache, rate_limiter=self.limiter))
+        patcher = mock.patch.object(HTTPAdapter, 'send')
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_200_responses_are_stored_after_waiting_for_the_limiter(self):
+        self.send.return_value = server_response(200, b'{"count": 1}', ETag='"v1"')
+
+        response = self.session.get(URL)
+        self.assertEqual(response.json(), {'count': 1})
+        self.assertFalse(getattr(response, 'from_cache', False))
+        self.assertEqual(self.limiter.acquire.call_count, 1)
+        self.assertEqual(self.cache.get(URL)[1], b'{"count": 1}')
+
+    def test_fresh_responses_skip_the_server_and_the_limiter(self):
+        self.cache.set(URL, {'ETag': '"v1"'}, b'{"count": 1}')
+
+        response = self.session.get(URL)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.json(), {'count': 1})
+        self.send.assert_not_called()
+        self.limiter.acquire.assert_not_called()
+
+    def test_304_responses_are_closed_and_answered_from_the_cache(self):
+        self.cache.set(URL, {'ETag': '"v1"'}, b'{"count": 1}')
+        self.cache.ttl = 0
+        not_modified = server_response(304)
+        self.send.return_value = not_modified
+
+        response = self.session.get(URL)
+        self.assertEqual(self.send.call_args[0][0].headers['If-None-Match'], '"v1"')
+        self.assertEqual((response.status_code, response.json()), (200, {'count': 1}))
+        not_modified.raw.release_conn.assert_called_once_with()
+        self.assertEqual(self.limiter.acquire.call_count, 1)
+        self.assertEqual(self.cache.stats['revalidated'], 1)
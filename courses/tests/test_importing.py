@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from courses.importing import TaxonomyResolver, finish_checkpoint, prune_checkpoints, start_checkpoint
+from courses.models import Category, ImportCheckpoint, SubCategory, Topic
+
+from .utils import make_course, make_provider, make_taxonomy
+
+
+class TaxonomyResolverTests(TestCase):
+
+    def test_titles_longer_than_the_column_resolve_to_their_truncated_row(self):
+        title = 'Development ' * 20
+
+        category = TaxonomyResolver().category(title)
+        self.assertEqual(category.title, title.strip()[:100])
+        # Loading the three models, and no insert
+        with self.assertNumQueries(3):
+            self.assertEqual(TaxonomyResolver().category(title), category)
+        self.assertEqual(Category.objects.count(), 1)
+
+    def test_long_topics_are_linked_to_their_subcategory(self):
+        category, subcategory, _ = make_taxonomy()
+        title = 'Python ' * 50
+
+        topic = TaxonomyResolver().topic(title, subcategory)
+        self.assertEqual(len(topic.title), 255)
+        self.assertEqual(list(topic.subcategory.all()), [subcategory])
+        self.assertEqual(list(topic.category.all()), [category])
+        self.assertEqual(TaxonomyResolver().topic(title), topic)
+        self.assertEqual(Topic.objects.filter(title=topic.title).count(), 1)
+
+    def test_titles_differing_in_case_and_spaces_share_a_row(self):
+        category = make_taxonomy()[0]
+        resolver = TaxonomyResolver()
+
+        subcategories = resolver.subcategories([('Web  development', category), ('WEB DEVELOPMENT', category)])
+        self.assertEqual(subcategories['Web  development'], subcategories['WEB DEVELOPMENT'])
+        self.assertEqual(SubCategory.objects.count(), 1)
+
+
+class CheckpointTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+
+    def test_resumed_runs_keep_their_initial_course_count(self):
+        self.assertEqual(start_checkpoint(self.provider, 'category:Development').initial_count, 0)
+        make_course(self.provider, title='Python')
+
+        checkpoint = start_checkpoint(self.provider, 'category:Development')
+        self.assertEqual(checkpoint.initial_count, 0)
+
+        finish_checkpoint(checkpoint)
+        self.assertEqual(start_checkpoint(self.provider, 'category:Development').initial_count, 1)
+
+    def test_checkpoints_of_other_ranges_are_pruned(self):
+        for scope in ('category:Development:pages:1-5', 'category:Development:pages:6-7',
+                      'category:Development:pages:6-10', 'category:Business:pages:6-7'):
+            start_checkpoint(self.provider, scope)
+
+        self.assertEqual(prune_checkpoints(self.provider, 'category:Development:pages:', [
+            'category:Development:pages:1-5', 'category:Development:pages:6-10',
+        ]), 1)
+        self.assertEqual(sorted(ImportCheckpoint.objects.values_list('scope', flat=True)), [
+            'category:Business:pages:6-7', 'category:Development:pages:1-5', 'category:Development:pages:6-10',
+        ])
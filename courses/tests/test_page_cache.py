@@ -0,0 +1,72 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from courses.page_cache import CATEGORY_TAG, purge_page_tags
+from courses.views import SubcategoryListView
+
+from .utils import make_taxonomy
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=60)
+class PageCacheMixinTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = make_taxonomy()[0]
+        self.path = reverse('courses:subcategory-list', kwargs={'slug': self.category.slug})
+
+    def get(self):
+        response = self.client.get(self.path, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pages_are_served_from_the_cache(self):
+        self.get()
+        with self.assertNumQueries(0):
+            self.get()
+
+    def test_cached_pages_keep_their_headers(self):
+        render = SubcategoryListView.render_to_response
+
+        def render_with_header(view, context, **kwargs):
+            response = render(view, context, **kwargs)
+            response['Content-Language'] = 'en'
+            return response
+
+        with mock.patch.object(SubcategoryListView, 'render_to_response', render_with_header):
+            self.get()
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response['Content-Language'], 'en')
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+    def test_home_page_is_rendered_for_every_visit(self):
+        with mock.patch('courses.views.sample_popular_course_ids', return_value=[]) as sample:
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse('courses:home'), secure=True).status_code, 200)
+        self.assertEqual(sample.call_count, 2)
+
+    def test_pages_with_messages_are_not_cached(self):
+        with mock.patch('courses.page_cache.messages.get_messages', return_value=['Subscribed']):
+            self.get()
+        with self.assertNumQueries(2):
+            self.get()
+
+    def test_pages_rendered_during_a_purge_are_not_cached(self):
+        get_tags = SubcategoryListView.get_page_cache_tags
+
+        def purge_while_rendering(view, context):
+            purge_page_tags(CATEGORY_TAG.format(self.category.slug))
+            return get_tags(view, context)
+
+        with mock.patch.object(SubcategoryListView, 'get_page_cache_tags', purge_while_rendering):
+            self.get()
+        with self.assertNumQueries(2):
+            self.get()
+        with self.assertNumQueries(0):
+            self.get()
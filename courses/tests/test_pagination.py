@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Course
+from courses.pagination import (InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor,
+                                estimate_count)
+
+from .utils import make_course, make_provider
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        provider = make_provider()
+        # Two courses share a key, two have none and sort last
+        subscribers = [5, 1, 3, 3, None, 8, None]
+        cls.courses = [make_course(provider, title='Course %d' % index, num_subscribers=value)
+                       for index, value in enumerate(subscribers)]
+        cls.expected = sorted(cls.courses, key=lambda course: (course.num_subscribers is None,
+                                                               course.num_subscribers or 0, course.pk))
+
+    def walk_forward(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_walk_visits_every_course_once_in_order(self):
+        pages = self.walk_forward(KeysetPaginator(Course.objects.all(), 2))
+        self.assertEqual([course.pk for page in pages for course in page],
+                         [course.pk for course in self.expected])
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator = KeysetPaginator(Course.objects.all(), 2)
+        pages = self.walk_forward(paginator)
+        for before, after in zip(pages, pages[1:]):
+            previous = paginator.page(after.previous_cursor)
+            self.assertEqual([course.pk for course in previous], [course.pk for course in before])
+
+    def test_walking_back_past_the_start_shows_the_first_page(self):
+        paginator = KeysetPaginator(Course.objects.all(), 3)
+        first = self.expected[0]
+        page = paginator.page(encode_cursor('p', first.num_subscribers, first.pk))
+        self.assertEqual([course.pk for course in page], [course.pk for course in self.expected[:3]])
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('garbage', encode_cursor('x', 1, 1), encode_cursor('n', 'a', 1),
+                       encode_cursor('n', 1, '1')):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+    def test_list_view_pages_by_cursor(self):
+        with self.settings(PAGE_CACHE_TIMEOUT=0):
+            response = self.client.get(reverse('courses:all-courses'), secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['keyset_pagination'])
+            page = response.context['page_obj']
+            if page.has_next():
+                response = self.client.get(reverse('courses:all-courses'), {'cursor': page.next_cursor}, secure=True)
+                self.assertEqual(response.status_code, 200)
+
+    def test_invalid_cursor_is_a_404(self):
+        with self.settings(PAGE_CACHE_TIMEOUT=0):
+            response = self.client.get(reverse('courses:all-courses'), {'cursor': 'garbage'}, secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class EstimateCountTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        provider = make_provider()
+        for index in range(3):
+            make_course(provider, title='Course %d' % index)
+
+    def test_exact_count_is_cached_on_other_backends(self):
+        queryset = Course.objects.order_by()
+        with self.assertNumQueries(1):
+            self.assertEqual(estimate_count(queryset), 3)
+            self.assertEqual(estimate_count(queryset), 3)
+
+    def test_planner_estimate_on_postgresql(self):
+        executed = []
+        for plan in ([{'Plan': {'Plan Rows': 1234}}], '[{"Plan": {"Plan Rows": 1234}}]'):
+            cursor = mock.MagicMock()
+            cursor.__enter__.return_value = cursor
+            cursor.execute.side_effect = lambda sql, params: executed.append(sql)
+            cursor.fetchone.return_value = (plan,)
+            connection = mock.Mock(vendor='postgresql')
+            connection.cursor.return_value = cursor
+            with mock.patch('courses.pagination.connections', {'default': connection}):
+                self.assertEqual(estimate_count(Course.objects.order_by()), 1234)
+        self.assertTrue(all(sql.startswith('EXPLAIN (FORMAT JSON) SELECT') for sql in executed))
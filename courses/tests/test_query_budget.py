@@ -0,0 +1,91 @@
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import BlogCategory, Post
+from courses import autocomplete
+
+from .utils import QueryBudgetTestMixin, make_course, make_provider, make_taxonomy
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=0)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+    Every budgeted view, requested by a logged-in user with cold caches,
+    over a catalogue with enough rows to expose per-row queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = make_provider()
+        cls.category, cls.subcategory, cls.topic = make_taxonomy()
+        cls.courses = [make_course(cls.provider, title='Python Course %d' % index, author='Author %d' % index,
+                                   category=cls.category, subcategory=cls.subcategory, topic=cls.topic,
+                                   num_subscribers=index)
+                       for index in range(30)]
+        # Creating a user subscribes it to the Mailchimp list.
+        with mock.patch('marketing.models.Mailchimp') as mailchimp:
+            mailchimp.return_value.subscribe.return_value = (200, {'status': 'subscribed'})
+            cls.user = get_user_model().objects.create(email='reader@example.com', username='reader')
+        blog_category = BlogCategory.objects.create(title='News')
+        cls.posts = [Post.objects.create(user=cls.user, category=blog_category, title='Post %d' % index,
+                                         content='Content', publish=date(2020, 1, 1))
+                     for index in range(10)]
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index = None
+        self.client.force_login(self.user)
+
+    def assertBudgetedPage(self, path, **extra):
+        response = self.assertWithinQueryBudget(path, secure=True, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_home(self):
+        self.assertBudgetedPage(reverse('courses:home'))
+
+    def test_category_tabs(self):
+        self.assertBudgetedPage(reverse('courses:tabs-list'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertBudgetedPage(reverse('courses:tabs', kwargs={'slug': self.category.slug}),
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_course_lists(self):
+        self.assertBudgetedPage(reverse('courses:all-courses'))
+        self.assertBudgetedPage(reverse('courses:subcategory-list', kwargs={'slug': self.category.slug}))
+        self.assertBudgetedPage(reverse('courses:course-list', kwargs={'slug': self.category.slug,
+                                                                       'slug2': self.subcategory.slug}))
+
+    def test_course_detail(self):
+        self.assertBudgetedPage(reverse('courses:course-detail', kwargs={'slug': self.provider.slug,
+                                                                         'slug2': self.courses[0].slug}))
+
+    def test_search(self):
+        self.assertBudgetedPage(reverse('courses:search'), data={'q': 'python'})
+
+    def test_autocomplete(self):
+        self.assertBudgetedPage(reverse('courses:autocomplete'), data={'q': 'pyth'})
+        self.assertBudgetedPage(reverse('courses:autocomplete'), data={'q': 'auth'})
+
+    def test_blog(self):
+        self.assertBudgetedPage(reverse('posts:list'))
+        self.assertBudgetedPage(reverse('posts:category-posts', kwargs={'slug': self.posts[0].category.slug}))
+        self.assertBudgetedPage(reverse('posts:detail', kwargs={'slug': self.posts[0].slug}))
+        self.assertBudgetedPage(reverse('posts:search'), data={'q': 'post'})
+
+    def test_blog_editing(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertBudgetedPage(reverse('posts:create'))
+        self.assertBudgetedPage(reverse('posts:update', kwargs={'slug': self.posts[0].slug}))
+
+    def test_api(self):
+        for name in ('course', 'category', 'subcategory', 'provider'):
+            self.assertBudgetedPage(reverse('api:%s-list' % name, kwargs={'version': 'v1'}))
+        self.assertBudgetedPage(reverse('api:course-detail', kwargs={'version': 'v1',
+                                                                     'slug': self.courses[0].slug}))
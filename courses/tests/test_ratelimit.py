@@ -0,0 +1,53 @@
+from unittest import mock
+
+import redis
+from django.test import SimpleTestCase, override_settings
+
+from courses import ratelimit
+from courses.ratelimit import RedisRateLimiter, shared_rate_limiter
+
+
+class RedisRateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.reserve = self.client.register_script.return_value
+        self.fallback = mock.Mock()
+        self.limiter = RedisRateLimiter(self.client, 'ratelimit:test', 10, fallback=self.fallback, retry_after=30)
+
+    def test_redis_is_not_retried_until_the_backoff_ends(self):
+        self.reserve.side_effect = redis.ConnectionError('refused')
+
+        with mock.patch('courses.ratelimit.time.monotonic', return_value=100), \
+                self.assertLogs('courses.ratelimit', 'WARNING') as logs:
+            self.limiter.acquire()
+            self.limiter.acquire()
+        self.assertEqual(self.reserve.call_count, 1)
+        self.assertEqual(self.fallback.acquire.call_count, 2)
+        self.assertEqual(len(logs.output), 1)
+
+        self.reserve.side_effect = None
+        self.reserve.return_value = '0'
+        with mock.patch('courses.ratelimit.time.monotonic', return_value=131):
+            self.limiter.acquire()
+        self.assertEqual(self.reserve.call_count, 2)
+        self.assertEqual(self.fallback.acquire.call_count, 2)
+
+
+class SharedRateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        ratelimit._redis_clients.clear()
+        self.addCleanup(ratelimit._redis_clients.clear)
+
+    @override_settings(RATE_LIMIT_REDIS_URL='')
+    def test_limits_this_process_without_a_redis_url(self):
+        self.assertIsInstance(shared_rate_limiter('udemy', 'id', 2), ratelimit.RateLimiter)
+
+    @override_settings(RATE_LIMIT_REDIS_URL='redis://localhost:6379/1', RATE_LIMIT_REDIS_TIMEOUT=0.25)
+    def test_redis_client_has_timeouts(self):
+        with mock.patch('courses.ratelimit.redis.Redis.from_url') as from_url:
+            limiter = shared_rate_limiter('udemy', 'id', 2)
+        from_url.assert_called_once_with('redis://localhost:6379/1', socket_connect_timeout=0.25,
+                                         socket_timeout=0.25)
+        self.assertIsInstance(limiter, RedisRateLimiter)
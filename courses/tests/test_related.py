@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from courses import tasks
+from courses.importing import RELATED_REBUILD_DELAY, finish_import
+from courses.models import RelatedCourse
+from courses.related import build_related_courses, related_courses
+
+from .utils import make_course, make_provider, make_taxonomy
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class BuildRelatedCoursesTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+        self.category, self.subcategory, self.topic = make_taxonomy()
+
+    def related_titles(self, course):
+        return [related.title for related in related_courses(course)]
+
+    def test_courses_sharing_topics_and_terms_are_related_best_first(self):
+        analysis = make_course(self.provider, title='Python Data Analysis', topic=self.topic)
+        make_course(self.provider, title='Python Data Science', topic=self.topic)
+        make_course(self.provider, title='Django Web Apps', topic=self.topic)
+        make_course(self.provider, title='French Cooking')
+        make_course(self.provider, title='French Pastry')
+
+        build_related_courses()
+        self.assertEqual(self.related_titles(analysis), ['Python Data Science', 'Django Web Apps'])
+        ranks = list(RelatedCourse.objects.filter(course=analysis).values_list('rank', 'score'))
+        self.assertEqual([rank for rank, score in ranks], [1, 2])
+        self.assertGreater(ranks[0][1], ranks[1][1])
+
+    def test_the_course_and_its_duplicates_are_left_out(self):
+        course = make_course(self.provider, title='Python Basics', topic=self.topic)
+        make_course(self.provider, title='python basics ', topic=self.topic, course_url='https://www.udemy.com/copy/')
+        make_course(self.provider, title='Python Advanced', topic=self.topic)
+
+        build_related_courses()
+        self.assertEqual(self.related_titles(course), ['Python Advanced'])
+
+    def test_every_course_keeps_its_top_n_and_rebuilds_replace_the_index(self):
+        courses = [make_course(self.provider, title='Python %d' % i, topic=self.topic) for i in range(5)]
+
+        self.assertEqual(build_related_courses(top_n=3), 5 * 3)
+        for course in courses:
+            self.assertEqual(list(course.related_links.order_by('rank').values_list('rank', flat=True)), [1, 2, 3])
+
+        courses[0].delete()
+        self.assertEqual(build_related_courses(top_n=3), 4 * 3)
+        self.assertEqual(RelatedCourse.objects.count(), 4 * 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FinishImportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_imports_finishing_together_share_one_rebuild(self):
+        with mock.patch.object(tasks.build_related_courses_task, 'apply_async') as apply_async:
+            finish_import()
+            finish_import()
+
+        apply_async.assert_called_once_with(countdown=RELATED_REBUILD_DELAY)
+
+    def test_an_unreachable_broker_does_not_fail_the_import(self):
+        with mock.patch.object(tasks.build_related_courses_task, 'apply_async',
+                               side_effect=ConnectionError('refused')), \
+                self.assertLogs('courses.importing', 'WARNING'):
+            finish_import()
+        with mock.patch.object(tasks.build_related_courses_task, 'apply_async') as apply_async:
+            finish_import()
+        apply_async.assert_called_once_with(countdown=RELATED_REBUILD_DELAY)
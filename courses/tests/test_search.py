@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import CourseSearchDocument
+from courses.search import FTS_TABLE, search_courses
+
+from .utils import make_course, make_provider, make_taxonomy
+
+
+def titles(query, **kwargs):
+    return [course.title for course in search_courses(query, **kwargs)[:10]]
+
+
+class CourseSearchTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+        self.category, self.subcategory, self.topic = make_taxonomy()
+
+    def test_courses_matching_more_often_rank_first(self):
+        make_course(self.provider, title='Java Basics', author='Python Fan')
+        make_course(self.provider, title='Python for Python Developers', topic=self.topic)
+        make_course(self.provider, title='Ruby')
+
+        self.assertEqual(titles('python'), ['Python for Python Developers', 'Java Basics'])
+        self.assertEqual(search_courses('python').count(), 2)
+        # Every term must match, and partial words match as prefixes
+        self.assertEqual(titles('pyth devel'), ['Python for Python Developers'])
+
+    def test_documents_follow_course_changes(self):
+        course = make_course(self.provider, title='Python')
+        course.title = 'Django'
+        course.save()
+        self.assertEqual(titles('python'), [])
+        self.assertEqual(titles('django'), ['Django'])
+
+        course.subcategory.add(self.subcategory)
+        self.assertEqual(titles('web'), ['Django'])
+
+        course.delete()
+        self.assertEqual(titles('django'), [])
+
+    def test_free_only_keeps_the_free_matches(self):
+        make_course(self.provider, title='Free Python', is_free=True)
+        make_course(self.provider, title='Python', is_free=True)
+        make_course(self.provider, title='Free Java Trial')
+
+        self.assertEqual(titles('free', free_only=True), ['Free Python'])
+        response = self.client.get(reverse('courses:search'), {'q': 'free'}, secure=True)
+        self.assertEqual([course.title for course in response.context['course_list']], ['Free Python'])
+
+    def test_rebuild_search_index_restores_every_document(self):
+        make_course(self.provider, title='Python')
+        make_course(self.provider, title='Django')
+        CourseSearchDocument.objects.all().delete()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM {}'.format(FTS_TABLE))
+        self.assertEqual(titles('python'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(CourseSearchDocument.objects.count(), 2)
+        self.assertEqual(titles('python'), ['Python'])
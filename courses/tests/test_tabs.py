@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import Category
+from courses.tabs import build_category_tabs, category_tabs
+
+from .utils import make_course, make_provider, make_taxonomy
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+class CategoryTabsPayloadTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+        self.category = make_taxonomy()[0]
+
+    def test_each_tab_keeps_its_most_subscribed_courses(self):
+        other = Category.objects.create(title='Design')
+        make_course(self.provider, title='Unranked', category=self.category)
+        for subscribers in (5, 50, 20, 50):
+            make_course(self.provider, title='Python %d' % subscribers, category=self.category,
+                        num_subscribers=subscribers)
+        make_course(self.provider, title='Figma', category=other, num_subscribers=1)
+        Category.objects.create(title='Music')
+
+        tabs = {tab['title']: tab['courses'] for tab in build_category_tabs(limit=3)}
+        # Ties keep the oldest course first; courses without counts come last
+        self.assertEqual([course['title'] for course in tabs['Development']], ['Python 50', 'Python 50', 'Python 20'])
+        self.assertLess(tabs['Development'][0]['id'], tabs['Development'][1]['id'])
+        self.assertEqual([course['title'] for course in tabs['Design']], ['Figma'])
+        self.assertEqual(tabs['Music'], [])
+
+        course = tabs['Design'][0]
+        self.assertNotIn('description', course)
+        self.assertEqual(course['provider']['title'], 'Udemy')
+        self.assertEqual(course['url'], reverse('courses:course-detail', kwargs={
+            'slug': self.provider.slug, 'slug2': course['slug'],
+        }))
+
+        tabs = {tab['title']: tab['courses'] for tab in build_category_tabs(limit=5)}
+        self.assertEqual(tabs['Development'][-1]['title'], 'Unranked')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CategoryTabsViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = make_provider()
+        self.category = make_taxonomy()[0]
+        make_course(self.provider, title='Python', category=self.category, num_subscribers=10)
+
+    def test_revalidation_is_answered_from_the_cached_etag(self):
+        response = self.client.get(reverse('courses:tabs-list'), secure=True, **AJAX)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, '"%s"' % category_tabs()['etag'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('courses:tabs', kwargs={'slug': self.category.slug}),
+                                       secure=True, HTTP_IF_NONE_MATCH=etag, **AJAX)
+        self.assertEqual(response.status_code, 304)
+
+        # A new payload gets a new ETag
+        cache.clear()
+        make_course(self.provider, title='Django', category=self.category, num_subscribers=20)
+        response = self.client.get(reverse('courses:tabs-list'), secure=True, HTTP_IF_NONE_MATCH=etag, **AJAX)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([course['title'] for course in response.json()['categories'][0]['courses']],
+                         ['Django', 'Python'])
+
+    def test_only_ajax_requests_are_served(self):
+        response = self.client.get(reverse('courses:tabs-list'), secure=True)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('courses:tabs', kwargs={'slug': 'missing'}), secure=True, **AJAX)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,83 @@
+import os
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from courses.edx import edx_tasks
+from courses.importing import FAILED_RANGE_STATS
+from courses.models import ImportCheckpoint
+from courses.udemy import tasks_celery
+
+from .utils import make_course, make_provider
+
+
+class ParallelImportTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+
+    def test_one_range_task_per_page_range(self):
+        # Checkpoint of a range from when the category had fewer pages
+        ImportCheckpoint.objects.create(provider=self.provider, scope='category:Development:pages:4-5',
+                                        last_page=4, started=timezone.now())
+
+        with mock.patch.object(tasks_celery.UdemyProductionImporter, 'count_pages', return_value=7), \
+                mock.patch.object(tasks_celery, 'chord') as chord:
+            result = tasks_celery.import_udemy_courses_parallel_task.apply(
+                kwargs={'target_category': 'Development', 'pages_per_task': 3}
+            ).get()
+
+        self.assertEqual(result, {'pages': 7, 'tasks': 3})
+        signatures = list(chord.call_args[0][0])
+        self.assertEqual([signature.args[1:3] for signature in signatures], [(1, 3), (4, 6), (7, 7)])
+        self.assertEqual(list(ImportCheckpoint.objects.values_list('scope', flat=True)),
+                         ['category:Development:parallel'])
+
+    def test_failed_ranges_report_the_same_statistics(self):
+        with mock.patch.object(tasks_celery.UdemyProductionImporter, 'import_page_range',
+                               side_effect=ConnectionError('timed out')):
+            udemy = tasks_celery.import_udemy_page_range_task.apply(('Development', 1, 5), retries=3).get()
+        with mock.patch.object(edx_tasks.EdxProductionImporter, 'import_page_range',
+                               side_effect=ConnectionError('timed out')):
+            edx = edx_tasks.import_edx_page_range_task.apply((1, 5), retries=3).get()
+
+        self.assertEqual(udemy, FAILED_RANGE_STATS)
+        self.assertEqual(edx, FAILED_RANGE_STATS)
+
+    def test_callback_adds_up_the_ranges(self):
+        tasks_celery.UdemyProductionImporter().start_parallel_import('Development', [(1, 5), (6, 10)])
+        make_course(self.provider, title='Python')
+        ranges = [
+            {'courses_processed': 10, 'courses_created': 1, 'courses_updated': 2, 'courses_unchanged': 7,
+             'errors': 0, 'api_stats': {'calls': 5, 'retries': 1, 'p95_ms': 120.0}},
+            dict(FAILED_RANGE_STATS),
+        ]
+
+        with mock.patch.object(tasks_celery, 'send_import_report') as send_import_report:
+            stats = tasks_celery.finish_udemy_import_task(ranges, 'Development')
+
+        send_import_report.assert_called_once_with(stats)
+        self.assertEqual((stats['courses_created'], stats['errors'], stats['failed_ranges']), (1, 1, 1))
+        self.assertEqual(stats['api_stats'], {'calls': 5, 'retries': 1, 'p95_ms': 120.0})
+        self.assertEqual((stats['initial_count'], stats['final_count']), (0, 1))
+
+        # The next run resumes the failed one, with its initial course count
+        tasks_celery.UdemyProductionImporter().start_parallel_import('Development', [(1, 5), (6, 10)])
+        with mock.patch.object(tasks_celery, 'send_import_report'):
+            stats = tasks_celery.finish_udemy_import_task([ranges[0]], 'Development')
+        self.assertEqual(stats['initial_count'], 0)
+        self.assertIsNotNone(ImportCheckpoint.objects.get().finished)
+
+
+@mock.patch.dict(os.environ, {'EMAIL_HOST_USER': 'imports@example.com', 'MANAGER_EMAIL': 'manager@example.com'})
+class ImportFailureEmailTests(TestCase):
+
+    def test_a_failing_import_sends_one_email_after_its_retries(self):
+        with mock.patch('courses.udemy.importer._production_importer.import_courses_by_category',
+                        side_effect=ConnectionError('timed out')) as import_courses:
+            tasks_celery.import_udemy_courses_task.apply()
+
+        self.assertEqual(import_courses.call_count, 4)
+        self.assertEqual([message.subject for message in mail.outbox], ['Udemy Import Task Failed'])
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from courses.models import Course, ImportCheckpoint
+from courses.udemy.base import UdemyImportBase
+from courses.udemy.importer import UdemyProductionImporter
+
+from .utils import make_course, make_provider
+
+
+class BackfillExternalIdsTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider()
+        self.importer = UdemyImportBase.__new__(UdemyImportBase)
+        self.importer.get_provider = lambda: self.provider
+        self.client = mock.Mock()
+        self.client.courses.side_effect = lambda page, **kwargs: {'results': [
+            {'url': '/python-old/', 'id': 1},
+            {'url': '/django/', 'id': 2},
+        ]} if page == 1 else {}
+        self.importer.get_udemy_client = lambda: self.client
+
+    def test_ids_already_in_use_are_skipped(self):
+        make_course(self.provider, title='Python', course_url='https://www.udemy.com/python/', external_id='1')
+        make_course(self.provider, title='Python (old URL)', course_url='https://www.udemy.com/python-old/')
+        make_course(self.provider, title='Django', course_url='https://www.udemy.com/django/')
+
+        with self.assertLogs('courses.udemy.base', 'WARNING'):
+            self.assertEqual(self.importer.backfill_external_ids('Development'), 1)
+        self.assertEqual(dict(Course.objects.values_list('title', 'external_id')), {
+            'Python': '1',
+            'Python (old URL)': None,
+            'Django': '2',
+        })
+
+
+class ImportPagesTests(TestCase):
+
+    def setUp(self):
+        make_provider()
+        self.importer = UdemyProductionImporter()
+        self.client = mock.Mock()
+        self.importer.get_udemy_client = lambda: self.client
+        self.importer.fetch_changed_courses = mock.Mock(return_value=({}, 1))
+
+    def test_a_failed_course_list_stops_the_import_at_the_last_checkpoint(self):
+        self.client.courses.side_effect = [{'results': [{'id': 1}]}, ConnectionError('timed out')]
+
+        with self.assertRaises(ConnectionError), self.assertLogs('courses.udemy.importer', 'ERROR'):
+            self.importer.import_page_range('Development', 1, 3)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.last_page, 1)
+        self.assertIsNone(checkpoint.finished)
+
+        # The next run resumes with the failed page
+        self.client.courses.side_effect = [{'results': [{'id': 2}]}, {'results': []}]
+        self.importer.import_page_range('Development', 1, 3)
+        self.assertEqual([call.kwargs['page'] for call in self.client.courses.call_args_list], [1, 2, 2, 3])
+
+
+class ChangedCourseTests(TestCase):
+
+    def setUp(self):
+        make_provider()
+        self.importer = UdemyProductionImporter()
+        self.client = mock.Mock()
+        self.client.course_detail.return_value = {}
+        self.importer.get_udemy_client = lambda: self.client
+
+    def import_listing(self, **listing):
+        listing = {'id': 7, 'title': 'Python', 'url': '/python/', 'num_subscribers': 10, 'is_paid': True,
+                   **listing}
+        self.client.courses.side_effect = lambda page, **kwargs: {'results': [listing] if page == 1 else []}
+        return self.importer.import_page_range('Development', 1, 2)
+
+    def test_changed_titles_are_written(self):
+        self.import_listing()
+        self.import_listing(title='Python for Everybody', is_paid=False)
+
+        course = Course.objects.get()
+        self.assertEqual((course.title, course.is_free), ('Python for Everybody', True))
+        self.assertEqual(self.import_listing(title='Python for Everybody', is_paid=False)['courses_unchanged'], 1)
@@ -0,0 +1,50 @@
+"""
+Fixtures shared by the course tests.
+"""
+
+from django.test.utils import override_settings
+from django.urls import resolve
+
+from courses.models import Category, Course, Provider, SubCategory, Topic
+from courses.query_budget import get_query_budget
+
+
+def make_provider(title='Udemy', **kwargs):
+    return Provider.objects.create(title=title, provider_url='https://www.udemy.com', **kwargs)
+
+
+def make_taxonomy():
+    """A category with one subcategory and one topic."""
+    category = Category.objects.create(title='Development')
+    subcategory = SubCategory.objects.create(title='Web Development', category=category)
+    topic = Topic.objects.create(title='Python')
+    topic.category.add(category)
+    topic.subcategory.add(subcategory)
+    return category, subcategory, topic
+
+
+def make_course(provider, title='Course', category=None, subcategory=None, topic=None, **kwargs):
+    kwargs.setdefault('description', 'A course')
+    course = Course.objects.create(provider=provider, title=title, **kwargs)
+    if category is not None:
+        course.category.add(category)
+    if subcategory is not None:
+        course.subcategory.add(subcategory)
+    if topic is not None:
+        course.topic.add(topic)
+    return course
+
+
+class QueryBudgetTestMixin(object):
+    """
+    ``TestCase`` mixin that requests a URL with budgets enforced.
+
+    ``assertWithinQueryBudget`` also fails for views that have not declared
+    a budget, so new views cannot slip through untracked.
+    """
+
+    def assertWithinQueryBudget(self, path, **extra):
+        view = resolve(path).func
+        self.assertIsNotNone(get_query_budget(view), '%s has no query budget' % path)
+        with override_settings(QUERY_BUDGET_ENFORCE=True):
+            return self.client.get(path, **extra)
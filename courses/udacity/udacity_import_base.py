@@ -5,8 +5,8 @@ Base functionality for importing courses from Udacity JSON data.
 
 import logging
 from datetime import datetime
-from django.utils import timezone
-from courses.models import Course, Provider, Category, SubCategory, Topic
+from courses.importing import TaxonomyResolver, sync_course_links
+from courses.models import Course, Provider
 from .udacity_data_loader import UdacityDataLoader
 
 logger = logging.getLogger(__name__)
@@ -27,6 +27,7 @@ class UdacityImporterBase:
         self.data_loader = UdacityDataLoader(json_file_path)
         self.provider_name = 'Udacity'
         self.provider = None
+        self.taxonomy = TaxonomyResolver()
         self.stats = {
             'processed': 0,
             'created': 0,
@@ -44,13 +45,8 @@ class UdacityImporterBase:
         """
         if not self.provider:
             self.provider, created = Provider.objects.get_or_create(
-                name=self.provider_name,
-                defaults={
-                    'description': 'Udacity is an online learning platform offering courses from industry leaders and universities.',
-                    'website': 'https://www.udacity.com',
-                    'api_url': 'https://www.udacity.com/api/courses',  # Note: Not actually used
-                    'is_active': True
-                }
+                title=self.provider_name,
+                defaults={'provider_url': 'https://www.udacity.com'}
             )
             if created:
                 logger.info(f"Created new provider: {self.provider_name}")
@@ -166,7 +162,7 @@ class UdacityImporterBase:
 
     def get_or_create_category(self, category_name):
         """
-        Get or create category.
+        Get or create category, from the taxonomy of the run.
 
         Args:
             category_name (str): Category name
@@ -177,15 +173,11 @@ class UdacityImporterBase:
         if not category_name:
             return None
 
-        category, created = Category.objects.get_or_create(
-            name=category_name,
-            defaults={'description': f'Courses related to {category_name}'}
-        )
-        return category
+        return self.taxonomy.category(category_name)
 
     def get_or_create_subcategory(self, subcategory_name, category):
         """
-        Get or create subcategory.
+        Get or create subcategory, from the taxonomy of the run.
 
         Args:
             subcategory_name (str): Subcategory name
@@ -197,16 +189,11 @@ class UdacityImporterBase:
         if not subcategory_name or not category:
             return None
 
-        subcategory, created = SubCategory.objects.get_or_create(
-            name=subcategory_name,
-            category=category,
-            defaults={'description': f'Subcategory of {category.name}'}
-        )
-        return subcategory
+        return self.taxonomy.subcategory(subcategory_name, category)
 
     def get_or_create_topic(self, topic_name, subcategory):
         """
-        Get or create topic.
+        Get or create topic, from the taxonomy of the run.
 
         Args:
             topic_name (str): Topic name
@@ -218,12 +205,7 @@ class UdacityImporterBase:
         if not topic_name or not subcategory:
             return None
 
-        topic, created = Topic.objects.get_or_create(
-            name=topic_name,
-            subcategory=subcategory,
-            defaults={'description': f'Topic under {subcategory.name}'}
-        )
-        return topic
+        return self.taxonomy.topic(topic_name, subcategory)
 
     def create_or_update_course(self, course_data):
         """
@@ -240,28 +222,14 @@ class UdacityImporterBase:
 
             # Create course data for model
             course_defaults = {
-                'title': course_data['title'],
-                'description': course_data['description'],
-                'short_description': course_data['short_description'],
-                'price': course_data['price'],
-                'original_price': course_data['original_price'],
-                'discount_percentage': course_data['discount_percentage'],
-                'effort': course_data['duration'],  # Map duration to effort
-                'language': course_data['language'],
-                'enrollment_start': course_data['enrollment_start'],
-                'enrollment_end': course_data['enrollment_end'],
-                'course_start': course_data['course_start'],
-                'course_end': course_data['course_end'],
+                'title': course_data['title'][:255],
+                'description': course_data['description'] or course_data['short_description'] or '',
+                'duration': course_data['duration'],
                 'course_url': course_data['course_url'],
                 'image_url': course_data['image_url'],
                 'video_url': course_data['video_url'],
-                'instructor_names': course_data['instructor_names'],
-                'organization': course_data['organization'],
-                'level': course_data['level'],
-                'prerequisites': course_data['prerequisites'],
-                'raw_data': course_data['raw_data'],
-                'last_updated': timezone.now(),
-                'is_active': course_data['is_available']
+                'author': ', '.join(course_data['instructor_names'])[:255] or course_data['organization'],
+                'level': (course_data['level'] or '')[:100],
             }
 
             # Set free/paid status
@@ -270,18 +238,14 @@ class UdacityImporterBase:
             else:
                 course_defaults['price'] = course_data['price']
 
-            # Try to get existing course or create new one
-            course, created = Course.objects.get_or_create(
-                course_id=course_data['course_key'],
+            # One indexed lookup on the (provider, external_id) constraint
+            course, created = Course.objects.update_or_create(
                 provider=provider,
+                external_id=course_data['course_key'],
                 defaults=course_defaults
             )
 
             if not created:
-                # Update existing course
-                for key, value in course_defaults.items():
-                    setattr(course, key, value)
-                course.save()
                 logger.info(f"Updated course: {course.title}")
                 self.stats['updated'] += 1
             else:
@@ -302,6 +266,8 @@ class UdacityImporterBase:
         """
         Handle course categories, subcategories, and topics.
 
+        Only the links that differ from the current ones are written.
+
         Args:
             course (Course): Course instance
             categories (list): List of category names
@@ -309,11 +275,7 @@ class UdacityImporterBase:
         if not categories:
             return
 
-        # Clear existing relationships
-        course.categories.clear()
-        course.subcategories.clear()
-        course.topics.clear()
-
+        links = {'category': set(), 'subcategory': set(), 'topic': set()}
         for category_name in categories:
             if not category_name:
                 continue
@@ -321,17 +283,19 @@ class UdacityImporterBase:
             # Create category
             category = self.get_or_create_category(category_name)
             if category:
-                course.categories.add(category)
+                links['category'].add(category.pk)
 
                 # For now, we'll treat categories as both categories and subcategories
                 subcategory = self.get_or_create_subcategory(category_name, category)
                 if subcategory:
-                    course.subcategories.add(subcategory)
+                    links['subcategory'].add(subcategory.pk)
 
                     # Create topic with same name
                     topic = self.get_or_create_topic(category_name, subcategory)
                     if topic:
-                        course.topics.add(topic)
+                        links['topic'].add(topic.pk)
+
+        sync_course_links({course.pk: links})
 
     def log_stats(self):
         """
@@ -346,8 +310,9 @@ class UdacityImporterBase:
 
     def reset_stats(self):
         """
-        Reset import statistics.
+        Reset import statistics, and the taxonomy loaded by the last run.
         """
+        self.taxonomy = TaxonomyResolver()
         self.stats = {
             'processed': 0,
             'created': 0,
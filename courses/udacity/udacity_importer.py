@@ -5,6 +5,8 @@ Imports courses from Udacity JSON data.
 
 import logging
 from django.core.management.base import BaseCommand
+from courses.importing import finish_import
+from courses.search import defer_search_updates
 from .udacity_import_base import UdacityImporterBase
 
 logger = logging.getLogger(__name__)
@@ -19,6 +21,7 @@ class UdacityImporter(UdacityImporterBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    @defer_search_updates()
     def import_all_courses(self, only_available=True):
         """
         Import all courses from Udacity JSON data.
@@ -56,6 +59,7 @@ class UdacityImporter(UdacityImporterBase):
 
             logger.info("Udacity course import completed")
             self.log_stats()
+            finish_import()
 
         except Exception as e:
             logger.error(f"Critical error during Udacity import: {e}")
@@ -63,6 +67,7 @@ class UdacityImporter(UdacityImporterBase):
 
         return self.stats
 
+    @defer_search_updates()
     def import_course_by_key(self, course_key):
         """
         Import a specific course by its key.
@@ -99,6 +104,7 @@ class UdacityImporter(UdacityImporterBase):
 
         return None
 
+    @defer_search_updates()
     def import_courses_by_level(self, level):
         """
         Import courses filtered by difficulty level.
@@ -138,6 +144,7 @@ class UdacityImporter(UdacityImporterBase):
 
         return self.stats
 
+    @defer_search_updates()
     def import_courses_by_tags(self, tags):
         """
         Import courses that match specified tags.
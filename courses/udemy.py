@@ -1,18 +1,116 @@
 # library for udemy api url calls
 
 
+import logging
 import operator
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
 
 from requests.auth import HTTPBasicAuth
 
+from courses.http_cache import CachingHTTPAdapter, get_http_cache
+
+logger = logging.getLogger(__name__)
+
+UDEMY_POOL_SIZE = int(os.getenv('UDEMY_POOL_SIZE', 10))
+UDEMY_CONNECT_TIMEOUT = float(os.getenv('UDEMY_CONNECT_TIMEOUT', 5))
+UDEMY_READ_TIMEOUT = float(os.getenv('UDEMY_READ_TIMEOUT', 30))
+UDEMY_MAX_RETRIES = int(os.getenv('UDEMY_MAX_RETRIES', 5))
+UDEMY_BACKOFF_FACTOR = float(os.getenv('UDEMY_BACKOFF_FACTOR', 0.5))
+UDEMY_MAX_BACKOFF = float(os.getenv('UDEMY_MAX_BACKOFF', 60))
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RequestStats(object):
+    '''
+    Latency and retry counters of the API calls made by one client.
+    Safe to update from several threads.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+            self.retries = 0
+            self.failures = 0
+            self.cached = 0
+
+    def record(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def record_cached(self):
+        with self._lock:
+            self.cached += 1
+
+    def summary(self):
+        '''
+        Returns call count, retries, failures, calls answered from the
+        response cache (fresh or revalidated) and latency percentiles in
+        milliseconds.
+        '''
+        with self._lock:
+            latencies = sorted(self.latencies)
+            retries, failures, cached = self.retries, self.failures, self.cached
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+        return {
+            'calls': len(latencies),
+            'retries': retries,
+            'failures': failures,
+            'cached': cached,
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+
 
 class Udemy(object):
 
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, pool_size=None, timeout=None,
+                 max_retries=None, backoff_factor=None, rate_limiter=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self._URL = 'https://www.udemy.com/api-2.0/{}/?'
+        self.timeout = timeout or (UDEMY_CONNECT_TIMEOUT, UDEMY_READ_TIMEOUT)
+        self.max_retries = UDEMY_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_factor = UDEMY_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        self.stats = RequestStats()
+        # Acquired by the adapter before every request that reaches Udemy,
+        # retries included
+        self.rate_limiter = rate_limiter
+
+        # One keep-alive pool shared by every call, answering repeated GETs
+        # from the provider response cache; retries are handled in _get so
+        # that Retry-After and jitter can be applied.
+        pool_size = pool_size or UDEMY_POOL_SIZE
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(client_id, client_secret)
+        self.session.mount('https://', CachingHTTPAdapter(get_http_cache(), pool_connections=1,
+                                                          pool_maxsize=pool_size, max_retries=0,
+                                                          rate_limiter=rate_limiter))
 
     def _get_url(self, resource, **kwargs):
         url = self._URL.format(resource)
@@ -26,8 +124,63 @@ class Udemy(object):
 
     @property
     def _authentication(self):
-        auth = HTTPBasicAuth(self.client_id, self.client_secret)
-        return auth
+        return self.session.auth
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads out the retries of concurrent workers.
+        return random.uniform(0, min(UDEMY_MAX_BACKOFF, self.backoff_factor * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0), UDEMY_MAX_BACKOFF)
+
+    def _get(self, url):
+        '''
+        GET ``url`` and return the decoded JSON body.
+
+        Connection errors, timeouts and 429/5xx responses are retried up to
+        ``max_retries`` times, waiting for ``Retry-After`` when the server
+        sends one and for an exponential backoff with jitter otherwise.
+        '''
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.stats.record(time.perf_counter() - start)
+                if last_attempt:
+                    self.stats.record_failure()
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Udemy request failed ({e}), retrying in {delay:.1f}s")
+            else:
+                latency = getattr(response, 'latency', time.perf_counter() - start)
+                self.stats.record(latency)
+                logger.debug(f"GET {url} {response.status_code} in {latency * 1000:.0f}ms")
+                if response.status_code not in RETRY_STATUSES:
+                    if getattr(response, 'from_cache', False):
+                        self.stats.record_cached()
+                    return response.json()
+                if last_attempt:
+                    self.stats.record_failure()
+                    return response.json()
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(f"Udemy returned {response.status_code}, retrying in {delay:.1f}s")
+            self.stats.record_retry()
+            time.sleep(delay)
 
     def courses(self, **kwargs):
         '''
@@ -36,7 +189,7 @@ class Udemy(object):
         To see the list of accepted parameters go to:
         https://www.udemy.com/developers/methods/get-courses-list/
         '''
-        courses = requests.get(self._get_url('courses', **kwargs), auth=self._authentication).json()
+        courses = self._get(self._get_url('courses', **kwargs))
         return courses
 
     def course_detail(self, id, **kwargs):
@@ -46,7 +199,7 @@ class Udemy(object):
         To see the list of accepted parameters go to:
         https://www.udemy.com/developers/methods/get-courses-detail/
         '''
-        course = requests.get(self._get_url('courses/{}'.format(id), **kwargs), auth=self._authentication).json()
+        course = self._get(self._get_url('courses/{}'.format(id), **kwargs))
         return course
 
     def public_curriculum(self, id, **kwargs):
@@ -56,7 +209,7 @@ class Udemy(object):
         To see the list of accepted parameters go to:
         https://www.udemy.com/developers/methods/get-publiccurriculum-list/
         '''
-        public_curriculum = requests.get(self._get_url('courses/{}/public-curriculum-items'.format(id)), auth=self._authentication).json()
+        public_curriculum = self._get(self._get_url('courses/{}/public-curriculum-items'.format(id)))
         return public_curriculum
 
     def course_reviews(self, id, **kwargs):
@@ -66,6 +219,8 @@ class Udemy(object):
         To see the list of accepted parameters go to:
         https://www.udemy.com/developers/methods/get-publiccurriculum-list/
         '''
-        reviews = requests.get(self._get_url('courses/{}/reviews'.format(id), **kwargs),
-                               auth=self._authentication).json()
+        reviews = self._get(self._get_url('courses/{}/reviews'.format(id), **kwargs))
         return reviews
+
+    def close(self):
+        self.session.close()
@@ -7,6 +7,7 @@ production and test Udemy import tasks.
 from __future__ import absolute_import, unicode_literals
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from django.core.mail import send_mail
 from django.db import transaction
@@ -20,7 +21,9 @@ udemy_module = importlib.util.module_from_spec(udemy_spec)
 udemy_spec.loader.exec_module(udemy_module)
 Udemy = udemy_module.Udemy
 from accounts.models import MyUser
-from courses.models import Category, SubCategory, Provider, Course, Topic
+from courses.importing import CourseBatchWriter, TaxonomyResolver, fingerprint
+from courses.models import Provider, Course
+from courses.ratelimit import shared_rate_limiter
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -29,6 +32,37 @@ logger = logging.getLogger(__name__)
 UDEMY_CLIENT_ID = os.getenv('UDEMY_CLIENT_ID')
 UDEMY_CLIENT_SECRET = os.getenv('UDEMY_CLIENT_SECRET')
 
+# Parallel course detail fetches and the request rate cap (per second) of the
+# credentials, shared by all workers when RATE_LIMIT_REDIS_URL is set
+UDEMY_FETCH_WORKERS = int(os.getenv('UDEMY_FETCH_WORKERS', 8))
+UDEMY_RATE_LIMIT = float(os.getenv('UDEMY_RATE_LIMIT', 10))
+
+# Request only the fields that are stored on the list endpoint, and fetch
+# details only for courses that changed
+UDEMY_PROJECTED_LIST = os.getenv('UDEMY_PROJECTED_LIST', 'True') == 'True'
+
+# Fields requested from the course list, which are fingerprinted ...
+UDEMY_LIST_FIELDS = (
+    'id', 'title', 'url', 'image_480x270', 'visible_instructors', 'num_subscribers', 'avg_rating',
+    'num_reviews', 'primary_subcategory', 'course_has_labels', 'is_paid', 'content_info',
+    'instructional_level',
+)
+# ... and the fields fetched from the details of changed courses
+UDEMY_DETAIL_FIELDS = ('description', 'what_you_will_learn_data', 'who_should_attend_data', 'promo_asset')
+
+# Course list pages imported per task by the parallel import
+UDEMY_PAGES_PER_TASK = int(os.getenv('UDEMY_PAGES_PER_TASK', 5))
+
+# Courses written, and committed, per bulk insert/update
+UDEMY_WRITE_BATCH_SIZE = int(os.getenv('UDEMY_WRITE_BATCH_SIZE', 200))
+
+# Fields written on existing courses: every field parsed from the payload,
+# since a course is only rewritten when the fingerprint of that payload
+# changed and the next run compares against the stored fingerprint
+UDEMY_UPDATE_FIELDS = ('title', 'description', 'image_url', 'author', 'duration', 'level', 'course_url',
+                       'price', 'is_free', 'has_certificate', 'num_subscribers', 'is_popular', 'rating',
+                       'num_reviews', 'video_url', 'source_fingerprint')
+
 # Base category mapping for Udemy to local categories
 BASE_CATEGORY_MAPPING = {
     'Development': 'Computer Science',
@@ -75,6 +109,12 @@ class UdemyImportBase:
         self.user_email = user_email
         self.udemy_client = None
         self.provider = None
+        self.rate_limiter = shared_rate_limiter('udemy', UDEMY_CLIENT_ID, UDEMY_RATE_LIMIT)
+        self.clear_taxonomy_cache()
+
+    def clear_taxonomy_cache(self):
+        """Forget the categories, subcategories and topics looked up so far"""
+        self.taxonomy = TaxonomyResolver()
 
     def get_udemy_client(self):
         """Initialize and return Udemy API client"""
@@ -82,10 +122,39 @@ class UdemyImportBase:
             raise ValueError("Udemy API credentials not found in environment variables")
 
         if self.udemy_client is None:
-            self.udemy_client = Udemy(UDEMY_CLIENT_ID, UDEMY_CLIENT_SECRET)
+            self.udemy_client = Udemy(UDEMY_CLIENT_ID, UDEMY_CLIENT_SECRET, rate_limiter=self.rate_limiter)
 
         return self.udemy_client
 
+    def fetch_course_details(self, course_ids, executor, **kwargs):
+        """
+        Fetch the details of ``course_ids`` in parallel.
+
+        Args:
+            course_ids (list): Udemy course IDs in the order they should be returned
+            executor (ThreadPoolExecutor): Pool running the requests
+            **kwargs: Extra query parameters for ``course_detail``
+
+        Returns:
+            generator: ``(course_id, course_detail, error)`` tuples in the order of
+            ``course_ids``; ``error`` is the exception a failed fetch raised
+        """
+        udemy_client = self.get_udemy_client()
+
+        def fetch(course_id):
+            return udemy_client.course_detail(course_id, **kwargs)
+
+        futures = [(course_id, executor.submit(fetch, course_id)) for course_id in course_ids]
+        for course_id, future in futures:
+            try:
+                yield course_id, future.result(), None
+            except Exception as e:
+                yield course_id, None, e
+
+    def create_fetch_executor(self):
+        """Thread pool for ``fetch_course_details``."""
+        return ThreadPoolExecutor(max_workers=UDEMY_FETCH_WORKERS, thread_name_prefix='udemy-fetch')
+
     def get_provider(self):
         """Get or create Udemy provider"""
         if self.provider is None:
@@ -114,42 +183,38 @@ class UdemyImportBase:
 
     def get_or_create_category(self, udemy_category):
         """Get or create local category from Udemy category"""
-        local_category_name = self.category_mapping.get(udemy_category, udemy_category)
-        category, created = Category.objects.get_or_create(
-            title=local_category_name,
-            defaults={'slug': local_category_name.lower().replace(' ', '-')}
-        )
-        return category
-
-    def update_course_details(self, course_obj, course_detail):
-        """Update course with detailed information from Udemy API"""
+        return self.taxonomy.category(self.category_mapping.get(udemy_category, udemy_category))
+
+    def get_or_create_subcategory(self, subcategory_title, category):
+        """Get or create a subcategory of ``category``, once per import"""
+        return self.taxonomy.subcategory(subcategory_title, category)
+
+    def get_or_create_topic(self, topic_title):
+        """Get or create a topic, once per import"""
+        return self.taxonomy.topic(topic_title)
+
+    def apply_course_details(self, course_obj, course_detail):
+        """Set the fields refreshed on every import from Udemy course details"""
+        # Update subscriber count and popularity
+        num_subscribers = course_detail.get('num_subscribers')
+        if num_subscribers:
+            course_obj.num_subscribers = num_subscribers
+            course_obj.is_popular = num_subscribers > 5000
+
+        # Update rating information
+        rating = course_detail.get('avg_rating')
+        num_reviews = course_detail.get('num_reviews')
+        if rating:
+            course_obj.rating = rating
+        if num_reviews:
+            course_obj.num_reviews = num_reviews
+
+        # Update video URL if available
         try:
-            # Update subscriber count and popularity
-            num_subscribers = course_detail.get('num_subscribers')
-            if num_subscribers:
-                course_obj.num_subscribers = num_subscribers
-                course_obj.is_popular = num_subscribers > 5000
-
-            # Update rating information
-            rating = course_detail.get('avg_rating')
-            num_reviews = course_detail.get('num_reviews')
-            if rating:
-                course_obj.rating = rating
-            if num_reviews:
-                course_obj.num_reviews = num_reviews
-
-            # Update video URL if available
-            try:
-                video_url = course_detail['promo_asset']['download_urls']['Video'][0]['file']
-                course_obj.video_url = video_url
-            except (KeyError, IndexError):
-                logger.info(f"No video available for course: {course_obj.title}")
-
-            course_obj.save()
-            logger.info(f"Updated course details for: {course_obj.title}")
-
-        except Exception as e:
-            logger.error(f"Error updating course details for {course_obj.title}: {str(e)}")
+            video_url = course_detail['promo_asset']['download_urls']['Video'][0]['file']
+            course_obj.video_url = video_url
+        except (KeyError, IndexError, TypeError):
+            logger.info(f"No video available for course: {course_obj.title}")
 
     def create_course_description(self, course_detail):
         """Create comprehensive course description from Udemy data"""
@@ -188,39 +253,183 @@ class UdemyImportBase:
 
         return description
 
-    def process_course_category(self, course_obj, category, course_detail):
-        """Process course category, subcategory, and topics"""
-        # Add category
-        course_obj.category.add(category)
+    def parse_course(self, course_detail):
+        """
+        Build an unsaved course from Udemy course details.
+
+        Args:
+            course_detail (dict): Course detail data from Udemy API
+
+        Returns:
+            Course: Unsaved course, or None when the details have no id or title
+        """
+        course_title = (course_detail.get('title') or '').strip()
+        if not course_title or not course_detail.get('id'):
+            return None
+
+        course_obj = Course(
+            provider=self.get_provider(),
+            external_id=str(course_detail['id']),
+            image_url=course_detail.get('image_480x270', ''),
+            title=course_title,
+            description=self.create_course_description(course_detail),
+            author=(course_detail.get('visible_instructors') or [{}])[0].get('title', ''),
+            duration=course_detail.get('content_info', ''),
+            level=course_detail.get('instructional_level', ''),
+            course_url=f"https://www.udemy.com{course_detail.get('url', '')}",
+        )
+
+        # Set pricing
+        if course_detail.get('is_paid', False):
+            course_obj.price = 13.0
+        else:
+            course_obj.is_free = True
+
+        course_obj.has_certificate = True
+        self.apply_course_details(course_obj, course_detail)
+        return course_obj
+
+    def parse_course_taxonomy(self, course_detail, category):
+        """
+        Resolve the category, subcategory and topics of a course.
+
+        Args:
+            course_detail (dict): Course detail data from Udemy API
+            category (Category): Local category the course is imported into
+
+        Returns:
+            tuple: (category_ids, subcategory_ids, topic_ids) sets; topic_ids is
+            None when the details carry no labels
+        """
+        subcategory_ids = set()
+        topic_ids = set() if 'course_has_labels' in course_detail else None
 
         # Process subcategory
         try:
             subcategory_title = course_detail['primary_subcategory']['title']
-            subcategory, created = SubCategory.objects.get_or_create(
-                title=subcategory_title,
-                category=category,
-                defaults={'slug': subcategory_title.lower().replace(' ', '-')}
-            )
-            course_obj.subcategory.add(subcategory)
-            logger.info(f"Added subcategory: {subcategory_title}")
+            subcategory_ids.add(self.get_or_create_subcategory(subcategory_title, category).pk)
         except (KeyError, TypeError) as e:
             logger.warning(f"No subcategory data available: {str(e)}")
 
         # Process topics/labels
-        try:
-            labels = course_detail.get('course_has_labels', [])
-            for label_data in labels:
+        for label_data in course_detail.get('course_has_labels') or []:
+            try:
+                topic_ids.add(self.get_or_create_topic(label_data['label']['title']).pk)
+            except (KeyError, TypeError) as e:
+                logger.warning(f"Error processing topic: {str(e)}")
+
+        return {category.pk}, subcategory_ids, topic_ids
+
+    def prefetch_taxonomy(self, course_details, category):
+        """
+        Resolve the subcategories and topics of a page of courses at once,
+        creating the missing ones with one insert per model.
+
+        Args:
+            course_details (list): Course detail data from Udemy API
+            category (Category): Local category the courses are imported into
+        """
+        subcategory_titles, topic_titles = set(), set()
+        for course_detail in course_details:
+            try:
+                subcategory_titles.add(course_detail['primary_subcategory']['title'])
+            except (KeyError, TypeError):
+                pass
+            for label_data in course_detail.get('course_has_labels') or []:
                 try:
-                    topic_title = label_data['label']['title']
-                    topic, created = Topic.objects.get_or_create(
-                        title=topic_title,
-                        defaults={'slug': topic_title.lower().replace(' ', '-')}
-                    )
-                    course_obj.topic.add(topic)
-                except (KeyError, TypeError) as e:
-                    logger.warning(f"Error processing topic: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error processing course labels: {str(e)}")
+                    topic_titles.add(label_data['label']['title'])
+                except (KeyError, TypeError):
+                    pass
+        self.taxonomy.subcategories([(title, category) for title in subcategory_titles])
+        self.taxonomy.topics([(title, None) for title in topic_titles])
+
+    def create_course_writer(self, batch_size=None):
+        """Batch writer for the courses of the Udemy provider"""
+        # Courses imported before external ids are adopted by their URL. A
+        # course keeps the categories of every import that found it, while
+        # its topics follow its current labels.
+        return CourseBatchWriter(self.get_provider(), batch_size=batch_size or UDEMY_WRITE_BATCH_SIZE,
+                                 update_fields=UDEMY_UPDATE_FIELDS, legacy_match_field='course_url',
+                                 replace_links=('topic',))
+
+    def backfill_external_ids(self, target_category, max_pages=101):
+        """
+        Set the Udemy id of courses imported without one.
+
+        Pages through the course list of a category, which carries the id and
+        URL of every course, and writes the ids of matching rows one page at a
+        time.
+
+        Args:
+            target_category (str): Udemy category to page through
+            max_pages (int): Maximum number of pages to process
+
+        Returns:
+            int: Number of courses updated
+        """
+        udemy_client = self.get_udemy_client()
+        provider = self.get_provider()
+        updated = 0
+
+        for page in range(1, max_pages):
+            if not Course.objects.filter(provider=provider, external_id__isnull=True).exists():
+                break
+            course_list = udemy_client.courses(
+                page=page,
+                page_size=100,
+                category=target_category
+            )
+            if not course_list.get('results'):
+                break
+
+            ids_by_url = {
+                f"https://www.udemy.com{course_data['url']}": str(course_data['id'])
+                for course_data in course_list['results']
+                if course_data.get('url') and course_data.get('id')
+            }
+            # Ids already owned by another row, e.g. one imported under a
+            # second URL, would break the unique constraint.
+            taken = set(Course.objects.filter(provider=provider, external_id__in=list(ids_by_url.values()))
+                                      .values_list('external_id', flat=True))
+            if taken:
+                skipped = sorted(url for url, external_id in ids_by_url.items() if external_id in taken)
+                logger.warning(f"Skipping {len(taken)} external ids already in use on page {page}: {skipped}")
+                ids_by_url = {url: external_id for url, external_id in ids_by_url.items()
+                              if external_id not in taken}
+            courses = list(Course.objects.filter(provider=provider, external_id__isnull=True,
+                                                 course_url__in=list(ids_by_url))
+                                         .only('id', 'course_url'))
+            for course in courses:
+                # Duplicate rows of one course keep no id; the unique
+                # constraint allows only one.
+                course.external_id = ids_by_url.pop(course.course_url, None)
+            courses = [course for course in courses if course.external_id]
+            Course.objects.bulk_update(courses, ['external_id'])
+            updated += len(courses)
+            logger.info(f"Backfilled {len(courses)} external ids from page {page}")
+
+        return updated
+
+    def add_course(self, writer, course_detail, target_category='Development', source_fingerprint=None):
+        """
+        Parse a course and queue it on ``writer``.
+
+        Args:
+            writer (CourseBatchWriter): Writer the course is queued on
+            course_detail (dict): Course detail data from Udemy API
+            target_category (str): Target category for the course
+            source_fingerprint (str): Fingerprint of ``course_detail`` if already computed
+
+        Returns:
+            list: ``(course, created)`` pairs written when the batch became full
+        """
+        course_obj = self.parse_course(course_detail) if course_detail else None
+        if course_obj is None:
+            return []
+        course_obj.source_fingerprint = source_fingerprint or fingerprint(course_detail)
+        category = self.get_or_create_category(target_category)
+        categories, subcategories, topics = self.parse_course_taxonomy(course_detail, category)
+        return writer.add(course_obj, categories, subcategories, topics)
 
     def send_completion_email(self, subject, message, recipient_list=None):
         """Send completion email notification"""
@@ -255,72 +464,9 @@ class UdemyImportBase:
         Returns:
             tuple: (course_obj, created, updated) where created/updated are booleans
         """
-        if not course_detail:
-            return None, False, False
-
-        course_title = course_detail.get('title', '').strip()
-        if not course_title:
-            return None, False, False
-
-        provider = self.get_provider()
-        user = self.get_user()
-        category = self.get_or_create_category(target_category)
-
-        # Check if course already exists
-        existing_course = Course.objects.filter(
-            title=course_title,
-            provider=provider
-        ).first()
-
-        if existing_course:
-            # Update existing course
-            self.update_course_details(existing_course, course_detail)
-            self.process_course_category(existing_course, category, course_detail)
-            logger.info(f"Updated existing course: {course_title}")
-            return existing_course, False, True
-        else:
-            # Create new course
-            try:
-                # Extract course information
-                image_url = course_detail.get('image_480x270', '')
-                author = course_detail.get('visible_instructors', [{}])[0].get('title', '')
-                duration = course_detail.get('content_info', '')
-                level = course_detail.get('instructional_level', '')
-                course_url = f"https://www.udemy.com{course_detail.get('url', '')}"
-
-                # Create course object
-                course_obj = Course(
-                    user=user,
-                    provider=provider,
-                    image_url=image_url,
-                    title=course_title,
-                    description=self.create_course_description(course_detail),
-                    author=author,
-                    duration=duration,
-                    level=level,
-                    course_url=course_url,
-                )
-
-                # Set pricing
-                if course_detail.get('is_paid', False):
-                    course_obj.price = 13.0
-                else:
-                    course_obj.is_free = True
-
-                course_obj.has_certificate = True
-
-                # Save course
-                course_obj.save()
-
-                # Process categories and topics
-                self.process_course_category(course_obj, category, course_detail)
-
-                # Update additional details
-                self.update_course_details(course_obj, course_detail)
-
-                logger.info(f"Created new course: {course_title}")
-                return course_obj, True, False
-
-            except Exception as e:
-                logger.error(f"Error creating course {course_title}: {str(e)}")
-                raise
+        writer = self.create_course_writer()
+        self.add_course(writer, course_detail, target_category)
+        for course_obj, created in writer.flush():
+            logger.info(f"{'Created new' if created else 'Updated existing'} course: {course_obj.title}")
+            return course_obj, created, not created
+        return None, False, False
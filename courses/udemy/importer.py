@@ -2,8 +2,11 @@ from __future__ import absolute_import, unicode_literals
 import logging
 from django.db import transaction
 
-from .base import UdemyImportBase, PRODUCTION_CATEGORY_MAPPING
-from courses.models import Course
+from .base import (UdemyImportBase, PRODUCTION_CATEGORY_MAPPING, UDEMY_DETAIL_FIELDS, UDEMY_LIST_FIELDS,
+                   UDEMY_PROJECTED_LIST)
+from courses.importing import (checkpoint_stats, finish_checkpoint, finish_import, prune_checkpoints,
+                                save_checkpoint, split_unchanged, start_checkpoint)
+from courses.models import Course, ImportCheckpoint
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,83 +21,227 @@ class UdemyProductionImporter(UdemyImportBase):
     def __init__(self):
         super().__init__(category_mapping=PRODUCTION_CATEGORY_MAPPING)
 
-    @transaction.atomic
-    def import_courses_by_category(self, target_category='Teaching+%26+Academics', max_pages=101):
+    def import_courses_by_category(self, target_category='Teaching+%26+Academics', max_pages=101, batch_size=None):
         """
         Import courses from a specific Udemy category.
 
+        Every batch of ``batch_size`` courses, and the rest of every page,
+        commits on its own. Progress is checkpointed after every page, so a
+        run that is interrupted resumes after its last completed page.
+
         Args:
             target_category (str): Udemy category to import from
             max_pages (int): Maximum number of pages to process
+            batch_size (int): Courses per batch (default: UDEMY_WRITE_BATCH_SIZE)
 
         Returns:
             dict: Import statistics
         """
         logger.info(f"Starting bulk import from category: {target_category}")
 
-        udemy_client = self.get_udemy_client()
+        # The course count from when the run started, also after a resume
+        checkpoint = start_checkpoint(self.get_provider(), f'category:{target_category}')
+        initial_count = checkpoint.initial_count
+        logger.info(f"Initial course count: {initial_count}")
+
+        stats = self._import_pages(target_category, 1, max_pages - 1, batch_size, checkpoint)
+
+        # Final count
+        final_count = Course.objects.filter(provider__title='Udemy').count()
+        logger.info(f"Final course count: {final_count}")
+
+        return {'initial_count': initial_count, 'final_count': final_count, **stats}
+
+    def count_pages(self, target_category, max_pages=101):
+        """
+        Number of course list pages of a category, at most ``max_pages - 1``.
+        """
+        course_list = self.get_udemy_client().courses(page=1, page_size=100, category=target_category)
+        count = course_list.get('count') or 0
+        return min(max_pages - 1, -(-count // 100))
+
+    def import_page_range(self, target_category, first_page, last_page, batch_size=None):
+        """
+        Import the course list pages ``first_page..last_page`` of a category.
+
+        Used by the tasks that split one import over several workers; each
+        range has its own checkpoint.
+
+        Args:
+            target_category (str): Udemy category to import from
+            first_page (int): First page to import
+            last_page (int): Last page to import, inclusive
+            batch_size (int): Courses per batch (default: UDEMY_WRITE_BATCH_SIZE)
+
+        Returns:
+            dict: Import statistics of the range
+        """
+        logger.info(f"Importing pages {first_page}-{last_page} of category: {target_category}")
+        checkpoint = start_checkpoint(self.get_provider(), self.range_scope(target_category, first_page, last_page))
+        return self._import_pages(target_category, first_page, last_page, batch_size, checkpoint)
+
+    @staticmethod
+    def range_scope(target_category, first_page=None, last_page=None):
+        """Checkpoint scope of a page range; without bounds, the prefix of all ranges."""
+        scope = f'category:{target_category}:pages:'
+        return f'{scope}{first_page}-{last_page}' if first_page else scope
+
+    @staticmethod
+    def parallel_scope(target_category):
+        return f'category:{target_category}:parallel'
+
+    def start_parallel_import(self, target_category, ranges):
+        """
+        Checkpoint of a parallel import of a category split into ``ranges``.
+
+        The checkpoints of ranges from an earlier split are deleted: their
+        pages belong to the new ranges. The run's checkpoint is resumed
+        until ``finish_parallel_import``, so that it keeps the course count
+        from when the run started.
+
+        Args:
+            target_category (str): Udemy category to import from
+            ranges (list): ``(first_page, last_page)`` tuples of the run
+
+        Returns:
+            ImportCheckpoint: Checkpoint of the whole run
+        """
         provider = self.get_provider()
-        local_category = self.get_or_create_category(target_category)
+        prune_checkpoints(provider, self.range_scope(target_category),
+                          [self.range_scope(target_category, first, last) for first, last in ranges])
+        return start_checkpoint(provider, self.parallel_scope(target_category))
 
-        # Get initial course count
-        initial_count = Course.objects.filter(provider__title='Udemy').count()
-        logger.info(f"Initial course count: {initial_count}")
+    def finish_parallel_import(self, target_category, stats):
+        """
+        Complete the checkpoint of a parallel import, unless a range failed.
 
-        courses_processed = 0
-        courses_created = 0
-        courses_updated = 0
+        Returns:
+            int: Course count from when the run started
+        """
+        checkpoint = ImportCheckpoint.objects.get(provider=self.get_provider(),
+                                                  scope=self.parallel_scope(target_category)[:255])
+        if not stats.get('failed_ranges'):
+            finish_checkpoint(checkpoint)
+        return checkpoint.initial_count
 
-        # Process multiple pages
-        for page in range(1, max_pages):
-            try:
-                logger.info(f"Processing page {page}")
-                course_list = udemy_client.courses(
-                    page=page,
-                    page_size=100,
-                    category=target_category
-                )
+    def fetch_changed_courses(self, provider, results, executor, stats):
+        """
+        Fetch the details of the courses of a list page that changed.
 
-                if not course_list.get('results'):
-                    logger.info(f"No more courses found at page {page}")
-                    break
+        With ``UDEMY_PROJECTED_LIST`` the list page already carries the
+        fields that are compared, so only changed courses cost a detail call,
+        for the fields the list does not return. Otherwise the full details
+        of every course are fetched and compared.
 
-                for course_data in course_list['results']:
-                    try:
-                        course_id = course_data['id']
-                        course_detail = udemy_client.course_detail(course_id, course='@all')
+        Args:
+            provider (Provider): Udemy provider
+            results (list): Courses of the list page
+            executor (ThreadPoolExecutor): Pool running the detail requests
+            stats (dict): Import statistics; failed requests are counted as errors
+
+        Returns:
+            tuple: (changed, unchanged) where ``changed`` maps course ids to
+            ``(course_detail, source_fingerprint)``
+        """
+        if not UDEMY_PROJECTED_LIST:
+            course_ids = [course_data['id'] for course_data in results]
+            page_details = {}
+            for course_id, course_detail, error in self.fetch_course_details(course_ids, executor, course='@all'):
+                if error is not None:
+                    stats['errors'] += 1
+                    logger.error(f"Error processing course {course_id}: {str(error)}")
+                elif course_detail:
+                    page_details[course_id] = course_detail
+            return split_unchanged(provider, page_details)
+
+        listed = {course_data['id']: course_data for course_data in results}
+        changed, unchanged = split_unchanged(provider, listed)
+        details = self.fetch_course_details(list(changed), executor, course=','.join(UDEMY_DETAIL_FIELDS))
+        for course_id, course_detail, error in details:
+            listed_data, source_fingerprint = changed.pop(course_id)
+            if error is not None:
+                stats['errors'] += 1
+                logger.error(f"Error processing course {course_id}: {str(error)}")
+                continue
+            # The fingerprint stays that of the list data, which the next run
+            # compares against.
+            changed[course_id] = ({**listed_data, **(course_detail or {})}, source_fingerprint)
+        return changed, unchanged
+
+    def _import_pages(self, target_category, first_page, last_page, batch_size, checkpoint):
+        udemy_client = self.get_udemy_client()
+        udemy_client.stats.reset()
+        self.clear_taxonomy_cache()
+        provider = self.get_provider()
+        category = self.get_or_create_category(target_category)
+
+        stats = checkpoint_stats(checkpoint)
+        writer = self.create_course_writer(batch_size)
+        writer.stats.update(created=stats['created'], updated=stats['updated'])
 
-                        if not course_detail:
-                            continue
+        # Process multiple pages; details are fetched in parallel, parsed in
+        # page order and written in batches.
+        with self.create_fetch_executor() as executor:
+            for page in range(max(first_page, checkpoint.last_page + 1), last_page + 1):
+                logger.info(f"Processing page {page}")
+                try:
+                    course_list = udemy_client.courses(
+                        page=page,
+                        page_size=100,
+                        category=target_category,
+                        course=','.join(UDEMY_LIST_FIELDS) if UDEMY_PROJECTED_LIST else None
+                    )
 
-                        course_obj, created, updated = self.process_single_course(
-                            course_detail, target_category
-                        )
+                    if not course_list.get('results'):
+                        logger.info(f"No more courses found at page {page}")
+                        break
 
-                        if course_obj:
-                            courses_processed += 1
-                            if created:
-                                courses_created += 1
-                            elif updated:
-                                courses_updated += 1
+                    # Courses whose data did not change since the last import
+                    # are neither parsed nor written.
+                    changed, unchanged = self.fetch_changed_courses(provider, course_list['results'], executor, stats)
+                    self.prefetch_taxonomy([course_detail for course_detail, _ in changed.values()], category)
+                except Exception as e:
+                    # The checkpoint stays at the previous page, so the next
+                    # run resumes with this one
+                    logger.error(f"Error processing page {page}, stopping: {str(e)}")
+                    raise
 
+                stats['unchanged'] += unchanged
+                for course_id, (course_detail, source_fingerprint) in changed.items():
+                    try:
+                        # Writes a batch, in its own savepoint, once it is full
+                        self.add_course(writer, course_detail, target_category, source_fingerprint)
                     except Exception as e:
-                        logger.error(f"Error processing course {course_data.get('id', 'unknown')}: {str(e)}")
+                        stats['errors'] += 1
+                        logger.error(f"Error processing course {course_id}: {str(e)}")
                         continue
 
-            except Exception as e:
-                logger.error(f"Error processing page {page}: {str(e)}")
-                continue
+                # The page counts as completed once its courses are written
+                with transaction.atomic():
+                    try:
+                        writer.flush()
+                    except Exception as e:
+                        stats['errors'] += 1
+                        logger.error(f"Error writing page {page}: {str(e)}")
+                    # Courses the writer could not write, since the last page
+                    stats['errors'] += writer.stats['failed']
+                    writer.stats['failed'] = 0
+                    stats.update(created=writer.stats['created'], updated=writer.stats['updated'])
+                    stats['processed'] = stats['created'] + stats['updated'] + stats['unchanged']
+                    save_checkpoint(checkpoint, page, stats)
 
-        # Final count
-        final_count = Course.objects.filter(provider__title='Udemy').count()
-        logger.info(f"Final course count: {final_count}")
+        finish_checkpoint(checkpoint)
+
+        api_stats = udemy_client.stats.summary()
+        logger.info(f"Udemy API calls: {api_stats}")
 
         return {
-            'initial_count': initial_count,
-            'final_count': final_count,
-            'courses_processed': courses_processed,
-            'courses_created': courses_created,
-            'courses_updated': courses_updated,
+            'courses_processed': stats['processed'],
+            'courses_created': stats['created'],
+            'courses_updated': stats['updated'],
+            'courses_unchanged': stats['unchanged'],
+            'errors': stats['errors'],
+            'api_stats': api_stats,
         }
 
 
@@ -102,41 +249,63 @@ class UdemyProductionImporter(UdemyImportBase):
 _production_importer = UdemyProductionImporter()
 
 
-@transaction.atomic
-def udemy_import_courses():
-    """Main function to import Udemy courses - Production version"""
+def udemy_import_courses(batch_size=None, notify_failure=True):
+    """
+    Main function to import Udemy courses - Production version
+
+    Args:
+        batch_size (int): Courses committed per batch (default: UDEMY_WRITE_BATCH_SIZE)
+        notify_failure (bool): Email the error when the import fails; off for
+            callers that retry and report the last failure themselves
+    """
     try:
         logger.info("Starting Udemy course import process")
 
         # Import courses from Teaching & Academics category
         stats = _production_importer.import_courses_by_category(
             target_category='Teaching+%26+Academics',
-            max_pages=101
+            max_pages=101,
+            batch_size=batch_size
         )
-
-        # Send completion email
-        if stats['initial_count'] == stats['final_count']:
-            _production_importer.send_completion_email(
-                'All courses already exist in database',
-                'No new courses were found to add to the database.',
-            )
-        else:
-            _production_importer.send_completion_email(
-                'Udemy course import completed successfully',
-                f'Processed {stats["courses_processed"]} courses. '
-                f'Created: {stats["courses_created"]}, Updated: {stats["courses_updated"]}.',
-            )
+        send_import_report(stats)
 
         logger.info("Udemy course import process completed successfully")
         return 'success'
 
     except Exception as e:
         logger.error(f"Udemy import process failed: {str(e)}")
+        if notify_failure:
+            _production_importer.send_completion_email(
+                'Udemy course import failed',
+                f'The import process failed with error: {str(e)}',
+            )
+        raise
+
+
+def send_import_report(stats):
+    """
+    Refresh the catalogue indexes and email the statistics of a finished import.
+
+    Args:
+        stats (dict): Import statistics, including the course counts before and after
+    """
+    finish_import()
+
+    if stats['initial_count'] == stats['final_count']:
         _production_importer.send_completion_email(
-            'Udemy course import failed',
-            f'The import process failed with error: {str(e)}',
+            'All courses already exist in database',
+            'No new courses were found to add to the database.',
+        )
+    else:
+        _production_importer.send_completion_email(
+            'Udemy course import completed successfully',
+            f'Processed {stats["courses_processed"]} courses. '
+            f'Created: {stats["courses_created"]}, Updated: {stats["courses_updated"]}, '
+            f'Unchanged: {stats["courses_unchanged"]}. '
+            f'API calls: {stats["api_stats"]["calls"]}, retries: {stats["api_stats"]["retries"]}, '
+            f'p95 latency: {stats["api_stats"]["p95_ms"]}ms.'
+            + (f' Failed page ranges: {stats["failed_ranges"]}.' if stats.get('failed_ranges') else ''),
         )
-        raise
 
 
 # Backward compatibility alias
@@ -3,23 +3,33 @@ Celery tasks for Udemy and edX course import functionality.
 """
 
 from __future__ import absolute_import, unicode_literals
+import logging
 import os
-from celery import shared_task
+from celery import chord, shared_task
 from django.conf import settings
 from django.core.mail import send_mail
 
-from .udemy.importer import udemy_import_courses
+from courses.importing import FAILED_RANGE_STATS, merge_import_stats, page_ranges
+from courses.models import Course
+from .base import UDEMY_PAGES_PER_TASK
+from .importer import UdemyProductionImporter, send_import_report, udemy_import_courses
 
+logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, name='courses.import_udemy_courses')
-def import_udemy_courses_task(self):
+
+@shared_task(bind=True, name='courses.import_udemy_courses', max_retries=3, default_retry_delay=5 * 60,
+             acks_late=True, reject_on_worker_lost=True)
+def import_udemy_courses_task(self, batch_size=None):
     """
     Celery task to import Udemy courses.
     This task runs the production Udemy course import process.
+    Retries, and redeliveries after a lost worker, resume the import
+    after the last page it completed.
     """
     try:
-        # Call the main Udemy import function
-        result = udemy_import_courses()
+        # Call the main Udemy import function; failures are only reported
+        # below, once the retries ran out
+        result = udemy_import_courses(batch_size=batch_size, notify_failure=False)
 
         # Log success
         self.update_state(
@@ -30,6 +40,9 @@ def import_udemy_courses_task(self):
         return result
 
     except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+
         # Log error and send notification
         error_message = f'Udemy import task failed: {str(exc)}'
 
@@ -71,7 +84,7 @@ def test_udemy_import_task(self):
     This task runs the test Udemy course import process.
     """
     try:
-        from .udemy.test_importer import udemy_import_test_course
+        from .test_importer import udemy_import_test_course
 
         # Call the test Udemy import function
         result = udemy_import_test_course()
@@ -96,6 +109,71 @@ def test_udemy_import_task(self):
         raise exc
 
 
+@shared_task(bind=True, name='courses.import_udemy_courses_parallel')
+def import_udemy_courses_parallel_task(self, target_category='Teaching+%26+Academics', max_pages=101,
+                                       batch_size=None, pages_per_task=None):
+    """
+    Celery task to import Udemy courses on all workers.
+    Counts the pages of the category and imports every range of
+    ``pages_per_task`` pages in its own task; a chord callback adds up their
+    statistics and sends the completion email. A run with failed ranges is
+    resumed by the next one.
+    """
+    importer = UdemyProductionImporter()
+    page_count = importer.count_pages(target_category, max_pages)
+    ranges = page_ranges(page_count, pages_per_task or UDEMY_PAGES_PER_TASK)
+    importer.start_parallel_import(target_category, ranges)
+    if not ranges:
+        return finish_udemy_import_task([], target_category)
+
+    chord(
+        import_udemy_page_range_task.s(target_category, first_page, last_page, batch_size)
+        for first_page, last_page in ranges
+    )(finish_udemy_import_task.s(target_category))
+    return {'pages': page_count, 'tasks': len(ranges)}
+
+
+@shared_task(bind=True, name='courses.import_udemy_page_range', max_retries=3, default_retry_delay=60,
+             acks_late=True, reject_on_worker_lost=True)
+def import_udemy_page_range_task(self, target_category, first_page, last_page, batch_size=None):
+    """
+    Celery task to import one page range of a parallel Udemy import.
+    A retry resumes after the last page of the range it completed.
+    """
+    try:
+        importer = UdemyProductionImporter()
+        return importer.import_page_range(target_category, first_page, last_page, batch_size)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        logger.error(f"Udemy pages {first_page}-{last_page} of {target_category} failed: {exc}")
+        # Return the failure instead of raising, so that the chord callback
+        # still reports the other ranges.
+        return dict(FAILED_RANGE_STATS)
+
+
+@shared_task(name='courses.finish_udemy_import')
+def finish_udemy_import_task(results, target_category):
+    """
+    Chord callback of a parallel Udemy import: adds up the statistics of
+    the page ranges and sends the completion email.
+    """
+    stats = {
+        'courses_processed': 0,
+        'courses_created': 0,
+        'courses_updated': 0,
+        'courses_unchanged': 0,
+        'errors': 0,
+        'failed_ranges': 0,
+        'api_stats': {'calls': 0, 'retries': 0, 'p95_ms': 0},
+    }
+    stats = merge_import_stats([stats] + list(results))
+    stats['initial_count'] = UdemyProductionImporter().finish_parallel_import(target_category, stats)
+    stats['final_count'] = Course.objects.filter(provider__title='Udemy').count()
+    send_import_report(stats)
+    return stats
+
+
 # edX Import Tasks
 
 @shared_task(bind=True, name='courses.import_edx_courses')
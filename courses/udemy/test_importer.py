@@ -5,6 +5,7 @@ from django.db import transaction
 
 from .base import UdemyImportBase, BASE_CATEGORY_MAPPING
 from courses.models import Course
+from courses.search import defer_search_updates
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,6 +25,7 @@ class UdemyTestImporter(UdemyImportBase):
             user_email=user_email
         )
 
+    @defer_search_updates()
     @transaction.atomic
     def import_test_course(self, course_id=269006, target_category='Development'):
         """
@@ -39,6 +41,7 @@ class UdemyTestImporter(UdemyImportBase):
         logger.info(f"Starting test import for course ID: {course_id}")
 
         udemy_client = self.get_udemy_client()
+        udemy_client.stats.reset()
         provider = self.get_provider()
 
         # Get initial course count
@@ -71,6 +74,8 @@ class UdemyTestImporter(UdemyImportBase):
         # Final count
         final_count = Course.objects.filter(provider__title='Udemy').count()
         logger.info(f"Final course count: {final_count}")
+        api_stats = udemy_client.stats.summary()
+        logger.info(f"Udemy API calls: {api_stats}")
 
         return {
             'initial_count': initial_count,
@@ -78,6 +83,7 @@ class UdemyTestImporter(UdemyImportBase):
             'courses_processed': courses_processed,
             'courses_created': courses_created,
             'courses_updated': courses_updated,
+            'api_stats': api_stats,
         }
 
 
@@ -2,18 +2,22 @@ from django.conf.urls import url
 
 from .views import (
 		HomePageView,
+		category_tabs_list,
 		category_tabs_courses,
 		AllCourseListView,
 		SubcategoryListView,
 		CourseListView,
 		CourseDetailView,
 		SearchListView,
+		course_autocomplete,
 		)
 
 urlpatterns = [
 
 	url(r'^search/$', SearchListView.as_view(), name='search'),
+	url(r'^search/autocomplete/$', course_autocomplete, name='autocomplete'),
 	url(r'^$', HomePageView.as_view(), name='home'),
+	url(r'^home/api/$', category_tabs_list, name='tabs-list'),
 	url(r'^home/api/(?P<slug>[\w-]+)/$', category_tabs_courses, name='tabs'),
 	url(r'^allcourses/$', AllCourseListView.as_view(), name='all-courses'),
 	url(r'^(?P<slug>[\w-]+)/(?P<slug2>[\w-]+)/$', CourseListView.as_view(), name='course-list'),
@@ -1,8 +1,15 @@
+from functools import wraps
+
+from django.conf import settings
 from django.db.models import Q
 from django.http import  (HttpResponseRedirect, 
 						  HttpResponse, 
+						  HttpResponseBadRequest,
+						  Http404,
 						  JsonResponse
 						)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 
 from django.views.generic.base import TemplateView
 
@@ -11,8 +18,25 @@ from django.views.generic import (ListView,
 								)
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404
+from django.utils.http import urlencode
 
-from tags.models import Tag
+from courses.autocomplete import suggest
+from courses.cache import (
+								course_category_links,
+								course_provider_links,
+								sample_popular_course_ids,
+							)
+from courses.page_cache import (
+								CATEGORY_TAG,
+								COURSE_TAG,
+								SUBCATEGORY_TAG,
+								PageCacheMixin,
+							)
+from courses.pagination import KeysetPaginationMixin
+from courses.query_budget import query_budget
+from courses.related import related_courses
+from courses.search import search_courses
+from courses.tabs import category_tabs
 from courses.models import (
 								Category,
 							 	SubCategory, 
@@ -22,14 +46,14 @@ from courses.models import (
 							)
 
 def course_category_list(request):
-	category_list = Category.objects.all()
+	category_list = course_category_links()
 	context = {
 	    "course_category_list": category_list,
 	}
 	return context
 
 def course_provider_list(request):
-    course_provider_list = Provider.objects.all()
+    course_provider_list = course_provider_links()
     context = {
         "course_provider_list": course_provider_list,
     }
@@ -53,19 +77,64 @@ from rest_framework import authentication, permissions
 from .serializers import CourseModelSerializer, CategoryModelSerializer
 
 
+def require_ajax(view):
+	"""
+	Answer 400 to requests not made by the page's own scripts, before any
+	ETag is computed.
+	"""
+	@wraps(view)
+	def wrapper(request, *args, **kwargs):
+		if not request.is_ajax():
+			return HttpResponseBadRequest()
+		return view(request, *args, **kwargs)
+	return wrapper
+
+
+def category_tabs_etag(request, *args, **kwargs):
+	return category_tabs()['etag']
+
+
+@query_budget(2)
+@require_GET
+@require_ajax
+@condition(etag_func=category_tabs_etag)
+def category_tabs_list(request, *args, **kwargs):
+	data = {
+	    "categories": category_tabs()['categories'],
+	}
+	return JsonResponse(data)
+
+
+@query_budget(2)
+@require_GET
+@require_ajax
+@condition(etag_func=category_tabs_etag)
 def category_tabs_courses(request, slug=None, *args, **kwargs):
-	if request.method == "GET" and request.is_ajax():
-		print(slug,'slug')
-		category = get_object_or_404(Category, slug=slug)
-		qs = Course.objects.filter(category=category)[:12]
-		data = {
-		    "qs": list(qs.values()),
-		}
-		print(qs,'qs')
-		return JsonResponse(data)
+	for category in category_tabs()['categories']:
+		if category['slug'] == slug:
+			data = {
+			    "qs": category['courses'],
+			}
+			return JsonResponse(data)
+	raise Http404('No category matches the given query.')
+
+
+
+@query_budget(5)
+@require_GET
+@cache_control(public=True, max_age=60)
+def course_autocomplete(request, *args, **kwargs):
+	query = request.GET.get('q', '')
+	try:
+		limit = min(max(int(request.GET.get('limit', 5)), 1), 10)
+	except ValueError:
+		limit = 5
+	return JsonResponse(suggest(query, limit))
 
 
 
+# Not in the page cache: every visit samples its own popular courses
+@query_budget(8)
 class HomePageView(ListView):
 	model = Course
 	# context_object_name = 'course_list'
@@ -78,24 +147,26 @@ class HomePageView(ListView):
 	def get_context_data(self, *args, **kwargs):
 		context = super(HomePageView, self).get_context_data(*args, **kwargs)
 		context['category_list'] = Category.objects.all()
-		context['popular_course_list'] = Course.objects.filter(is_popular=True).order_by("?")[:12]
+		popular_ids = sample_popular_course_ids(12)
+		popular_courses = Course.objects.select_related('provider').defer('description').in_bulk(popular_ids)
+		context['popular_course_list'] = [popular_courses[pk] for pk in popular_ids if pk in popular_courses]
 		# print(context,'con')
 		return context
 
 
-class AllCourseListView(ListView):
+@query_budget(7)
+class AllCourseListView(KeysetPaginationMixin, ListView):
 	model = Course
 	template_name = 'courses/course_list.html'
 	paginate_by = 25
 
-	def get_context_data(self, *args, **kwargs):
-		context = super(AllCourseListView, self).get_context_data(*args, **kwargs)
-		context['page_range'] = context['paginator'].page_range
-		return context
+	def get_queryset(self, *args, **kwargs):
+		return Course.objects.select_related('provider').defer('description')
 
 
 
-class SubcategoryListView(ListView):
+@query_budget(6)
+class SubcategoryListView(PageCacheMixin, ListView):
 	model = SubCategory
 
 	def get_context_data(self, *args, **kwargs):
@@ -104,71 +175,97 @@ class SubcategoryListView(ListView):
 		category = get_object_or_404(Category, slug=slug)
 		context['category'] = category
 		context['category_image'] = category.image_url
-		context['subcategory_list'] = SubCategory.objects.filter(category=category).order_by('title')
+		context['subcategory_list'] = SubCategory.objects.filter(category=category).select_related('category').order_by('title')
 		# print(context,'con')
 		return context
 
+	def get_page_cache_tags(self, context):
+		return [CATEGORY_TAG.format(context['category'].slug)]
+
 
-class CourseListView(ListView):
+@query_budget(7)
+class CourseListView(PageCacheMixin, KeysetPaginationMixin, ListView):
 	context_object_name = 'course_list'
 	paginate_by = 25
 
 	def get_queryset(self, *args, **kwargs):
 		slug2 = self.kwargs.get('slug2')
-		subcategory = get_object_or_404(SubCategory, slug=slug2)
-		course_list = Course.objects.filter(subcategory=subcategory)
+		self.subcategory = get_object_or_404(SubCategory, slug=slug2)
+		course_list = (Course.objects.filter(subcategory=self.subcategory)
+									 .select_related('provider')
+									 .defer('description'))
 		return course_list
 
 	def get_context_data(self, *args, **kwargs):
 		context = super(CourseListView, self).get_context_data(*args, **kwargs)
-		slug2 = self.kwargs.get('slug2')
-		subcategory = get_object_or_404(SubCategory, slug=slug2)
-		context['subcategory'] = subcategory
-		context['page_range'] = context['paginator'].page_range
+		context['subcategory'] = self.subcategory
 		# print(context,'con')
 		return context
 
+	def get_page_cache_tags(self, context):
+		tags = [SUBCATEGORY_TAG.format(self.subcategory.slug)]
+		tags.extend(COURSE_TAG.format(course.slug) for course in context['course_list'])
+		return tags
+
 
-class CourseDetailView(TemplateView):
+@query_budget(7)
+class CourseDetailView(PageCacheMixin, TemplateView):
 	model = Course
 	template_name = 'courses/course_detail.html'
 
 	def get_context_data(self, *args, **kwargs):
 		context = super(CourseDetailView, self).get_context_data(*args, **kwargs)
 		slug2 = self.kwargs.get('slug2')
-		course = get_object_or_404(Course, slug=slug2)
+		course = get_object_or_404(Course.objects.select_related('provider'), slug=slug2)
 		context['course'] = course
-		context['related_tags'] = Tag.objects.filter(courses=course)
-		related_courses = Course.objects.filter(category=course.category)
-		context['related_courses'] = related_courses.exclude(title=course.title).order_by("?")[:10]
+		context['related_courses'] = related_courses(course)
 		# print(context['related_tags'],'con')
 		return context
 
+	def get_page_cache_tags(self, context):
+		courses = [context['course']] + context['related_courses']
+		return [COURSE_TAG.format(course.slug) for course in courses]
+
 
+@query_budget(8)
 class SearchListView(TemplateView):
 	template_name = 'courses/search_list.html'
-	queryset = Course.objects.all()
+	queryset = Course.objects.select_related('provider').defer('description')
 	paginate_by = 8
 
+	def get_search_results(self, query):
+		# "free" finds the free courses that also match the text
+		free_only = query == 'Free' or query == 'free'
+		if settings.COURSE_SEARCH_FULLTEXT:
+			return search_courses(query, free_only)
+		qs1 = self.queryset
+		if free_only:
+			qs1 = qs1.filter(is_free=True)
+		qs2 = qs1.filter(
+					Q(title__icontains=query)
+					# |Q(description__icontains=query)
+					|Q(author__icontains=query)
+					| Q(price__icontains=query) 
+					| Q(provider__title__icontains=query)
+					| Q(category__title__icontains=query) 
+					| Q(subcategory__title__icontains=query)
+					| Q(topic__title__icontains=query)
+					# | Q(tag__title__icontains=query)
+					)
+		return qs2.distinct()
+
 	def get_context_data(self, *args, **kwargs):
 		context = super(SearchListView, self).get_context_data(*args, **kwargs)
-		qs1 = self.queryset
 		query = self.request.GET.get("q", None)
-		if query == 'Free' or query == 'free':
-			qs1 = qs1.filter(is_free=True)
 		if query is not None:
-			qs2 = qs1.filter(
-						Q(title__icontains=query)
-						# |Q(description__icontains=query)
-						|Q(author__icontains=query)
-						| Q(price__icontains=query) 
-						| Q(provider__title__icontains=query)
-						| Q(category__title__icontains=query) 
-						| Q(subcategory__title__icontains=query)
-						| Q(topic__title__icontains=query)
-						# | Q(tag__title__icontains=query)
-						)
-			context['course_list'] = qs2.distinct()
+			paginator = Paginator(self.get_search_results(query), self.paginate_by)
+			page_obj = paginator.get_page(self.request.GET.get('page'))
+			context['paginator'] = paginator
+			context['page_obj'] = page_obj
+			context['is_paginated'] = page_obj.has_other_pages()
+			context['page_range'] = paginator.page_range
+			context['page_query'] = urlencode({'q': query}) + '&'
+			context['course_list'] = page_obj.object_list
 			context['query'] = query
 			# print(context['query'],'query')
-		return context
\ No newline at end of file
+		return context